@@ -0,0 +1,72 @@
+"""Measures the memory retained by parsed TDR headers and trials.
+
+The result is reported per 10k trials. Usage:
+
+    python benchmarks/bench_memory.py [file.tdr]
+"""
+
+import gc
+import pathlib
+import sys
+import tracemalloc
+import warnings
+
+from vstim.tdr import ObjectHeader, TrialHeader, read_tdr
+
+
+def measure(filename: pathlib.Path) -> dict[str, float]:
+    gc.collect()
+    tracemalloc.start()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        tdrFile = read_tdr(filename)
+    headerBytes, _ = tracemalloc.get_traced_memory()
+    trials = tdrFile.get_trials()
+    totalBytes, peakBytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    nTrials = len(trials)
+    nObjects = sum(isinstance(h, ObjectHeader) for h in tdrFile.headers)
+    trialHeaderBytes = 0
+    for header in tdrFile.headers:
+        if isinstance(header, TrialHeader):
+            trialHeaderBytes += _deep_sizeof(header)
+    return {
+        "trials": nTrials,
+        "objects": nObjects,
+        "headersMB/10k": headerBytes / nTrials * 10_000 / 2**20,
+        "trialHeadersMB/10k": trialHeaderBytes / nTrials * 10_000 / 2**20,
+        "headersAndTrialsMB/10k": totalBytes / nTrials * 10_000 / 2**20,
+        "peakMB/10k": peakBytes / nTrials * 10_000 / 2**20,
+    }
+
+
+def _deep_sizeof(obj, seen: set[int] | None = None) -> int:
+    """Returns the size of an object including the objects it references."""
+    seen = set() if seen is None else seen
+    if id(obj) in seen or isinstance(obj, type):
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (list, tuple)):
+        size += sum(_deep_sizeof(item, seen) for item in obj)
+    elif isinstance(obj, dict):
+        size += sum(_deep_sizeof(v, seen) for v in obj.values())
+    if hasattr(obj, "__dict__"):
+        size += _deep_sizeof(vars(obj), seen)
+    for cls in type(obj).__mro__:
+        for name in getattr(cls, "__slots__", ()):
+            if hasattr(obj, name):
+                size += _deep_sizeof(getattr(obj, name), seen)
+    return size
+
+
+if __name__ == "__main__":
+    default = pathlib.Path(__file__).parent.parent / "tests" / "test.tdr"
+    filename = pathlib.Path(sys.argv[1]) if len(sys.argv) > 1 else default
+    for name, value in measure(filename).items():
+        print(
+            f"{name:>24}: {value:.2f}"
+            if isinstance(value, float)
+            else f"{name:>24}: {value}"
+        )
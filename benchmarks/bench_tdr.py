@@ -0,0 +1,104 @@
+"""Benchmarks for parsing synthetic TDR files of increasing size.
+
+Tracks the parse throughput of `read_tdr()`, the time to build the trial
+DataFrame (from `Trial` objects and from the columnar `TrialTable`) and the
+peak memory of each. Requires pytest-benchmark:
+
+    python -m pytest benchmarks/bench_tdr.py
+
+The trial counts default to 1k and 10k and can be set with the environment
+variable VSTIM_BENCH_TRIALS, e.g. VSTIM_BENCH_TRIALS=1000,100000,1000000.
+Each trial has VSTIM_BENCH_OBJECTS (default 4) object headers. The generated
+files are cached in the pytest cache directory.
+"""
+
+import os
+import pathlib
+import tracemalloc
+import warnings
+
+import pytest
+
+from vstim.tdr import read_tdr
+from vstim.tdr_synthetic import write_synthetic_tdr
+
+pytest.importorskip("pytest_benchmark")
+
+trialCounts = [
+    int(n) for n in os.environ.get("VSTIM_BENCH_TRIALS", "1000,10000").split(",")
+]
+nObjects = int(os.environ.get("VSTIM_BENCH_OBJECTS", "4"))
+
+
+@pytest.fixture(scope="module", params=trialCounts, ids=lambda n: f"{n}trials")
+def tdr_filename(request) -> pathlib.Path:
+    cacheDir = pathlib.Path(request.config.cache.mkdir("vstim_bench"))
+    filename = cacheDir / f"synthetic_{request.param}_{nObjects}.tdr"
+    if not filename.exists():
+        tmpFilename = filename.with_suffix(".tmp")
+        write_synthetic_tdr(tmpFilename, request.param, nObjects=nObjects)
+        os.replace(tmpFilename, filename)
+    return filename
+
+
+def _record(benchmark, filename: pathlib.Path, nTrials: int, function):
+    """Stores throughput and peak memory of one extra call in the benchmark results."""
+    tracemalloc.start()
+    function()
+    _, peakBytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    seconds = benchmark.stats.stats.mean
+    benchmark.extra_info["trials"] = nTrials
+    benchmark.extra_info["trialsPerS"] = nTrials / seconds
+    benchmark.extra_info["MBPerS"] = filename.stat().st_size / seconds / 2**20
+    benchmark.extra_info["peakMB"] = peakBytes / 2**20
+
+
+def _read(filename: pathlib.Path, **kwargs):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return read_tdr(filename, **kwargs)
+
+
+def _read_trials(filename: pathlib.Path, **kwargs):
+    return _read(filename, **kwargs).get_trials()
+
+
+def _read_outcome_counts(filename: pathlib.Path):
+    return _read(filename, lazy=True).get_outcome_counts()
+
+
+def test_read_tdr(benchmark, tdr_filename):
+    trials = benchmark.pedantic(_read_trials, args=(tdr_filename,), rounds=3)
+    _record(benchmark, tdr_filename, len(trials), lambda: _read_trials(tdr_filename))
+
+
+def test_read_tdr_lazy_outcomes(benchmark, tdr_filename):
+    counts = benchmark.pedantic(_read_outcome_counts, args=(tdr_filename,), rounds=3)
+    _record(
+        benchmark,
+        tdr_filename,
+        sum(counts.values()),
+        lambda: _read_outcome_counts(tdr_filename),
+    )
+
+
+def test_get_trials_as_dataframe(benchmark, tdr_filename):
+    pytest.importorskip("pandas")
+    tdrFile = _read(tdr_filename)
+    tdrFile.get_trials()
+
+    def build():
+        tdrFile.invalidate_cache()
+        return tdrFile.get_trials_as_dataframe()
+
+    df = benchmark.pedantic(build, rounds=3)
+    _record(benchmark, tdr_filename, len(df), build)
+
+
+def test_table_to_dataframe(benchmark, tdr_filename):
+    pytest.importorskip("pandas")
+    pytest.importorskip("pyarrow")
+    table = _read(tdr_filename).to_table()
+    df = benchmark.pedantic(table.to_dataframe, rounds=3)
+    _record(benchmark, tdr_filename, len(df), table.to_dataframe)
@@ -0,0 +1,136 @@
+import concurrent.futures
+import locale
+import os
+import pathlib
+from dataclasses import dataclass
+from typing import Iterable, Iterator
+
+from vstim.tdr import (
+    FileEndHeader,
+    FileStartHeader,
+    TdrFile,
+    _decode_headers,
+    _map_tdr,
+    _split_trial_ranges,
+    read_tdr,
+    scan_tdr,
+)
+from vstim.tdr_stats import TdrStats, stats_phase
+from vstim.trial_table import TrialTable
+
+
+@dataclass
+class TdrLoadResult:
+    """Result of loading a single file with `read_tdr_many()`.
+
+    On success `fileHeader` and `table` are set, otherwise `error` holds the
+    exception raised while reading the file.
+    """
+
+    filename: pathlib.Path
+    fileHeader: FileStartHeader | None = None
+    table: TrialTable | None = None
+    error: Exception | None = None
+
+
+def _load_tdr(filename: pathlib.Path) -> TdrLoadResult:
+    try:
+        tdrFile = read_tdr(filename)
+        fileHeader = next(
+            (h for h in tdrFile.headers if isinstance(h, FileStartHeader)), None
+        )
+        return TdrLoadResult(
+            filename=filename, fileHeader=fileHeader, table=tdrFile.to_table()
+        )
+    except Exception as error:
+        return TdrLoadResult(filename=filename, error=error)
+
+
+def iter_tdr_many(
+    filenames: Iterable[pathlib.Path], workers: int | None = None
+) -> Iterator[TdrLoadResult]:
+    """Reads TDR files in a process pool and yields the results as they complete.
+
+    Files are returned as columnar `TrialTable`s, which are much cheaper to send
+    between processes than the parsed header objects. Errors are reported in the
+    `error` field of the result instead of aborting the batch. With `workers=1`
+    the files are read in the calling process.
+    """
+    filenames = list(filenames)
+    if workers == 1:
+        yield from map(_load_tdr, filenames)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_load_tdr, filename) for filename in filenames]
+        for future in concurrent.futures.as_completed(futures):
+            yield future.result()
+
+
+def read_tdr_many(
+    filenames: Iterable[pathlib.Path], workers: int | None = None
+) -> list[TdrLoadResult]:
+    """Reads TDR files in a process pool, see `iter_tdr_many()`.
+
+    The results are returned in the order of `filenames`.
+    """
+    filenames = list(filenames)
+    if workers == 1:
+        return list(map(_load_tdr, filenames))
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_load_tdr, filenames))
+
+
+def _parse_tdr_range(
+    filename: pathlib.Path, start: int, end: int
+) -> tuple[FileStartHeader | None, TrialTable, FileEndHeader | None]:
+    """Parses the bytes start:end of a TDR file (starting at a $TH1 line or 0)."""
+    with _map_tdr(filename) as data:
+        chunk = data[start:end]
+    encoding = locale.getpreferredencoding(False)
+    headers = list(_decode_headers(chunk, scan_tdr(chunk), encoding))
+    fileHeader = next((h for h in headers if isinstance(h, FileStartHeader)), None)
+    fileEndHeader = next((h for h in headers if isinstance(h, FileEndHeader)), None)
+    return fileHeader, TrialTable.from_headers(headers), fileEndHeader
+
+
+def read_tdr_parallel(
+    filename: pathlib.Path, workers: int | None = None, stats: TdrStats | None = None
+) -> TdrFile:
+    """Parses a single TDR file in a process pool.
+
+    The file is split into one chunk per worker at $TH1 lines, so the object
+    headers of a trial are always in the same chunk. Each worker parses its
+    chunk into a `TrialTable` and the tables are concatenated in file order.
+    The returned file is backed by that table, so unknown headers (e.g.
+    $EC1) are dropped and their warnings are only shown by the workers.
+    """
+    workers = workers or os.cpu_count()
+    with _map_tdr(filename) as data:
+        nBytes = len(data)
+        with stats_phase(stats, "partition", nBytes):
+            ranges = _split_trial_ranges(data, workers)
+
+    with stats_phase(stats, "parallel", nBytes):
+        if len(ranges) <= 1:
+            results = [_parse_tdr_range(filename, 0, nBytes)]
+        else:
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=len(ranges)
+            ) as executor:
+                results = list(
+                    executor.map(
+                        _parse_tdr_range,
+                        [filename] * len(ranges),
+                        [start for start, _ in ranges],
+                        [end for _, end in ranges],
+                    )
+                )
+
+    fileHeader = results[0][0]
+    fileEndHeader = results[-1][2]
+    table = TrialTable.concatenate([table for _, table, _ in results])
+    tdrFile = TdrFile.from_table(filename, fileHeader, table, fileEndHeader)
+    tdrFile.stats = stats
+    return tdrFile
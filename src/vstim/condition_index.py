@@ -0,0 +1,266 @@
+from dataclasses import dataclass, field
+from typing import Iterable
+
+import numpy as np
+
+from vstim.tdr import TrialOutcome
+from vstim.trial_table import TrialTable
+
+conditionColumns = ("stimulusNumber", "timeSequence", "outcome")
+
+
+def _get_medians(values: np.ndarray, groups: np.ndarray, nGroups: int) -> np.ndarray:
+    """Returns the median of the non-NaN values of each group, NaN for empty groups."""
+    isValid = ~np.isnan(values)
+    values, groups = values[isValid], groups[isValid]
+    order = np.lexsort((values, groups))
+    counts = np.bincount(groups, minlength=nGroups)
+    starts = np.zeros(nGroups, dtype=np.int64)
+    np.cumsum(counts[:-1], out=starts[1:])
+    sortedValues = np.append(values[order], np.nan)
+    lower = np.where(counts > 0, starts + (counts - 1) // 2, len(values))
+    upper = np.where(counts > 0, starts + counts // 2, len(values))
+    return (sortedValues[lower] + sortedValues[upper]) / 2
+
+
+def _aggregate(
+    groups: np.ndarray,
+    nGroups: int,
+    isHit: np.ndarray,
+    reactionTimeMS: np.ndarray,
+    rewardDurationMS: np.ndarray,
+) -> dict[str, np.ndarray]:
+    hasReactionTime = ~np.isnan(reactionTimeMS)
+    count = np.bincount(groups, minlength=nGroups)
+    nHits = np.bincount(groups, weights=isHit, minlength=nGroups).astype(np.int64)
+    nReactionTimes = np.bincount(
+        groups, weights=hasReactionTime, minlength=nGroups
+    ).astype(np.int64)
+    reactionTimeSum = np.bincount(
+        groups,
+        weights=np.where(hasReactionTime, reactionTimeMS, 0.0),
+        minlength=nGroups,
+    )
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return {
+            "count": count,
+            "nHits": nHits,
+            "hitRate": nHits / count,
+            "nReactionTimes": nReactionTimes,
+            "reactionTimeMeanMS": reactionTimeSum / nReactionTimes,
+            "reactionTimeMedianMS": _get_medians(reactionTimeMS, groups, nGroups),
+            "rewardTotalMS": np.bincount(
+                groups, weights=rewardDurationMS, minlength=nGroups
+            ),
+        }
+
+
+@dataclass
+class ConditionIndex:
+    """Trials grouped by condition, by default stimulusNumber x timeSequence x outcome.
+
+    `keys` holds the sorted unique combinations of the values of `columns`
+    (enum columns by their `.value`), one row per group. The trials of group
+    g are entries offsets[g]:offsets[g+1] of the per-trial arrays `session`
+    (index into `sessionKeys`) and `trialIndex` (row in the `TrialTable` of
+    that session), sorted by session and row.
+
+    `aggregates` holds the statistics of each group: count, nHits, hitRate,
+    nReactionTimes, reactionTimeMeanMS, reactionTimeMedianMS and
+    rewardTotalMS. Reaction times of -1 (no response) are ignored.
+
+    Indices of several sessions are combined with `merge()`, and
+    `summarize()` aggregates over a subset of the columns, e.g. the
+    performance per stimulus across time sequences.
+    """
+
+    columns: tuple[str, ...]
+    keys: np.ndarray
+    offsets: np.ndarray
+    sessionKeys: list[str]
+    session: np.ndarray
+    trialIndex: np.ndarray
+    isHit: np.ndarray
+    reactionTimeMS: np.ndarray
+    rewardDurationMS: np.ndarray
+    aggregates: dict[str, np.ndarray]
+    _groupOfKey: dict[tuple, int] | None = field(default=None, repr=False)
+
+    @staticmethod
+    def _from_entries(
+        columns: tuple[str, ...],
+        entryKeys: np.ndarray,
+        sessionKeys: list[str],
+        **entries,
+    ) -> "ConditionIndex":
+        keys, groups = np.unique(entryKeys, axis=0, return_inverse=True)
+        groups = groups.reshape(-1)
+        order = np.argsort(groups, kind="stable")
+        counts = np.bincount(groups, minlength=len(keys))
+        offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        entries = {name: values[order] for name, values in entries.items()}
+        return ConditionIndex(
+            columns=columns,
+            keys=keys,
+            offsets=offsets,
+            sessionKeys=sessionKeys,
+            **entries,
+            aggregates=_aggregate(
+                groups[order],
+                len(keys),
+                entries["isHit"],
+                entries["reactionTimeMS"],
+                entries["rewardDurationMS"],
+            ),
+        )
+
+    @staticmethod
+    def from_table(
+        table: TrialTable,
+        columns: Iterable[str] = conditionColumns,
+        session: np.ndarray | None = None,
+        sessionKeys: list[str] | None = None,
+    ) -> "ConditionIndex":
+        """Builds the index of the trials of a table.
+
+        `session` optionally assigns each row to one of `sessionKeys`, e.g.
+        for the table of a `TdrDataset`. `trialIndex` is the row in `table`.
+        """
+        columns = tuple(columns)
+        if session is None:
+            session = np.zeros(len(table), dtype=np.int32)
+        if sessionKeys is None:
+            sessionKeys = [""]
+        reactionTimeMS = table.reactionTimeMS.astype(np.float64)
+        return ConditionIndex._from_entries(
+            columns,
+            np.column_stack(
+                [getattr(table, name).astype(np.int64) for name in columns]
+            ).reshape(len(table), len(columns)),
+            list(sessionKeys),
+            session=np.asarray(session, dtype=np.int32),
+            trialIndex=np.arange(len(table), dtype=np.int64),
+            isHit=table.outcome == TrialOutcome.Hit.value,
+            reactionTimeMS=np.where(reactionTimeMS < 0.0, np.nan, reactionTimeMS),
+            rewardDurationMS=table.rewardDurationMS.astype(np.float64),
+        )
+
+    @staticmethod
+    def merge(indices: list["ConditionIndex"]) -> "ConditionIndex":
+        """Combines the indices of several sessions (with the same columns) into one."""
+        assert indices, "Nothing to merge"
+        columns = indices[0].columns
+        assert all(index.columns == columns for index in indices)
+        sessionOffsets = np.cumsum([0] + [len(i.sessionKeys) for i in indices[:-1]])
+        return ConditionIndex._from_entries(
+            columns,
+            np.concatenate([index._get_entry_keys() for index in indices]),
+            [key for index in indices for key in index.sessionKeys],
+            session=np.concatenate(
+                [
+                    index.session + offset
+                    for index, offset in zip(indices, sessionOffsets.tolist())
+                ]
+            ).astype(np.int32),
+            **{
+                name: np.concatenate([getattr(index, name) for index in indices])
+                for name in (
+                    "trialIndex",
+                    "isHit",
+                    "reactionTimeMS",
+                    "rewardDurationMS",
+                )
+            },
+        )
+
+    def __len__(self) -> int:
+        """Returns the number of groups."""
+        return len(self.keys)
+
+    def _get_entry_keys(self) -> np.ndarray:
+        return np.repeat(self.keys, np.diff(self.offsets), axis=0)
+
+    def _find_group(self, key: tuple) -> int:
+        """Returns the group of a key (values or enum members), -1 if there is none."""
+        assert len(key) == len(
+            self.columns
+        ), f"Expected a value for each of {self.columns}"
+        if self._groupOfKey is None:
+            self._groupOfKey = {
+                tuple(values): iGroup
+                for iGroup, values in enumerate(self.keys.tolist())
+            }
+        return self._groupOfKey.get(
+            tuple(getattr(value, "value", value) for value in key), -1
+        )
+
+    def get_trial_indices(self, key: tuple, session: int | None = None) -> np.ndarray:
+        """Returns the sorted rows of the trials with a condition, e.g. (3, 0, TrialOutcome.Hit).
+
+        For an index of several sessions, select the rows of one session by
+        its position in `sessionKeys`.
+        """
+        iGroup = self._find_group(key)
+        if iGroup < 0:
+            return np.zeros(0, dtype=np.int64)
+        entries = slice(self.offsets[iGroup], self.offsets[iGroup + 1])
+        trialIndex = self.trialIndex[entries]
+        if session is not None:
+            trialIndex = trialIndex[self.session[entries] == session]
+        return trialIndex
+
+    def get_key_values(self) -> dict[str, list]:
+        """Returns the key columns with enum columns as enum members."""
+        enumTypes = TrialTable._enumTypes
+        return {
+            name: (
+                [enumTypes[name](v) for v in self.keys[:, i].tolist()]
+                if name in enumTypes
+                else self.keys[:, i].tolist()
+            )
+            for i, name in enumerate(self.columns)
+        }
+
+    def summarize(self, by: Iterable[str] | None = None) -> dict[str, np.ndarray]:
+        """Returns the key columns and aggregates per group.
+
+        With `by`, a subset of `columns`, the groups with the same values of
+        these columns are combined, e.g. `summarize(["stimulusNumber"])`.
+        """
+        if by is None:
+            return {
+                **{name: self.keys[:, i] for i, name in enumerate(self.columns)},
+                **self.aggregates,
+            }
+        by = list(by)
+        iColumns = [self.columns.index(name) for name in by]
+        keys, groupOfGroup = np.unique(
+            self.keys[:, iColumns].reshape(len(self.keys), len(by)),
+            axis=0,
+            return_inverse=True,
+        )
+        groups = np.repeat(groupOfGroup.reshape(-1), np.diff(self.offsets))
+        return {
+            **{name: keys[:, i] for i, name in enumerate(by)},
+            **_aggregate(
+                groups,
+                len(keys),
+                self.isHit,
+                self.reactionTimeMS,
+                self.rewardDurationMS,
+            ),
+        }
+
+    def to_dataframe(self, by: Iterable[str] | None = None):
+        """Returns `summarize()` as a DataFrame with enum columns as categoricals."""
+        import pandas as pd
+
+        summary = self.summarize(by)
+        for name, enumType in TrialTable._enumTypes.items():
+            if name in summary:
+                summary[name] = pd.Categorical(
+                    [enumType(v).name for v in summary[name].tolist()],
+                    categories=[member.name for member in enumType],
+                )
+        return pd.DataFrame(summary)
@@ -0,0 +1,343 @@
+import asyncio
+import contextlib
+import socket
+import time
+from typing import AsyncIterator
+
+import numpy as np
+
+from vstim.event_log import EventDtype
+from vstim.network_event_codes import in_event_family
+
+# sequence number of the packet, number of events and time.time() of the sender
+PacketHeaderDtype = np.dtype(
+    [("sequence", "<u4"), ("nEvents", "<u4"), ("sendTime", "<f8")]
+)
+# TCP connections announcing larger packets are closed
+maxPacketEvents = 2**16
+
+
+def encode_event_packet(
+    events: np.ndarray, sequence: int, sendTime: float | None = None
+) -> bytes:
+    """Returns a packet of a `PacketHeaderDtype` header followed by the events."""
+    events = np.asarray(events, dtype=EventDtype)
+    header = np.array(
+        [(sequence, len(events), time.time() if sendTime is None else sendTime)],
+        dtype=PacketHeaderDtype,
+    )
+    return header.tobytes() + events.tobytes()
+
+
+def decode_event_packet(data: bytes) -> tuple[np.void, np.ndarray]:
+    """Returns the header and a read-only view of the events of a packet.
+
+    Raises ValueError if the packet is shorter or longer than its header says.
+    """
+    if len(data) < PacketHeaderDtype.itemsize:
+        raise ValueError(f"Packet of {len(data)} bytes is shorter than its header")
+    header = np.frombuffer(data, dtype=PacketHeaderDtype, count=1)[0]
+    nBytes = PacketHeaderDtype.itemsize + int(header["nEvents"]) * EventDtype.itemsize
+    if len(data) != nBytes:
+        raise ValueError(f"Expected a packet of {nBytes} bytes, got {len(data)}")
+    events = np.frombuffer(data, dtype=EventDtype, offset=PacketHeaderDtype.itemsize)
+    return header, events
+
+
+class EventRingBuffer:
+    """Keeps the last `capacity` events in a preallocated array of `EventDtype`.
+
+    `nWritten` counts all events ever written, the event with count i is
+    stored at i % capacity. Readers remember the count they have read up to
+    and get the newer events with `get_since()`. Writing copies the events
+    into the array without allocating. Only the event loop writes, so no
+    locking is needed.
+    """
+
+    def __init__(self, capacity: int = 2**20):
+        assert capacity > 0
+        self.capacity = capacity
+        self.events = np.zeros(capacity, dtype=EventDtype)
+        self.nWritten = 0
+
+    def __len__(self) -> int:
+        """Returns the number of events currently stored."""
+        return min(self.nWritten, self.capacity)
+
+    def write(self, events: np.ndarray):
+        # of a batch larger than the buffer, only the end is kept
+        nSkipped = max(len(events) - self.capacity, 0)
+        events = events[nSkipped:]
+        start = (self.nWritten + nSkipped) % self.capacity
+        nFirst = min(len(events), self.capacity - start)
+        self.events[start : start + nFirst] = events[:nFirst]
+        self.events[: len(events) - nFirst] = events[nFirst:]
+        self.nWritten += nSkipped + len(events)
+
+    def _get_segments(self, first: int) -> list[np.ndarray]:
+        """Returns views of the events with count >= first in chronological order."""
+        first = max(first, self.nWritten - self.capacity)
+        start = first % self.capacity
+        nEvents = self.nWritten - first
+        if nEvents <= 0:
+            return []
+        if start + nEvents <= self.capacity:
+            return [self.events[start : start + nEvents]]
+        return [self.events[start:], self.events[: start + nEvents - self.capacity]]
+
+    def get_since(self, first: int) -> tuple[np.ndarray, int]:
+        """Returns a copy of the events with count >= first and the current count.
+
+        Events that were already overwritten are missing from the result.
+        """
+        segments = self._get_segments(first)
+        if not segments:
+            return np.zeros(0, dtype=EventDtype), self.nWritten
+        return np.concatenate(segments), self.nWritten
+
+    def get_window(
+        self,
+        seconds: float,
+        families: str | list[str] | None = None,
+        tEnd: float | None = None,
+    ) -> np.ndarray:
+        """Returns the events of the last `seconds` before `tEnd`, optionally of some families.
+
+        `tEnd` defaults to the timestamp of the latest event, e.g.
+        `get_window(5.0, "lever")` returns all lever events of the last 5 s.
+        """
+        segments = self._get_segments(0)
+        if not segments:
+            return np.zeros(0, dtype=EventDtype)
+        if tEnd is None:
+            tEnd = segments[-1]["timestamp"][-1]
+        windows = []
+        for segment in segments:
+            start, end = np.searchsorted(
+                segment["timestamp"], [tEnd - seconds, tEnd], side="right"
+            )
+            windows.append(segment[start:end])
+        events = np.concatenate(windows)
+        if families is not None:
+            events = events[in_event_family(events["code"], families)]
+        return events
+
+
+class _UdpProtocol(asyncio.DatagramProtocol):
+    def __init__(self, listener: "EventListener"):
+        self.listener = listener
+
+    def datagram_received(self, data: bytes, address):
+        self.listener._on_packet(data, address)
+
+
+class EventListener:
+    """Receives VStim network events via UDP or TCP into an `EventRingBuffer`.
+
+    Each packet holds a batch of events, see `encode_event_packet()`. Over TCP
+    the packets are sent back to back on the stream. Iterating with `async for`
+    yields an array of the events received since the previous iteration.
+
+    The packet sequence numbers are tracked per sender (UDP address or TCP
+    connection). Forward gaps are counted as `nDroppedPackets`, late or
+    duplicate packets (e.g. reordered UDP packets) as `nLatePackets` and
+    ignored, so the events stay in order. `latency` is the time between
+    sending and receiving a packet, based on the clocks of sender and
+    receiver, so it is only meaningful if they are synchronized (or the same).
+    Invalid packets are counted and ignored. TCP connections announcing more
+    than `max_packet_events` events in a packet are closed.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        protocol: str = "udp",
+        capacity: int = 2**20,
+        max_packet_events: int = maxPacketEvents,
+    ):
+        if protocol not in ("udp", "tcp"):
+            raise ValueError(f"Unsupported protocol {protocol!r}")
+        self.host = host
+        self.port = port
+        self.protocol = protocol
+        self.max_packet_events = max_packet_events
+        self.buffer = EventRingBuffer(capacity)
+        self.nPackets = 0
+        self.nDroppedPackets = 0
+        self.nLatePackets = 0
+        self.nInvalidPackets = 0
+        self.nOverrunEvents = 0
+        self.lastLatency = float("nan")
+        self.maxLatency = 0.0
+        self._latencySum = 0.0
+        self._nextSequences: dict[object, int] = {}
+        self._server = None
+        self._writers: set[asyncio.StreamWriter] = set()
+        self._waiters: list[asyncio.Future] = []
+        self._closed = False
+
+    @property
+    def nEvents(self) -> int:
+        return self.buffer.nWritten
+
+    @property
+    def meanLatency(self) -> float:
+        return self._latencySum / self.nPackets if self.nPackets else float("nan")
+
+    def get_counters(self) -> dict[str, float]:
+        return {
+            "nPackets": self.nPackets,
+            "nEvents": self.nEvents,
+            "nDroppedPackets": self.nDroppedPackets,
+            "nLatePackets": self.nLatePackets,
+            "nInvalidPackets": self.nInvalidPackets,
+            "nOverrunEvents": self.nOverrunEvents,
+            "lastLatency": self.lastLatency,
+            "meanLatency": self.meanLatency,
+            "maxLatency": self.maxLatency,
+        }
+
+    async def start(self):
+        """Starts listening, `port` is set to the bound port (e.g. if it was 0)."""
+        loop = asyncio.get_running_loop()
+        if self.protocol == "udp":
+            self._server, _ = await loop.create_datagram_endpoint(
+                lambda: _UdpProtocol(self), local_addr=(self.host, self.port)
+            )
+            self.port = self._server.get_extra_info("sockname")[1]
+        else:
+            self._server = await asyncio.start_server(
+                self._handle_connection, self.host, self.port
+            )
+            self.port = self._server.sockets[0].getsockname()[1]
+
+    def close(self):
+        """Stops listening and closes the TCP connections, see `wait_closed()`."""
+        if self._server is not None:
+            self._server.close()
+        for writer in self._writers:
+            writer.close()
+        self._closed = True
+        self._wake_waiters()
+
+    async def wait_closed(self):
+        """Waits until the server and the TCP connections closed by `close()` are closed."""
+        if self.protocol == "tcp" and self._server is not None:
+            await self._server.wait_closed()
+        for writer in list(self._writers):
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    async def __aenter__(self) -> "EventListener":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args):
+        self.close()
+        await self.wait_closed()
+
+    async def _handle_connection(self, reader, writer):
+        self._writers.add(writer)
+        try:
+            while not self._closed:
+                header = await reader.readexactly(PacketHeaderDtype.itemsize)
+                nEvents = int(np.frombuffer(header, PacketHeaderDtype)[0]["nEvents"])
+                if nEvents > self.max_packet_events:
+                    # the stream cannot be resynchronized after a bad header
+                    self.nInvalidPackets += 1
+                    return
+                events = await reader.readexactly(nEvents * EventDtype.itemsize)
+                self._on_packet(header + events, writer)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+            self._writers.discard(writer)
+            self._nextSequences.pop(writer, None)
+
+    def _on_packet(self, data: bytes, sender=None):
+        receiveTime = time.time()
+        try:
+            header, events = decode_event_packet(data)
+        except ValueError:
+            self.nInvalidPackets += 1
+            return
+
+        sequence = int(header["sequence"])
+        nextSequence = self._nextSequences.get(sender)
+        if nextSequence is not None and sequence < nextSequence:
+            self.nLatePackets += 1
+            return
+        if nextSequence is not None:
+            self.nDroppedPackets += sequence - nextSequence
+        self._nextSequences[sender] = sequence + 1
+
+        latency = receiveTime - float(header["sendTime"])
+        self.nPackets += 1
+        self.lastLatency = latency
+        self.maxLatency = max(self.maxLatency, latency)
+        self._latencySum += latency
+
+        self.buffer.write(events)
+        self._wake_waiters()
+
+    def _wake_waiters(self):
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+        self._waiters.clear()
+
+    async def iter_batches(self) -> AsyncIterator[np.ndarray]:
+        """Yields the events received since the previous batch until `close()`."""
+        nRead = self.buffer.nWritten
+        while True:
+            if self.buffer.nWritten == nRead:
+                if self._closed:
+                    return
+                waiter = asyncio.get_running_loop().create_future()
+                self._waiters.append(waiter)
+                await waiter
+                continue
+            # events overwritten before this iterator got to them
+            self.nOverrunEvents += max(
+                self.buffer.nWritten - self.buffer.capacity - nRead, 0
+            )
+            events, nRead = self.buffer.get_since(nRead)
+            yield events
+
+    def __aiter__(self) -> AsyncIterator[np.ndarray]:
+        return self.iter_batches()
+
+    def get_window(
+        self, seconds: float, families: str | list[str] | None = None
+    ) -> np.ndarray:
+        """Returns the events of the last `seconds`, see `EventRingBuffer.get_window()`."""
+        return self.buffer.get_window(seconds, families)
+
+
+class EventSender:
+    """Sends events to an `EventListener`, e.g. to replay an event log or for tests."""
+
+    def __init__(self, host: str, port: int, protocol: str = "udp"):
+        if protocol not in ("udp", "tcp"):
+            raise ValueError(f"Unsupported protocol {protocol!r}")
+        socketType = socket.SOCK_DGRAM if protocol == "udp" else socket.SOCK_STREAM
+        self.socket = socket.socket(socket.AF_INET, socketType)
+        self.socket.connect((host, port))
+        self.protocol = protocol
+        self.sequence = 0
+
+    def send(self, events: np.ndarray):
+        """Sends the events as one packet."""
+        self.socket.sendall(encode_event_packet(events, self.sequence))
+        self.sequence += 1
+
+    def close(self):
+        self.socket.close()
+
+    def __enter__(self) -> "EventSender":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,121 @@
+import pathlib
+import warnings
+
+import numpy as np
+
+from vstim.network_event_codes import decode_events, in_event_family
+
+eventLogMagic = b"VSTIMEVL"
+eventLogVersion = 1
+
+# timestamp in seconds since the start of the recording
+EventDtype = np.dtype([("timestamp", "<f8"), ("code", "<i4"), ("payload", "<i4")])
+# magic, version, size of an event in bytes
+EventLogHeaderDtype = np.dtype(
+    [("magic", "S8"), ("version", "<u4"), ("eventSize", "<u4")]
+)
+
+
+class EventLog:
+    """The events of a VStim network event log as a structured array of `EventDtype`.
+
+    Logs read with `read_event_log()` are memory-mapped, and `between()` and
+    slicing return views, so only the pages that are actually accessed are
+    read from disk. Filtering by code with `with_codes()` or
+    `with_families()` copies the selected events.
+
+    The timestamps are expected to be sorted, as they are when logged by VStim.
+    """
+
+    def __init__(self, events: np.ndarray, filename: pathlib.Path | None = None):
+        assert events.dtype == EventDtype, f"Expected {EventDtype}, got {events.dtype}"
+        self.events = events
+        self.filename = filename
+
+    def __repr__(self) -> str:
+        return f"EventLog({len(self)} events)"
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    def __getitem__(self, index) -> "EventLog":
+        return EventLog(self.events[index], self.filename)
+
+    @property
+    def timestamp(self) -> np.ndarray:
+        return self.events["timestamp"]
+
+    @property
+    def code(self) -> np.ndarray:
+        return self.events["code"]
+
+    @property
+    def payload(self) -> np.ndarray:
+        return self.events["payload"]
+
+    def between(self, tStart: float, tEnd: float) -> "EventLog":
+        """Returns a view of the events with tStart <= timestamp < tEnd."""
+        start, end = np.searchsorted(self.timestamp, [tStart, tEnd], side="left")
+        return self[start:end]
+
+    def with_codes(self, codes) -> "EventLog":
+        """Returns the events with any of the given codes (ints or `VStimEventCode`)."""
+        codes = [getattr(code, "value", code) for code in codes]
+        return self[np.isin(self.code, codes)]
+
+    def with_families(self, families: str | list[str]) -> "EventLog":
+        """Returns the events of any of the `eventCodeFamilies`, e.g. ["lever", "eye"]."""
+        return self[in_event_family(self.code, families)]
+
+    def get_names(self, categorical: bool = False):
+        """Returns the event names, see `decode_events()`."""
+        return decode_events(self.code, categorical)
+
+
+def read_event_log(filename: pathlib.Path) -> EventLog:
+    """Memory-maps an event log written by `write_event_log()`.
+
+    The file starts with a header of `EventLogHeaderDtype` followed by the
+    events as packed little-endian records of `EventDtype`. An incomplete last
+    event, e.g. of a log that is still being written, is ignored.
+    """
+    filename = pathlib.Path(filename)
+    nBytes = filename.stat().st_size
+    assert (
+        nBytes >= EventLogHeaderDtype.itemsize
+    ), f"{filename} is too short for an event log"
+    header = np.fromfile(filename, dtype=EventLogHeaderDtype, count=1)[0]
+    assert header["magic"] == eventLogMagic, f"{filename} is not an event log"
+    assert (
+        header["version"] == eventLogVersion
+    ), f"Unsupported event log version {header['version']}"
+    assert header["eventSize"] == EventDtype.itemsize
+
+    nEvents, nExtraBytes = divmod(
+        nBytes - EventLogHeaderDtype.itemsize, EventDtype.itemsize
+    )
+    if nExtraBytes:
+        warnings.warn(f"Ignoring the incomplete last event of {filename}")
+    if nEvents == 0:
+        return EventLog(np.zeros(0, dtype=EventDtype), filename)
+    events = np.memmap(
+        filename,
+        dtype=EventDtype,
+        mode="r",
+        offset=EventLogHeaderDtype.itemsize,
+        shape=(nEvents,),
+    )
+    return EventLog(events, filename)
+
+
+def write_event_log(filename: pathlib.Path, events: np.ndarray):
+    """Writes events (a structured array of `EventDtype`) to an event log file."""
+    events = np.asarray(events, dtype=EventDtype)
+    assert np.all(np.diff(events["timestamp"]) >= 0), "Timestamps must be sorted"
+    header = np.array(
+        [(eventLogMagic, eventLogVersion, EventDtype.itemsize)],
+        dtype=EventLogHeaderDtype,
+    )
+    with open(filename, "wb") as file:
+        header.tofile(file)
+        events.tofile(file)
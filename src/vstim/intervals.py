@@ -0,0 +1,78 @@
+import pathlib
+
+import numpy as np
+
+from vstim.tdr import IntervalType, _map_tdr, nIntervals, scan_tdr
+
+
+def get_interval_durations(positive: np.ndarray, negative: np.ndarray) -> np.ndarray:
+    """Returns the durations of the intervals of all trials in milliseconds.
+
+    The transitions are arrays of shape (nTrials, nTransitions) like the columns
+    of a `TrialTable`. The result has shape (nTrials, nIntervals); intervals
+    without both a positive and a negative trigger transition are NaN, see
+    `Trial.get_interval_durations()`.
+    """
+    positive = np.asarray(positive, dtype=np.float64)[:, :nIntervals]
+    negative = np.asarray(negative, dtype=np.float64)[:, :nIntervals]
+    isValid = (positive > 0.0) & (negative > 0.0)
+    return np.where(isValid, negative - positive, np.nan)
+
+
+def get_trial_durations(positive: np.ndarray, negative: np.ndarray) -> np.ndarray:
+    """Returns the total duration of each trial in milliseconds."""
+    return np.nansum(get_interval_durations(positive, negative), axis=1)
+
+
+def get_trial_durations_after_start_signal(
+    positive: np.ndarray, negative: np.ndarray, intervalType: np.ndarray
+) -> np.ndarray:
+    """Returns the duration of each trial after the first interval waiting for a start signal.
+
+    `intervalType` holds the `IntervalType` codes of each trial. Trials without
+    such an interval are NaN.
+    """
+    durations = get_interval_durations(positive, negative)
+    isWaiting = np.asarray(intervalType)[:, : durations.shape[1]] == (
+        IntervalType.WaitForStartSignal.value
+    )
+    hasStartSignal = isWaiting.any(axis=1)
+    iFirstWaiting = np.argmax(isWaiting, axis=1)
+    isAfter = np.arange(durations.shape[1]) > iFirstWaiting[:, np.newaxis]
+    result = np.nansum(np.where(isAfter, durations, np.nan), axis=1)
+    result[~hasStartSignal] = np.nan
+    return result
+
+
+def parse_trigger_transitions(lines: list[bytes]) -> tuple[np.ndarray, np.ndarray]:
+    """Parses the trigger transitions of $TS1 lines into two (nTrials, n) arrays.
+
+    Returns the positive and negative transitions in milliseconds, padded with
+    NaN if trials have different numbers of transitions.
+    """
+    tokens = [line.split()[6:] for line in lines]
+    width = max((len(t) for t in tokens), default=0)
+    width += width % 2
+    if all(len(t) == width for t in tokens):
+        values = np.array(tokens, dtype=bytes).reshape(len(tokens), width)
+        transitions = values.astype(np.float64) * 1000
+    else:
+        transitions = np.full((len(tokens), width), np.nan)
+        for iTrial, t in enumerate(tokens):
+            transitions[iTrial, : len(t)] = np.array(t, dtype=bytes).astype(float)
+        transitions *= 1000
+    return transitions[:, 0::2], transitions[:, 1::2]
+
+
+def read_trigger_transitions(
+    filename: pathlib.Path,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Reads only the $TS1 trigger transitions of a TDR file, see `parse_trigger_transitions()`."""
+    with _map_tdr(filename) as data:
+        index = scan_tdr(data)
+        index = index[index["headerId"] == b"$TS1"]
+        lines = [
+            bytes(data[offset:end])
+            for offset, end in zip(index["offset"].tolist(), index["end"].tolist())
+        ]
+    return parse_trigger_transitions(lines)
@@ -1,5 +1,7 @@
 from enum import Enum
 
+import numpy as np
+
 
 class VStimEventCode(Enum):
     NullEvent = 0
@@ -373,12 +375,113 @@ class VStimEventCode(Enum):
     MaxSystemEventCode = 0xFFFF
 
     @classmethod
-    def get_event_name(cls, code):
-        for event in cls:
-            if event.value[0] == code:
-                return event.name
-        return None
+    def get_event_name(cls, code: int) -> str | None:
+        """Returns the name of an event code, or None if the code is unknown.
+
+        For codes with several names (e.g. 61) the first defined name is used.
+        """
+        return eventCodeNames.get(code)
 
     @classmethod
     def asdict(cls):
         return {event.name: event.value for event in cls}
+
+
+# lookup tables, aliases like LoadedTrialTypeSet1 only appear in eventNameCodes
+eventCodeNames: dict[int, str] = {event.value: event.name for event in VStimEventCode}
+eventNameCodes: dict[str, int] = {
+    name: event.value for name, event in VStimEventCode.__members__.items()
+}
+# all event names ordered by code and the index into them for every possible code
+eventNames: list[str] = [eventCodeNames[code] for code in sorted(eventCodeNames)]
+_eventCodeIndex = np.full(VStimEventCode.MaxSystemEventCode.value + 1, -1, np.int16)
+_eventCodeIndex[sorted(eventCodeNames)] = np.arange(len(eventNames))
+
+# blocks of codes numbered by their offset from the start, e.g. Vtl5On = 1005
+eventCodeRanges: dict[str, range] = {
+    "IntervalStarted": range(100, 200),
+    "IntervalEnded": range(200, 300),
+    "VtlOn": range(1000, 1100),
+    "VtlOff": range(1100, 1200),
+    "TtlOn": range(1200, 1300),
+    "TtlOff": range(1300, 1400),
+}
+
+# groups of related codes, see the comments in VStimEventCode
+eventCodeFamilies: dict[str, range] = {
+    "system": range(0, 10),
+    "lever": range(10, 30),
+    "eye": range(30, 49),
+    "outcome": range(49, 61),
+    "trialTypeSet": range(61, 70),
+    "config": range(70, 100),
+    "interval": range(100, 300),
+    "experimentController": range(300, 400),
+    "rendering": range(400, 1000),
+    "vtl": range(1000, 1200),
+    "ttl": range(1200, 1400),
+}
+
+
+def get_event_indices(codes: np.ndarray) -> np.ndarray:
+    """Returns the index into `eventNames` of each code, -1 for unknown codes."""
+    codes = np.asarray(codes)
+    isValid = (codes >= 0) & (codes < len(_eventCodeIndex))
+    indices = np.full(codes.shape, -1, dtype=np.int16)
+    indices[isValid] = _eventCodeIndex[codes[isValid]]
+    return indices
+
+
+def decode_events(codes: np.ndarray, categorical: bool = False):
+    """Returns the names of an array of event codes (None for unknown codes).
+
+    With `categorical`, a `pandas.Categorical` with all `eventNames` as
+    categories is returned instead, which is much smaller for long streams.
+    """
+    indices = get_event_indices(codes)
+    if categorical:
+        import pandas as pd
+
+        return pd.Categorical.from_codes(indices.reshape(-1), categories=eventNames)
+    names = np.array(eventNames + [None], dtype=object)
+    return names[indices]
+
+
+def in_event_range(codes: np.ndarray, rangeName: str) -> np.ndarray:
+    """Checks which codes belong to a block of `eventCodeRanges`, e.g. "VtlOn"."""
+    codeRange = eventCodeRanges[rangeName]
+    codes = np.asarray(codes)
+    return (codes >= codeRange.start) & (codes < codeRange.stop)
+
+
+def get_event_range_numbers(codes: np.ndarray, rangeName: str) -> np.ndarray:
+    """Returns the number within a block of `eventCodeRanges`, -1 outside the block.
+
+    For example 5 for Interval5Started in "IntervalStarted" or Vtl5On in
+    "VtlOn". The generic events like IntervalStarted have number 0.
+    """
+    codes = np.asarray(codes)
+    return np.where(
+        in_event_range(codes, rangeName), codes - eventCodeRanges[rangeName].start, -1
+    )
+
+
+def classify_events(codes: np.ndarray) -> np.ndarray:
+    """Returns the index of the block in `eventCodeRanges` of each code, -1 if none."""
+    codes = np.asarray(codes)
+    blocks = np.full(codes.shape, -1, dtype=np.int8)
+    for iBlock, rangeName in enumerate(eventCodeRanges):
+        blocks[in_event_range(codes, rangeName)] = iBlock
+    return blocks
+
+
+def in_event_family(codes: np.ndarray, families: str | list[str]) -> np.ndarray:
+    """Checks which codes belong to any of the `eventCodeFamilies`, e.g. "lever"."""
+    if isinstance(families, str):
+        families = [families]
+    codes = np.asarray(codes)
+    isInFamily = np.zeros(codes.shape, dtype=bool)
+    for family in families:
+        codeRange = eventCodeFamilies[family]
+        isInFamily |= (codes >= codeRange.start) & (codes < codeRange.stop)
+    return isInFamily
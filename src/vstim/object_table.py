@@ -0,0 +1,175 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from vstim.tdr import nFixationPointAppearances
+from vstim.trial_table import (
+    TrialTable,
+    _PackedObjects,
+    _pack_objects,
+    _to_arrow_array,
+)
+
+
+@dataclass
+class ObjectTable:
+    """The $OH1 object headers of many trials as columns with one row per object.
+
+    `trialIndex` is the row of the trial in the `TrialTable` the objects were
+    taken from, so trial columns can be joined with e.g.
+    `trialTable.outcome[objects.trialIndex]`. The object type is stored as
+    `typeCode`, an index into `typeNames`.
+
+    `isActive`, `tAppearanceMS` and `tDisappearanceMS` come from the $OS1
+    subheader of object types with a parsed subheader (fixation points). The
+    times are padded with NaN to the same number of appearances, unused
+    appearances keep the -1000 ms written by VStim, and objects without a
+    parsed subheader have isActive False and only NaN times. Without any
+    parsed subheader the times have the width of the $OS1 of a fixation point.
+    """
+
+    trialIndex: np.ndarray
+    trialNumber: np.ndarray
+    objectNumber: np.ndarray
+    show: np.ndarray
+    xPos: np.ndarray
+    yPos: np.ndarray
+    zPos: np.ndarray
+    rotX: np.ndarray
+    rotY: np.ndarray
+    rotZ: np.ndarray
+    typeCode: np.ndarray
+    typeNames: list[str]
+    isActive: np.ndarray
+    tAppearanceMS: np.ndarray
+    tDisappearanceMS: np.ndarray
+
+    _columns = (
+        "trialIndex",
+        "trialNumber",
+        "objectNumber",
+        "show",
+        "xPos",
+        "yPos",
+        "zPos",
+        "rotX",
+        "rotY",
+        "rotZ",
+        "typeCode",
+        "isActive",
+        "tAppearanceMS",
+        "tDisappearanceMS",
+    )
+
+    @staticmethod
+    def from_trial_table(table: TrialTable) -> "ObjectTable":
+        """Builds the object table of the stimulus objects of a `TrialTable`."""
+        if isinstance(table.stimulusObjects, _PackedObjects):
+            packed = table.stimulusObjects.packed
+        else:
+            packed = _pack_objects(table.stimulusObjects)
+        nObjects = len(packed["objectNumber"])
+        counts = np.diff(packed["objectOffsets"])
+        trialIndex = np.repeat(np.arange(len(table), dtype=np.int64), counts)
+
+        # only few objects have parsed subheaders with times
+        timed = {
+            iObject: subheader
+            for iObject, subheaders in packed["subheaders"].items()
+            for subheader in subheaders
+            if getattr(subheader, "tAppearanceMS", None) is not None
+        }
+        # pyarrow has no fixed-size lists of width 0
+        width = max(
+            (len(h.tAppearanceMS) for h in timed.values()),
+            default=nFixationPointAppearances,
+        )
+        isActive = np.zeros(nObjects, dtype=bool)
+        tAppearanceMS = np.full((nObjects, width), np.nan)
+        tDisappearanceMS = np.full((nObjects, width), np.nan)
+        for iObject, subheader in timed.items():
+            isActive[iObject] = subheader.isActive
+            tAppearanceMS[iObject, : len(subheader.tAppearanceMS)] = (
+                subheader.tAppearanceMS
+            )
+            tDisappearanceMS[iObject, : len(subheader.tDisappearanceMS)] = (
+                subheader.tDisappearanceMS
+            )
+
+        pose = packed["pose"]
+        return ObjectTable(
+            trialIndex=trialIndex,
+            trialNumber=table.trialNumber[trialIndex],
+            objectNumber=packed["objectNumber"],
+            show=packed["show"],
+            xPos=pose[:, 0],
+            yPos=pose[:, 1],
+            zPos=pose[:, 2],
+            rotX=pose[:, 3],
+            rotY=pose[:, 4],
+            rotZ=pose[:, 5],
+            typeCode=packed["typeCodes"],
+            typeNames=list(packed["typeNames"]),
+            isActive=isActive,
+            tAppearanceMS=tAppearanceMS,
+            tDisappearanceMS=tDisappearanceMS,
+        )
+
+    def __len__(self) -> int:
+        return len(self.objectNumber)
+
+    @property
+    def typeName(self) -> np.ndarray:
+        """Returns the type name of each object as an object array."""
+        return np.array(self.typeNames, dtype=object)[self.typeCode]
+
+    def get_type_code(self, typeName: str) -> int:
+        """Returns the `typeCode` of a type name, -1 if no object has that type."""
+        if typeName not in self.typeNames:
+            return -1
+        return self.typeNames.index(typeName)
+
+    def with_type(self, typeName: str) -> "ObjectTable":
+        return self.select(self.typeCode == self.get_type_code(typeName))
+
+    def select(self, index) -> "ObjectTable":
+        """Returns the rows selected by a slice, index array or boolean mask."""
+        columns = {name: getattr(self, name)[index] for name in self._columns}
+        return ObjectTable(**columns, typeNames=self.typeNames)
+
+    def to_arrow(self):
+        """Returns the objects as a `pyarrow.Table` with a dictionary-encoded "typeName"."""
+        import pyarrow as pa
+
+        columns = {}
+        for name in self._columns:
+            if name == "typeCode":
+                columns["typeName"] = pa.DictionaryArray.from_arrays(
+                    pa.array(self.typeCode, type=pa.int32()),
+                    pa.array(self.typeNames, type=pa.string()),
+                )
+            else:
+                columns[name] = _to_arrow_array(getattr(self, name))
+        return pa.table(columns)
+
+    def to_dataframe(self):
+        """Returns the objects as a DataFrame with a categorical "typeName" column.
+
+        The appearance times are pyarrow-backed list columns, see
+        `TrialTable.to_dataframe()`.
+        """
+        import pandas as pd
+
+        columns = {}
+        for name in self._columns:
+            values = getattr(self, name)
+            if name == "typeCode":
+                columns["typeName"] = pd.Categorical.from_codes(
+                    values, categories=self.typeNames
+                )
+            elif values.ndim == 2:
+                array = _to_arrow_array(values)
+                columns[name] = pd.Series(array, dtype=pd.ArrowDtype(array.type))
+            else:
+                columns[name] = values
+        return pd.DataFrame(columns)
@@ -1,11 +1,28 @@
+from array import array
 from enum import Enum
+from typing import Callable, Iterable, Iterator
+import collections
+import contextlib
+import itertools
+import locale
+import mmap
+import os
 import pathlib
+import time
 import abc
 import warnings
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 import datetime
 
+import numpy as np
+
+from vstim.tdr_stats import TdrStats, stats_phase
+
 nIntervals = 20
+# number of trigger transition pairs in $TS1
+nTriggerTransitions = 48
+# number of appearance/disappearance pairs in the $OS1 of a fixation point
+nFixationPointAppearances = 8
 
 
 def remove_comment(line: str):
@@ -29,7 +46,7 @@ class HeaderId(Enum):
         return cls.UNKNOWN
 
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class Header(abc.ABC):
     id: HeaderId
     headerVersion: int
@@ -41,7 +58,7 @@ class Header(abc.ABC):
         pass
 
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class FileStartHeader(Header):
     id: HeaderId = HeaderId.FH1
     nLines: int = 5
@@ -79,8 +96,24 @@ class FileStartHeader(Header):
         return new
 
 
-@dataclass(kw_only=True)
-class FileEndHeader(Header): ...
+@dataclass(kw_only=True, slots=True)
+class FileEndHeader(Header):
+    id: HeaderId = HeaderId.FH2
+    nLines: int = 1
+    headerVersion: int = 1
+    # the lines after the header line, kept unparsed
+    lines: list[str] = field(default_factory=list)
+
+    @staticmethod
+    def from_lines(lines: list[str]):
+        id, nLines, version = lines[0].split()[:3]
+        new = FileEndHeader(
+            nLines=int(nLines),
+            headerVersion=int(version),
+            lines=[line.rstrip("\r\n") for line in lines[1:]],
+        )
+        assert new.id.value == id
+        return new
 
 
 class TrialOutcome(Enum):
@@ -141,7 +174,7 @@ class IntervalType(Enum):
     ResponseRequired = 3
 
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class TrialSubheader1(Header):
     id: HeaderId = HeaderId.TS1
     nLines: int = 1
@@ -149,8 +182,8 @@ class TrialSubheader1(Header):
     trialNumber: int = None
     tAbsTrialStart: str = None
     tRelTrialStartMIN: float = None
-    tPositiveTriggerTransitionMS: list[float] = None
-    tNegativeTriggerTransitionMS: list[float] = None
+    tPositiveTriggerTransitionMS: array = None
+    tNegativeTriggerTransitionMS: array = None
 
     @staticmethod
     def from_lines(lines: list[str]):
@@ -166,17 +199,21 @@ class TrialSubheader1(Header):
         new.tAbsTrialStart = tokens[4]
         new.tRelTrialStartMIN = float(tokens[5]) / 60.0 / 10000.0
 
-        new.tPositiveTriggerTransitionMS = [float(t) * 1000 for t in tokens[6::2]]
-        new.tNegativeTriggerTransitionMS = [float(t) * 1000 for t in tokens[7::2]]
+        new.tPositiveTriggerTransitionMS = array(
+            "d", [float(t) * 1000 for t in tokens[6::2]]
+        )
+        new.tNegativeTriggerTransitionMS = array(
+            "d", [float(t) * 1000 for t in tokens[7::2]]
+        )
         return new
 
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class TrialSubheader2(Header):
     id: HeaderId = HeaderId.TS2
     nLines: int = 1
     headerVersion: int = 1
-    tIntendedIntervalDurationMS: list[float] = None
+    tIntendedIntervalDurationMS: array = None
 
     @staticmethod
     def from_lines(lines: list[str]):
@@ -188,11 +225,13 @@ class TrialSubheader2(Header):
         assert new.nLines == int(nLines)
         assert new.headerVersion == int(version)
 
-        new.tIntendedIntervalDurationMS = [float(t) * 1000 for t in tokens[3:]]
+        new.tIntendedIntervalDurationMS = array(
+            "d", [float(t) * 1000 for t in tokens[3:]]
+        )
         return new
 
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class TrialSubheader3(Header):
     id: HeaderId = HeaderId.TS3
     nLines: int = 1
@@ -204,24 +243,23 @@ class TrialSubheader3(Header):
         tokens = lines[0].split()
         id, nLines, version = tokens[0:3]
 
-        assert TrialSubheader3.id.value == id
-        assert TrialSubheader3.nLines == int(nLines)
-        assert TrialSubheader3.headerVersion == int(version)
-
         new = TrialSubheader3(
             intervalType=[IntervalType(int(code)) for code in tokens[3:]]
         )
+        assert new.id.value == id
+        assert new.nLines == int(nLines)
+        assert new.headerVersion == int(version)
         return new
 
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class TrialSubheader4(Header):
     id: HeaderId = HeaderId.TS4
     nLines: int = 1
     headerVersion: int = 1
     signals: list[StartResponseSignalCode] = None
 
-    @dataclass
+    @dataclass(slots=True)
     class StartStopSignal:
         type: StartResponseSignalCode
         # interval of occurrence
@@ -253,7 +291,7 @@ class TrialSubheader4(Header):
         return new
 
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class TrialHeader(Header):
 
     id: HeaderId = HeaderId.TH1
@@ -280,14 +318,16 @@ class TrialHeader(Header):
 
     @staticmethod
     def from_lines(lines: list[str]):
-        # line 1
-        tokens = lines[0].split()
-        id, nLinesStr, version = tokens[0:3]
+        new = TrialHeader.from_header_line(lines[0])
+        for subheaderId, subheader in _parse_subheaders(lines[1:]).items():
+            setattr(new, _subheaderFieldNames[subheaderId], subheader)
+        return new
 
-        assert HeaderId.TH1.value == id
-        assert TrialHeader.headerVersion == int(version)
-        if int(version) >= 6:
-            assert TrialHeader.nLines == int(nLinesStr)
+    @staticmethod
+    def from_header_line(line: str):
+        """Parses the $TH1 line only, leaving the subheaders empty."""
+        tokens = line.split()
+        id, nLinesStr, version = tokens[0:3]
 
         new = TrialHeader(
             trialNumber=int(tokens[3]),
@@ -305,34 +345,43 @@ class TrialHeader(Header):
             intervalOfFrameLoss=int(tokens[15]),
             timeOfFrameLoss=float(tokens[16]),
         )
+        assert new.id.value == id
+        assert new.headerVersion == int(version)
+        if int(version) >= 6:
+            assert new.nLines == int(nLinesStr)
+        return new
 
-        # process subheaders
-        lines = lines[1:]
-        for iLine, line in enumerate(lines):
-            if not line.startswith("$"):
-                continue
-            subheaderIdStr, nLinesStr, subheaderVersion = line.split()[:3]
-            subheaderId = HeaderId(subheaderIdStr)
-            if subheaderId not in SubHeaderIdMap.keys():
-                continue
-            nLines = int(nLinesStr)
-            subheader = SubHeaderIdMap[subheaderId].from_lines(
-                lines[iLine : iLine + nLines]
-            )
-            match subheaderId:
-                case HeaderId.TS1:
-                    new.subheader1 = subheader
-                case HeaderId.TS2:
-                    new.subheader2 = subheader
-                case HeaderId.TS3:
-                    new.subheader3 = subheader
-                case HeaderId.TS4:
-                    new.subheader4 = subheader
 
-        return new
+_subheaderFieldNames = {
+    HeaderId.TS1: "subheader1",
+    HeaderId.TS2: "subheader2",
+    HeaderId.TS3: "subheader3",
+    HeaderId.TS4: "subheader4",
+}
 
 
-@dataclass(kw_only=True)
+def _parse_subheaders(
+    lines: list[str], subheaderIds: Iterable[HeaderId] | None = None
+) -> dict[HeaderId, Header]:
+    """Parses the $TS1-$TS4 subheaders (or only those in `subheaderIds`) of a $TH1 header."""
+    subheaders = {}
+    for iLine, line in enumerate(lines):
+        if not line.startswith("$"):
+            continue
+        subheaderIdStr, nLinesStr, subheaderVersion = line.split()[:3]
+        subheaderId = HeaderId(subheaderIdStr)
+        if subheaderId not in SubHeaderIdMap.keys():
+            continue
+        if subheaderIds is not None and subheaderId not in subheaderIds:
+            continue
+        nLines = int(nLinesStr)
+        subheaders[subheaderId] = SubHeaderIdMap[subheaderId].from_lines(
+            lines[iLine : iLine + nLines]
+        )
+    return subheaders
+
+
+@dataclass(kw_only=True, slots=True)
 class ObjectHeader(Header):
     # // header / # of lines / version / object# / show-hide / Xpos / Ypos / Zpos / RotX / RotY / RotZ / ObjTypeName
     id: HeaderId = HeaderId.OH1
@@ -379,21 +428,22 @@ class ObjectHeader(Header):
             if not new.typeName in ObjectTypeNameMap.keys():
                 continue
             nLines = int(nLines)
-            subheader = ObjectTypeNameMap[new.typeName]()
-            subheader.from_lines(lines[iLine : iLine + nLines])
+            subheader = ObjectTypeNameMap[new.typeName].from_lines(
+                lines[iLine : iLine + nLines]
+            )
             new.subheaders.append(subheader)
 
         return new
 
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class FixationPoint1(Header):
     id: HeaderId = HeaderId.OS1
     nLines: int = 1
     headerVersion: int = 1
     isActive: bool = None
-    tAppearanceMS: list[float] = None
-    tDisappearanceMS: list[float] = None
+    tAppearanceMS: array = None
+    tDisappearanceMS: array = None
 
     @staticmethod
     def from_lines(lines: list[str]) -> Header:
@@ -406,8 +456,8 @@ class FixationPoint1(Header):
         assert new.headerVersion == int(version)
 
         new.isActive = bool(int(tokens[3]))
-        new.tAppearanceMS = [float(t) * 1000 for t in tokens[4::2]]
-        new.tDisappearanceMS = [float(t) * 1000 for t in tokens[5::2]]
+        new.tAppearanceMS = array("d", [float(t) * 1000 for t in tokens[4::2]])
+        new.tDisappearanceMS = array("d", [float(t) * 1000 for t in tokens[5::2]])
         return new
 
 
@@ -430,7 +480,88 @@ SubHeaderIdMap: dict[HeaderId, type[Header]] = {
 }
 
 
-@dataclass
+def _fields_equal(header: Header, other: Header, headerClass: type[Header]) -> bool:
+    return all(
+        getattr(header, f.name) == getattr(other, f.name) for f in fields(headerClass)
+    )
+
+
+class LazyTrialHeader(TrialHeader):
+    """A $TH1 header whose subheaders are parsed on first access.
+
+    The $TH1 line itself is parsed immediately. The subheader fields are left
+    unset, so accessing one of them falls back to `__getattr__`, which parses
+    the subheader from the raw bytes and stores it in the field.
+    """
+
+    __slots__ = ("_raw", "_encoding")
+
+    @staticmethod
+    def from_bytes(raw: bytes, encoding: str) -> "LazyTrialHeader":
+        headerLine = raw.split(b"\n", 1)[0].decode(encoding)
+        header = TrialHeader.from_header_line(headerLine)
+        new = object.__new__(LazyTrialHeader)
+        for f in fields(TrialHeader):
+            if f.name not in _subheaderFieldNames.values():
+                setattr(new, f.name, getattr(header, f.name))
+        new._raw = raw
+        new._encoding = encoding
+        return new
+
+    def __getattr__(self, name: str):
+        subheaderIds = [
+            subheaderId
+            for subheaderId, fieldName in _subheaderFieldNames.items()
+            if fieldName == name
+        ]
+        if not subheaderIds or name.startswith("_"):
+            raise AttributeError(name)
+        lines = self._raw.decode(self._encoding).splitlines()[1:]
+        subheader = _parse_subheaders(lines, subheaderIds).get(subheaderIds[0])
+        setattr(self, name, subheader)
+        return subheader
+
+    def __eq__(self, other):
+        if not isinstance(other, TrialHeader):
+            return NotImplemented
+        return _fields_equal(self, other, TrialHeader)
+
+
+class LazyObjectHeader(ObjectHeader):
+    """An $OH1 header (with its subheaders) that is parsed on first attribute access."""
+
+    __slots__ = ("_raw", "_encoding")
+
+    @staticmethod
+    def from_bytes(raw: bytes, encoding: str) -> "LazyObjectHeader":
+        new = object.__new__(LazyObjectHeader)
+        new._raw = raw
+        new._encoding = encoding
+        return new
+
+    def __getattr__(self, name: str):
+        # only called for fields that are not set yet, i.e. before parsing
+        if name.startswith("_") or not hasattr(self, "_raw"):
+            raise AttributeError(name)
+        header = ObjectHeader.from_lines(self._raw.decode(self._encoding).splitlines())
+        for f in fields(ObjectHeader):
+            setattr(self, f.name, getattr(header, f.name))
+        del self._raw
+        return getattr(self, name)
+
+    def __eq__(self, other):
+        if not isinstance(other, ObjectHeader):
+            return NotImplemented
+        return _fields_equal(self, other, ObjectHeader)
+
+
+LazyHeaderIdMap: dict[HeaderId, type[Header]] = {
+    HeaderId.TH1: LazyTrialHeader,
+    HeaderId.OH1: LazyObjectHeader,
+}
+
+
+@dataclass(slots=True)
 class Trial:
     # from $TH1
     trialNumber: int = None
@@ -451,11 +582,11 @@ class Trial:
     # from $TS1
     tAbsTrialStart: str = None
     tRelTrialStartMIN: float = None
-    tPositiveTriggerTransitionMS: list[float] = None
-    tNegativeTriggerTransitionMS: list[float] = None
+    tPositiveTriggerTransitionMS: array = None
+    tNegativeTriggerTransitionMS: array = None
 
     # from $TS2
-    tIntendedIntervalDurationMS: list[float] = None
+    tIntendedIntervalDurationMS: array = None
 
     # from $TS3
     intervalType: IntervalType = None
@@ -503,14 +634,23 @@ class Trial:
 
     def get_trial_duration_after_start_signal(self) -> float | None:
         """Returns the duration of the trial from the end of the first interval waiting for a start signal in milliseconds."""
+        if IntervalType.WaitForStartSignal not in self.intervalType:
+            return None
         iFirstWaitForStartInterval = self.intervalType.index(
             IntervalType.WaitForStartSignal
         )
-        if iFirstWaitForStartInterval is None:
-            return None
 
-        intervalDurations = self.get_interval_durations()
-        return sum(intervalDurations[iFirstWaitForStartInterval + 1 :])
+        # intervals without valid trigger transitions are skipped
+        return sum(
+            t2 - t1
+            for iInterval, (t1, t2) in enumerate(
+                zip(
+                    self.tPositiveTriggerTransitionMS[:nIntervals],
+                    self.tNegativeTriggerTransitionMS[:nIntervals],
+                )
+            )
+            if iInterval > iFirstWaitForStartInterval and t1 > 0.0 and t2 > 0.0
+        )
 
     def get_interval_durations(self) -> list[float]:
         """Returns the durations of the intervals in milliseconds."""
@@ -524,25 +664,273 @@ class Trial:
         ]
 
 
-@dataclass
 class TdrFile:
-    filename: pathlib.Path
-    headers: list[Header]
+    """A TDR file and its headers.
+
+    If no headers are passed, they are read from `filename` on first access.
+    Single trials or slices of trials of such a file can be read without
+    parsing the whole file via `get_trial()` and `get_trials(slice)`, which
+    use the sidecar offset index (see `vstim.tdr_index`).
+    """
+
+    def __init__(
+        self,
+        filename: pathlib.Path,
+        headers: list[Header] | None = None,
+        stats: TdrStats | None = None,
+    ):
+        self.filename = filename
+        self.stats = stats
+        self._headers = headers
+        self._index = None
+        self._trials: list[Trial] | None = None
+        self._outcomeIndex: dict[TrialOutcome, list[int]] | None = None
+        self._conditionIndex = None
+        self._sortedStarts: tuple[np.ndarray, np.ndarray] | None = None
+        self._fileHeader: FileStartHeader | None = None
+        self._fileEndHeader: FileEndHeader | None = None
+        self._table = None
+
+    def __repr__(self) -> str:
+        return f"TdrFile(filename={self.filename!r})"
+
+    def __eq__(self, other) -> bool:
+        """Compares filename and headers like the former dataclass, reading the headers if needed."""
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return (self.filename, self.headers) == (other.filename, other.headers)
 
-    def get_trials(self) -> list[Trial]:
-        trials: list[Trial] = []
-        for header in self.headers:
-            if isinstance(header, TrialHeader):
-                trial = Trial()
-                trial.from_trial_header(header)
-                trials.append(trial)
-            if isinstance(header, ObjectHeader):
-                trials[-1].stimulusObjects.append(header)
+    @staticmethod
+    def from_table(
+        filename: pathlib.Path,
+        fileHeader: FileStartHeader | None,
+        table,
+        fileEndHeader: FileEndHeader | None = None,
+    ):
+        """Creates a file from a `TrialTable`, building its headers only on access.
+
+        The $FH1 and $FH2 headers are put before and after the trials, unless
+        they are None.
+        """
+        new = TdrFile(filename=filename)
+        new._fileHeader = fileHeader
+        new._fileEndHeader = fileEndHeader
+        new._table = table
+        return new
+
+    def get_file_header(self) -> FileStartHeader | None:
+        """Returns the $FH1 header without rebuilding the headers of a table-backed file."""
+        if self._fileHeader is None:
+            self._fileHeader = next(
+                (h for h in self.headers if isinstance(h, FileStartHeader)), None
+            )
+        return self._fileHeader
+
+    def get_file_end_header(self) -> FileEndHeader | None:
+        """Returns the $FH2 header, see `get_file_header()`."""
+        if self._headers is None and self._table is not None:
+            return self._fileEndHeader
+        return next(
+            (h for h in reversed(self.headers) if isinstance(h, FileEndHeader)), None
+        )
+
+    @property
+    def headers(self) -> list[Header]:
+        if self._headers is None and self._table is not None:
+            self._headers = [
+                h for h in (self._fileHeader,) if h is not None
+            ] + self._table.to_headers()
+            if self._fileEndHeader is not None:
+                self._headers.append(self._fileEndHeader)
+        if self._headers is None:
+            self._headers = read_tdr(self.filename).headers
+        return self._headers
+
+    @headers.setter
+    def headers(self, headers: list[Header]):
+        self._headers = headers
+        self.invalidate_cache()
+
+    def invalidate_cache(self):
+        """Drops the cached trials, needed after modifying `headers` in place."""
+        self._trials = None
+        self._outcomeIndex = None
+        self._conditionIndex = None
+        self._sortedStarts = None
+        # the headers replace the table and the file headers of a table-backed file
+        if self._headers is not None:
+            self._table = None
+            self._fileHeader = None
+            self._fileEndHeader = None
+
+    def _get_cached_trials(self) -> list[Trial]:
+        if self._trials is None and self._headers is None and self._table is not None:
+            with stats_phase(self.stats, "assemble"):
+                self._trials = self._table.get_trials()
+        if self._trials is None:
+            headers = self.headers
+            with stats_phase(self.stats, "assemble"):
+                self._trials = list(_assemble_trials(headers))
+        return self._trials
+
+    def _get_outcome_index(self) -> dict[TrialOutcome, list[int]]:
+        """Returns the indices of the trials with each outcome, in file order."""
+        if self._outcomeIndex is None:
+            # use the $TH1 headers directly, so lazy subheaders remain unparsed
+            if self._headers is None and self._table is not None:
+                outcomes = [TrialOutcome(code) for code in self._table.outcome.tolist()]
+            else:
+                outcomes = [
+                    h.outcome for h in self.headers if isinstance(h, TrialHeader)
+                ]
+            self._outcomeIndex = {outcome: [] for outcome in TrialOutcome}
+            for iTrial, outcome in enumerate(outcomes):
+                self._outcomeIndex[outcome].append(iTrial)
+        return self._outcomeIndex
+
+    def get_condition_index(self):
+        """Returns the trials grouped by stimulusNumber, timeSequence and outcome.
+
+        The `ConditionIndex` is built once, its `sessionKeys` holds the session
+        key of the file (see `vstim.tdr_dataset.get_session_key()`).
+        """
+        from vstim.condition_index import ConditionIndex
+        from vstim.tdr_dataset import get_session_key
+
+        if self._conditionIndex is None:
+            fileHeader = self.get_file_header()
+            sessionKey = (
+                str(self.filename)
+                if fileHeader is None
+                else get_session_key(fileHeader)
+            )
+            self._conditionIndex = ConditionIndex.from_table(
+                self.to_table(), sessionKeys=[sessionKey]
+            )
+        return self._conditionIndex
+
+    def get_index(self):
+        """Returns the `TrialIndex` of the file, loading or creating its sidecar file."""
+        from vstim.tdr_index import load_trial_index
+
+        if self._index is None:
+            self._index = load_trial_index(self.filename)
+        return self._index
+
+    def _get_unassembled_table(self):
+        """Returns the table of a table-backed file whose trials are not built yet, else None.
+
+        Single trials are then built from their table rows instead of
+        building all trials.
+        """
+        if self._trials is None and self._headers is None:
+            return self._table
+        return None
+
+    def get_trial(self, n: int) -> Trial:
+        """Returns the n-th trial of the file (not the trial with trialNumber n)."""
+        table = self._get_unassembled_table()
+        if table is not None:
+            return table.get_trial(range(len(table))[n])
+        if self._headers is not None or self._table is not None:
+            return self._get_cached_trials()[n]
+        return self.get_trials(slice(n, n + 1 if n != -1 else None))[0]
+
+    def get_trials(self, trials: slice | None = None) -> list[Trial]:
+        if trials is None:
+            return list(self._get_cached_trials())
+        table = self._get_unassembled_table()
+        if table is not None:
+            return [table.get_trial(i) for i in range(len(table))[trials]]
+        if self._headers is not None or self._table is not None:
+            return self._get_cached_trials()[trials]
+
+        from vstim.tdr_index import read_indexed_trials
+
+        return read_indexed_trials(self.filename, self.get_index(), trials)
+
+    def get_trial_start_times(self) -> np.ndarray:
+        """Returns `tRelTrialStartMIN` of each trial in file order.
+
+        For a file that is not parsed yet, the start times are taken from the
+        sidecar index instead of parsing the trials, for a table-backed file
+        from its table.
+        """
+        if self._headers is None and self._table is not None:
+            return self._table.tRelTrialStartMIN
+        if self._headers is not None:
+            return np.array(
+                [trial.tRelTrialStartMIN for trial in self._get_cached_trials()],
+                dtype=np.float64,
+            )
+        return self.get_index().tRelTrialStartMIN
+
+    def _get_sorted_starts(self) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the sorted start times and the trial of each."""
+        if self._sortedStarts is None:
+            startTimes = self.get_trial_start_times()
+            order = np.argsort(startTimes, kind="stable")
+            self._sortedStarts = (startTimes[order], order)
+        return self._sortedStarts
+
+    def _get_rows(self, rows: np.ndarray) -> list[Trial]:
+        if len(rows) == 0:
+            return []
+        table = self._get_unassembled_table()
+        if table is not None:
+            return [table.get_trial(iRow) for iRow in rows.tolist()]
+        if rows[-1] - rows[0] == len(rows) - 1:
+            return self.get_trials(slice(int(rows[0]), int(rows[-1]) + 1))
+        if self._headers is not None or self._table is not None:
+            trials = self._get_cached_trials()
+            return [trials[iRow] for iRow in rows.tolist()]
+
+        from vstim.tdr_index import read_indexed_trials
+
+        return read_indexed_trials(self.filename, self.get_index(), rows)
+
+    def trials_between(self, t0: float, t1: float) -> list[Trial]:
+        """Returns the trials with t0 <= tRelTrialStartMIN < t1 (in minutes) in file order.
+
+        The trials are found by binary search in the sorted start times, so
+        for a file that is not parsed yet only the matching trials are parsed,
+        see `get_trials()`.
+        """
+        sortedStarts, order = self._get_sorted_starts()
+        start, end = np.searchsorted(sortedStarts, [t0, t1], side="left")
+        return self._get_rows(np.sort(order[start:end]))
+
+    def trial_at(self, t: float) -> Trial | None:
+        """Returns the last trial that started at or before minute `t`, None if there is none."""
+        sortedStarts, order = self._get_sorted_starts()
+        iSorted = int(np.searchsorted(sortedStarts, t, side="right")) - 1
+        if iSorted < 0:
+            return None
+        return self.get_trial(int(order[iSorted]))
+
+    def to_table(self):
+        """Returns the trials as a columnar `TrialTable` of NumPy arrays."""
+        from vstim.trial_table import TrialTable
 
-        return trials
+        if self._table is None:
+            self._table = TrialTable.from_headers(self.headers)
+        return self._table
+
+    def to_object_table(self):
+        """Returns the $OH1 headers of all trials as an `ObjectTable` with one row per object."""
+        from vstim.object_table import ObjectTable
+
+        return ObjectTable.from_trial_table(self.to_table())
 
     def get_trials_with_outcome(self, outcomes: list[TrialOutcome]) -> list[Trial]:
-        return [trial for trial in self.get_trials() if trial.outcome in outcomes]
+        trials = self._get_cached_trials()
+        outcomeIndex = self._get_outcome_index()
+        iTrials = sorted(
+            iTrial
+            for outcome in set(outcomes)
+            for iTrial in outcomeIndex.get(outcome, [])
+        )
+        return [trials[iTrial] for iTrial in iTrials]
 
     def get_hits(self) -> list[Trial]:
         return self.get_trials_with_outcome([TrialOutcome.Hit])
@@ -572,15 +960,24 @@ class TdrFile:
         return self.get_trials_with_outcome([TrialOutcome.WrongStartSignal])
 
     def get_outcome_counts(self) -> dict[str, int]:
-        return {
-            outcome.name: len(self.get_trials_with_outcome([outcome]))
-            for outcome in TrialOutcome
-        }
+        outcomeIndex = self._get_outcome_index()
+        return {outcome.name: len(outcomeIndex[outcome]) for outcome in TrialOutcome}
 
     def get_trials_as_dataframe(self):
+        """Returns one row per `Trial`, with enums and lists as Python objects.
+
+        For large files `to_table().to_dataframe()` is much faster and returns
+        typed columns instead.
+        """
         import pandas as pd
 
-        df = pd.DataFrame([vars(trial) for trial in self.get_trials()])
+        trials = self._get_cached_trials()
+        df = pd.DataFrame(
+            [
+                {f.name: getattr(trial, f.name) for f in fields(Trial)}
+                for trial in trials
+            ]
+        )
         df.tRelTrialStartMIN = pd.to_timedelta(df.tRelTrialStartMIN, unit="min")
         df.set_index("tRelTrialStartMIN", inplace=True)
 
@@ -588,47 +985,434 @@ class TdrFile:
         df["outcome"] = df["outcome"].astype("category")
 
         # add column with trial duration
-        df["trialDurationMS"] = [
-            trial.get_trial_duration() for trial in self.get_trials()
-        ]
+        df["trialDurationMS"] = self.to_table().get_trial_durations()
 
         return df
 
 
-def read_tdr(filename: pathlib.Path) -> TdrFile:
-    with open(filename, "r") as file:
-        lines: list[str] = file.readlines()
+def _parse_headers(lines: Iterable[str]) -> Iterator[Header]:
+    """Parses the top-level headers from an iterable of lines.
 
-    headers: list[Header] = []
-    for iLine, line in enumerate(lines):
+    Only the lines of the header currently being parsed are kept in memory.
+    """
+    lines = iter(lines)
+    window: collections.deque[str] = collections.deque()
+    while True:
+        if not window:
+            line = next(lines, None)
+            if line is None:
+                return
+            window.append(line)
+
+        line = window[0]
         # only handle start of headers
-        if not line.startswith("$"):
-            continue
+        if line.startswith("$"):
+            header = _parse_header_at(line, window, lines)
+            if header is not None:
+                yield header
+        window.popleft()
 
-        line = remove_comment(line)
 
-        headerId, nLines, headerVersion = line.split()[:3]
-        nLines = int(nLines)
+def _parse_header_at(
+    line: str, window: collections.deque[str], lines: Iterator[str]
+) -> Header | None:
+    line = remove_comment(line)
 
-        header_enum = HeaderId(headerId)
+    headerId, nLines, headerVersion = line.split()[:3]
+    nLines = int(nLines)
 
-        # workaround for VStim bug #210: reported nLines is in fact 5, not 4 as reported
-        if headerId == HeaderId.TH1.value and int(headerVersion) == 5:
-            nLines = 5
+    header_enum = HeaderId(headerId)
+
+    # workaround for VStim bug #210: reported nLines is in fact 5, not 4 as reported
+    if headerId == HeaderId.TH1.value and int(headerVersion) == 5:
+        nLines = 5
+
+    # subheaders are handled within header objects
+    if header_enum in SubHeaderIdMap.keys():
+        return None
+
+    if header_enum == HeaderId.UNKNOWN:
+        warnings.warn(f"Unknown header {headerId}", category=UserWarning)
+        return None
+
+    if header_enum not in HeaderIdMap.keys():
+        return None
+
+    while len(window) < nLines:
+        nextLine = next(lines, None)
+        if nextLine is None:
+            break
+        window.append(nextLine)
+    return HeaderIdMap[header_enum].from_lines(
+        list(itertools.islice(window, 0, nLines))
+    )
 
-        # subheaders are handled within header objects
-        if headerId in SubHeaderIdMap.keys():
-            continue
 
-        if header_enum == HeaderId.UNKNOWN:
-            warnings.warn(f"Unknown header {headerId}", category=UserWarning)
+def _assemble_trials(headers: Iterable[Header]) -> Iterator[Trial]:
+    """Combines each $TH1 header with the $OH1 headers following it into a `Trial`."""
+    trial: Trial | None = None
+    for header in headers:
+        if isinstance(header, TrialHeader):
+            if trial is not None:
+                yield trial
+            trial = Trial()
+            trial.from_trial_header(header)
+        if isinstance(header, ObjectHeader) and trial is not None:
+            trial.stimulusObjects.append(header)
+
+    if trial is not None:
+        yield trial
+
+
+def iter_tdr_headers(filename: pathlib.Path) -> Iterator[Header]:
+    """Yields the headers of a TDR file one by one while reading it incrementally."""
+    with open(filename, "r") as file:
+        yield from _parse_headers(file)
+
+
+def make_trial_filter(
+    outcomes: Iterable[TrialOutcome] | None = None,
+    stimuli: Iterable[int] | None = None,
+    trial_range: range | None = None,
+    where: Callable[[TrialHeader], bool] | None = None,
+) -> Callable[[TrialHeader], bool] | None:
+    """Combines conditions on the $TH1 fields of a trial into one function.
+
+    A trial matches if its outcome is in `outcomes`, its stimulusNumber in
+    `stimuli`, its trialNumber in `trial_range` (e.g. `range(100, 200)`) and
+    `where(header)` is true, skipping the conditions that are None. Returns
+    None if there are no conditions.
+    """
+    if outcomes is None and stimuli is None and trial_range is None:
+        return where
+    outcomes = None if outcomes is None else frozenset(outcomes)
+    stimuli = None if stimuli is None else frozenset(stimuli)
+
+    def matches(header: TrialHeader) -> bool:
+        return (
+            (outcomes is None or header.outcome in outcomes)
+            and (stimuli is None or header.stimulusNumber in stimuli)
+            and (trial_range is None or header.trialNumber in trial_range)
+            and (where is None or where(header))
+        )
+
+    return matches
+
+
+def iter_tdr_trials(
+    filename: pathlib.Path,
+    outcomes: Iterable[TrialOutcome] | None = None,
+    stimuli: Iterable[int] | None = None,
+    trial_range: range | None = None,
+    where: Callable[[TrialHeader], bool] | None = None,
+) -> Iterator[Trial]:
+    """Yields the trials of a TDR file one by one while reading it incrementally.
+
+    A trial is yielded together with its stimulus objects as soon as the next
+    $TH1 header (or the end of the file) is reached.
+
+    Only the trials matching the conditions are yielded, see
+    `make_trial_filter()`. The conditions are checked on the $TH1 line alone,
+    so the subheaders and object headers of other trials are never decoded.
+    """
+    where = make_trial_filter(outcomes, stimuli, trial_range, where)
+    if where is None:
+        yield from _assemble_trials(iter_tdr_headers(filename))
+        return
+
+    encoding = locale.getpreferredencoding(False)
+    with _map_tdr(filename) as data:
+        for start, end in _iter_trial_ranges(data, 10_000):
+            chunk = data[start:end]
+            index = _select_trials(chunk, scan_tdr(chunk), encoding, where)
+            yield from _assemble_trials(_decode_headers(chunk, index, encoding))
+
+
+# byte offset, end offset (exclusive), id and number of lines of each header
+HeaderIndexDtype = np.dtype(
+    [
+        ("offset", np.int64),
+        ("end", np.int64),
+        ("headerId", "S8"),
+        ("nLines", np.int32),
+    ]
+)
+
+
+@contextlib.contextmanager
+def _map_tdr(filename: pathlib.Path):
+    """Memory-maps a TDR file read-only (empty files are returned as empty bytes)."""
+    with open(filename, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield data
+
+
+def scan_tdr(data: bytes | mmap.mmap) -> np.ndarray:
+    """Locates all headers in the raw bytes of a TDR file without decoding any lines.
+
+    Returns a structured array of `HeaderIndexDtype` with one entry per line
+    starting with "$". `end` is the byte offset after the last line of the header.
+    """
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    newlines = np.flatnonzero(buffer == ord("\n"))
+    dollars = np.flatnonzero(buffer == ord("$"))
+    isLineStart = dollars == 0
+    isLineStart[dollars > 0] |= buffer[dollars[dollars > 0] - 1] == ord("\n")
+    offsets = dollars[isLineStart]
+
+    # first line of each header, limited to the id, nLines and version tokens
+    iHeaderLine = np.searchsorted(newlines, offsets)
+    lineEnds = np.append(newlines, len(buffer))[iHeaderLine]
+    tokens = [
+        data[offset:lineEnd].split(maxsplit=3)[:3]
+        for offset, lineEnd in zip(
+            offsets.tolist(), np.minimum(lineEnds, offsets + 64).tolist()
+        )
+    ]
+
+    index = np.empty(len(offsets), dtype=HeaderIndexDtype)
+    index["offset"] = offsets
+    index["headerId"] = [t[0] for t in tokens]
+    index["nLines"] = [int(t[1]) for t in tokens]
+
+    # workaround for VStim bug #210: reported nLines is in fact 5, not 4 as reported
+    isBuggyTH1 = np.array(
+        [t[0] == b"$TH1" and int(t[2]) == 5 for t in tokens], dtype=bool
+    )
+    index["nLines"][isBuggyTH1] = 5
+
+    iLastLine = iHeaderLine + np.maximum(index["nLines"], 1) - 1
+    index["end"] = np.append(newlines + 1, len(buffer))[
+        np.minimum(iLastLine, len(newlines))
+    ]
+    return index
+
+
+def _iter_trial_ranges(
+    data: bytes | mmap.mmap, nTrials: int
+) -> Iterator[tuple[int, int]]:
+    """Yields byte ranges of `data` with up to `nTrials` complete trials each.
+
+    Ranges start at a $TH1 line, except the first one, which starts at 0 and
+    thus includes the file header. Only the $TH1 lines are searched, so this
+    is much cheaper than `scan_tdr()` on the whole file.
+    """
+    # offset of the first trial
+    startsWithTrial = data[:4] == b"$TH1"
+    end = 0 if startsWithTrial else data.find(b"\n$TH1") + 1
+    if end == 0 and not startsWithTrial:
+        return
+    start = 0
+    while end < len(data):
+        for _ in range(nTrials):
+            iNext = data.find(b"\n$TH1", end + 1)
+            end = len(data) if iNext < 0 else iNext + 1
+            if end == len(data):
+                break
+        yield start, end
+        start = end
+
+
+def _select_trials(
+    data: bytes | mmap.mmap,
+    index: np.ndarray,
+    encoding: str,
+    where: Callable[[TrialHeader], bool],
+) -> np.ndarray:
+    """Removes the headers of the trials not matching `where` from a `scan_tdr()` index.
+
+    Only the first line of each $TH1 header is decoded to call `where`, the
+    headers before the first trial are kept.
+    """
+    isTrial = index["headerId"] == b"$TH1"
+    isSelected = [True]
+    for offset, end in zip(
+        index["offset"][isTrial].tolist(), index["end"][isTrial].tolist()
+    ):
+        lineEnd = data.find(b"\n", offset, end)
+        line = data[offset : end if lineEnd < 0 else lineEnd].decode(encoding)
+        isSelected.append(where(TrialHeader.from_header_line(line)))
+    # trial of each header, 0 for the headers before the first trial
+    iTrial = np.cumsum(isTrial)
+    return index[np.array(isSelected, dtype=bool)[iTrial]]
+
+
+def _split_trial_ranges(data: bytes | mmap.mmap, nRanges: int) -> list[tuple[int, int]]:
+    """Splits `data` into up to `nRanges` byte ranges of similar size.
+
+    Like in `_iter_trial_ranges()`, each range but the first starts at a $TH1
+    line, so every object header stays in the range of its trial.
+    """
+    boundaries = [0]
+    for iRange in range(1, nRanges):
+        iNext = data.find(b"\n$TH1", max(len(data) * iRange // nRanges, boundaries[-1]))
+        if iNext < 0:
+            break
+        boundaries.append(iNext + 1)
+    boundaries.append(len(data))
+    return [
+        (start, end)
+        for start, end in zip(boundaries[:-1], boundaries[1:])
+        if end > start
+    ]
+
+
+def _decode_headers(
+    data: bytes | mmap.mmap,
+    index: np.ndarray,
+    encoding: str,
+    lazy: bool = False,
+    stats: TdrStats | None = None,
+) -> Iterator[Header]:
+    """Parses the top-level headers of a scanned TDR file, decoding only their bytes.
+
+    With `lazy`, $TH1 subheaders and $OH1 headers are kept as raw bytes and
+    parsed on first access, see `LazyTrialHeader` and `LazyObjectHeader`.
+    """
+    headerIds = np.array([h.value.encode() for h in HeaderIdMap.keys()], dtype="S8")
+    knownIds = np.array([h.value.encode() for h in HeaderId], dtype="S8")
+    for headerId in np.unique(index["headerId"][~np.isin(index["headerId"], knownIds)]):
+        warnings.warn(f"Unknown header {headerId.decode()}", category=UserWarning)
+
+    index = index[np.isin(index["headerId"], headerIds)]
+    if stats is not None:
+        yield from _decode_headers_with_stats(data, index, encoding, lazy, stats)
+        return
+
+    for offset, end, headerId in zip(
+        index["offset"].tolist(), index["end"].tolist(), index["headerId"].tolist()
+    ):
+        header_enum = HeaderId(headerId.decode())
+        if lazy and header_enum in LazyHeaderIdMap.keys():
+            yield LazyHeaderIdMap[header_enum].from_bytes(data[offset:end], encoding)
             continue
+        lines = data[offset:end].decode(encoding).splitlines()
+        yield HeaderIdMap[header_enum].from_lines(lines)
+
+
+def _decode_headers_with_stats(
+    data: bytes | mmap.mmap,
+    index: np.ndarray,
+    encoding: str,
+    lazy: bool,
+    stats: TdrStats,
+) -> Iterator[Header]:
+    """Same as the loop of `_decode_headers()`, but timing every header."""
+    identifySeconds = 0.0
+    splitSeconds = 0.0
+    parseSeconds = 0.0
+    nBytes = 0
+    for offset, end, headerId in zip(
+        index["offset"].tolist(), index["end"].tolist(), index["headerId"].tolist()
+    ):
+        tStart = time.perf_counter()
+        header_enum = HeaderId(headerId.decode())
+        tIdentify = time.perf_counter()
+        if lazy and header_enum in LazyHeaderIdMap.keys():
+            tSplit = tIdentify
+            header = LazyHeaderIdMap[header_enum].from_bytes(data[offset:end], encoding)
+        else:
+            lines = data[offset:end].decode(encoding).splitlines()
+            tSplit = time.perf_counter()
+            header = HeaderIdMap[header_enum].from_lines(lines)
+        tEnd = time.perf_counter()
+
+        identifySeconds += tIdentify - tStart
+        splitSeconds += tSplit - tIdentify
+        parseSeconds += tEnd - tSplit
+        nBytes += end - offset
+        stats.add_header(header_enum.value, tEnd - tStart, end - offset)
+        yield header
+
+    stats.add_phase("identify", identifySeconds, nBytes, count=len(index))
+    stats.add_phase("split", splitSeconds, nBytes, count=len(index))
+    stats.add_phase("parse", parseSeconds, nBytes, count=len(index))
+
+
+def read_file_header(filename: pathlib.Path) -> FileStartHeader:
+    """Reads only the $FH1 header at the start of a TDR file."""
+    encoding = locale.getpreferredencoding(False)
+    with open(filename, "r", encoding=encoding) as file:
+        lines = [
+            line.rstrip("\r\n")
+            for line in itertools.islice(file, FileStartHeader().nLines)
+        ]
+    return FileStartHeader.from_lines(lines)
+
+
+def open_tdr(filename: pathlib.Path) -> TdrFile:
+    """Opens a TDR file without parsing it, see `TdrFile`."""
+    return TdrFile(filename=filename)
+
+
+def read_tdr(
+    filename: pathlib.Path,
+    cache_dir: pathlib.Path | None = None,
+    hash_content: bool = False,
+    lazy: bool = False,
+    stats: TdrStats | None = None,
+    workers: int | None = None,
+    where: Callable[[TrialHeader], bool] | None = None,
+) -> TdrFile:
+    """Reads and parses a TDR file.
+
+    If `cache_dir` is given, the parsed file is stored there in a compact binary
+    form and loaded from it as long as the file is unchanged, see
+    `vstim.tdr_cache.read_tdr_cached()`.
+
+    With `lazy`, only the $TH1 lines are parsed immediately. Subheaders and
+    object headers are parsed when first accessed, which makes e.g. outcome
+    summaries of large files much cheaper.
+
+    If a `TdrStats` is passed as `stats`, the time spent in each loading phase
+    and for each header id is added to it.
+
+    With `workers` > 1, the file is split into chunks at $TH1 lines that are
+    parsed in a process pool, see `vstim.batch.read_tdr_parallel()`.
+
+    With `where`, only the trials for which `where(header)` is true are read.
+    It is called with a `TrialHeader` of only the $TH1 line, the subheaders
+    and object headers of the other trials are skipped without decoding them.
+    `make_trial_filter()` builds `where` for common conditions, e.g.
+    `where=make_trial_filter(outcomes=[TrialOutcome.Hit])`.
+
+    `lazy` and `where` are not supported together with `cache_dir` or
+    `workers` > 1, as these return a file backed by a parsed `TrialTable`,
+    and raise ValueError.
+    """
+    isTableBacked = cache_dir is not None or (workers is not None and workers > 1)
+    if isTableBacked and (lazy or where is not None):
+        raise ValueError("lazy and where are not supported with cache_dir or workers")
+    if cache_dir is not None:
+        from vstim.tdr_cache import read_tdr_cached
+
+        return read_tdr_cached(
+            filename,
+            cache_dir,
+            hash_content=hash_content,
+            stats=stats,
+            workers=workers,
+        )
+
+    if workers is not None and workers > 1:
+        from vstim.batch import read_tdr_parallel
+
+        return read_tdr_parallel(filename, workers, stats=stats)
 
-        if header_enum in HeaderIdMap.keys():
-            header = HeaderIdMap[header_enum].from_lines(lines[iLine : iLine + nLines])
-            headers.append(header)
+    with _map_tdr(filename) as data:
+        encoding = locale.getpreferredencoding(False)
+        with stats_phase(stats, "scan", len(data)):
+            index = scan_tdr(data)
+        if where is not None:
+            with stats_phase(stats, "select"):
+                index = _select_trials(data, index, encoding, where)
+        headers = list(_decode_headers(data, index, encoding, lazy=lazy, stats=stats))
 
     return TdrFile(
         headers=headers,
         filename=filename,
+        stats=stats,
     )
@@ -0,0 +1,261 @@
+import dataclasses
+import datetime
+import hashlib
+import json
+import os
+import pathlib
+from array import array
+
+import numpy as np
+
+from vstim.tdr import (
+    FileEndHeader,
+    FileStartHeader,
+    ObjectTypeNameMap,
+    TdrFile,
+    read_tdr,
+)
+from vstim.tdr_stats import TdrStats, stats_phase
+from vstim.trial_table import TrialTable, _PackedObjects, _pack_objects
+
+cacheVersion = 4
+defaultMaxCacheBytes = 2**30
+
+
+def get_cache_key(filename: pathlib.Path, hash_content: bool = False) -> str:
+    """Returns the cache key of a TDR file from its path, size and modification time.
+
+    With `hash_content` the SHA-256 of the file content is included as well,
+    which detects changes that keep size and modification time.
+    """
+    filename = pathlib.Path(filename).resolve()
+    stat = os.stat(filename)
+    key = hashlib.sha256(
+        f"{cacheVersion}|{filename}|{stat.st_size}|{stat.st_mtime_ns}".encode()
+    )
+    if hash_content:
+        with open(filename, "rb") as file:
+            for chunk in iter(lambda: file.read(2**20), b""):
+                key.update(chunk)
+    return key.hexdigest()
+
+
+def _file_header_to_dict(header: FileStartHeader | None) -> dict | None:
+    if header is None:
+        return None
+    return {
+        "vstimVersion": header.vstimVersion,
+        "tdrVersion": header.tdrVersion,
+        "date": header.date.isoformat(),
+        "startTime": header.startTime.isoformat(),
+        "refreshRate": header.refreshRate,
+        "iniFile": header.iniFile,
+    }
+
+
+def _file_header_from_dict(values: dict | None) -> FileStartHeader | None:
+    if values is None:
+        return None
+    return FileStartHeader(
+        vstimVersion=values["vstimVersion"],
+        tdrVersion=values["tdrVersion"],
+        date=datetime.date.fromisoformat(values["date"]),
+        startTime=datetime.time.fromisoformat(values["startTime"]),
+        refreshRate=values["refreshRate"],
+        iniFile=values["iniFile"],
+    )
+
+
+def _file_end_header_to_dict(header: FileEndHeader | None) -> dict | None:
+    if header is None:
+        return None
+    return {
+        "nLines": header.nLines,
+        "headerVersion": header.headerVersion,
+        "lines": header.lines,
+    }
+
+
+def _file_end_header_from_dict(values: dict | None) -> FileEndHeader | None:
+    if values is None:
+        return None
+    return FileEndHeader(**values)
+
+
+def _to_json_value(value):
+    return value.tolist() if isinstance(value, array) else value
+
+
+def _subheaders_to_dict(subheaders: dict) -> dict:
+    return {
+        str(iObject): [
+            {
+                "type": type(header).__name__,
+                "fields": {
+                    f.name: _to_json_value(getattr(header, f.name))
+                    for f in dataclasses.fields(header)
+                    if f.name != "id"
+                },
+            }
+            for header in headers
+        ]
+        for iObject, headers in subheaders.items()
+    }
+
+
+def _subheaders_from_dict(values: dict) -> dict:
+    headerTypes = {t.__name__: t for t in ObjectTypeNameMap.values()}
+
+    def from_dict(header: dict):
+        headerType = headerTypes[header["type"]]
+        # array('d') fields are stored as JSON lists
+        arrayFields = {
+            f.name for f in dataclasses.fields(headerType) if f.type is array
+        }
+        return headerType(
+            **{
+                name: array("d", value) if name in arrayFields else value
+                for name, value in header["fields"].items()
+            }
+        )
+
+    return {
+        int(iObject): [from_dict(header) for header in headers]
+        for iObject, headers in values.items()
+    }
+
+
+def save_cache_entry(
+    cache_dir: pathlib.Path,
+    key: str,
+    fileHeader: FileStartHeader | None,
+    table: TrialTable,
+    fileEndHeader: FileEndHeader | None = None,
+):
+    """Writes a parsed TDR file as <key>.npz (columns) and <key>.json (metadata).
+
+    Headers of unknown type (e.g. $EC1) are not stored.
+    """
+    cache_dir = pathlib.Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    if isinstance(table.stimulusObjects, _PackedObjects):
+        objects = table.stimulusObjects.packed
+    else:
+        objects = _pack_objects(table.stimulusObjects)
+    columns = {
+        name: getattr(table, name)
+        for name in table._trialColumns + table._signalColumns + ("signalOffsets",)
+    }
+    columns.update(
+        {
+            f"object_{name}": value
+            for name, value in objects.items()
+            if isinstance(value, np.ndarray)
+        }
+    )
+    metadata = {
+        "version": cacheVersion,
+        "fileHeader": _file_header_to_dict(fileHeader),
+        "fileEndHeader": _file_end_header_to_dict(fileEndHeader),
+        "typeNames": objects["typeNames"],
+        "subheaders": _subheaders_to_dict(objects["subheaders"]),
+    }
+
+    # the .json file is written last and marks the entry as complete
+    tmpNpz = cache_dir / f"{key}.npz.tmp"
+    with open(tmpNpz, "wb") as file:
+        np.savez(file, **columns)
+    os.replace(tmpNpz, cache_dir / f"{key}.npz")
+    tmpJson = cache_dir / f"{key}.json.tmp"
+    tmpJson.write_text(json.dumps(metadata))
+    os.replace(tmpJson, cache_dir / f"{key}.json")
+
+
+def load_cache_entry(
+    cache_dir: pathlib.Path, key: str
+) -> tuple[FileStartHeader | None, TrialTable, FileEndHeader | None] | None:
+    """Loads a cache entry written by `save_cache_entry()`, or None if there is none."""
+    jsonFilename = pathlib.Path(cache_dir) / f"{key}.json"
+    npzFilename = pathlib.Path(cache_dir) / f"{key}.npz"
+    try:
+        metadata = json.loads(jsonFilename.read_text())
+        if metadata["version"] != cacheVersion:
+            return None
+        with np.load(npzFilename) as data:
+            columns = {name: data[name] for name in data.files}
+    except (OSError, ValueError, KeyError):
+        return None
+
+    # mark entry as recently used for the eviction policy
+    os.utime(jsonFilename)
+
+    objects = {
+        name.removeprefix("object_"): columns.pop(name)
+        for name in list(columns)
+        if name.startswith("object_")
+    }
+    objects["typeNames"] = metadata["typeNames"]
+    objects["subheaders"] = _subheaders_from_dict(metadata["subheaders"])
+    table = TrialTable(**columns, stimulusObjects=_PackedObjects(objects))
+    return (
+        _file_header_from_dict(metadata["fileHeader"]),
+        table,
+        _file_end_header_from_dict(metadata["fileEndHeader"]),
+    )
+
+
+def evict_cache(cache_dir: pathlib.Path, max_bytes: int = defaultMaxCacheBytes):
+    """Deletes the least recently used entries until the cache is at most `max_bytes`."""
+    entries = []
+    for jsonFilename in pathlib.Path(cache_dir).glob("*.json"):
+        npzFilename = jsonFilename.with_suffix(".npz")
+        try:
+            size = jsonFilename.stat().st_size + npzFilename.stat().st_size
+            entries.append((jsonFilename.stat().st_mtime_ns, size, jsonFilename))
+        except OSError:
+            continue
+
+    totalBytes = sum(size for _, size, _ in entries)
+    for _, size, jsonFilename in sorted(entries):
+        if totalBytes <= max_bytes:
+            break
+        jsonFilename.unlink(missing_ok=True)
+        jsonFilename.with_suffix(".npz").unlink(missing_ok=True)
+        totalBytes -= size
+
+
+def read_tdr_cached(
+    filename: pathlib.Path,
+    cache_dir: pathlib.Path,
+    hash_content: bool = False,
+    max_bytes: int = defaultMaxCacheBytes,
+    stats: TdrStats | None = None,
+    workers: int | None = None,
+) -> TdrFile:
+    """Reads a TDR file through the on-disk cache in `cache_dir`.
+
+    Entries are keyed by `get_cache_key()`, so modified files are parsed again.
+    After writing a new entry the cache is shrunk to `max_bytes` by evicting
+    the least recently used entries. `workers` is passed to `read_tdr()` for
+    files that are not cached yet.
+    """
+    with stats_phase(stats, "cache"):
+        key = get_cache_key(filename, hash_content=hash_content)
+        entry = load_cache_entry(cache_dir, key)
+    if entry is not None:
+        fileHeader, table, fileEndHeader = entry
+        tdrFile = TdrFile.from_table(filename, fileHeader, table, fileEndHeader)
+        tdrFile.stats = stats
+        return tdrFile
+
+    tdrFile = read_tdr(filename, stats=stats, workers=workers)
+    save_cache_entry(
+        cache_dir,
+        key,
+        tdrFile.get_file_header(),
+        tdrFile.to_table(),
+        tdrFile.get_file_end_header(),
+    )
+    evict_cache(cache_dir, max_bytes)
+    return tdrFile
@@ -0,0 +1,234 @@
+import collections
+import glob
+import pathlib
+import warnings
+from typing import Iterable
+
+import numpy as np
+
+from vstim.batch import read_tdr_many
+from vstim.tdr import FileStartHeader, TrialOutcome, read_file_header
+from vstim.trial_table import TrialTable
+
+
+def get_session_key(fileHeader: FileStartHeader) -> str:
+    """Returns the key of a session from its start date and time and its ini file.
+
+    For example "2023-08-07T08:58:57 Spock 20230807 Attend Half Shapes44".
+    """
+    iniName = pathlib.PureWindowsPath(fileHeader.iniFile).stem
+    return f"{fileHeader.date.isoformat()}T{fileHeader.startTime.isoformat()} {iniName}"
+
+
+class TdrDataset:
+    """The trials of many TDR files (sessions) in one columnar `TrialTable`.
+
+    Creating a dataset only reads the $FH1 header of each file to derive its
+    session key, see `get_session_key()`. Sessions are sorted by key, i.e. by
+    start time. The trials are read in a process pool with `read_tdr_many()`
+    on first access of `table`, so sessions can be narrowed down with
+    `select_sessions()` before loading anything.
+
+    `session` holds the index into `sessionKeys` of each row of `table`, which
+    can be used like any other column for filtering and grouping.
+    """
+
+    def __init__(self, filenames: Iterable[pathlib.Path], workers: int | None = None):
+        self.workers = workers
+        sessions = []
+        for filename in filenames:
+            filename = pathlib.Path(filename)
+            try:
+                fileHeader = read_file_header(filename)
+            except (OSError, ValueError, AssertionError) as error:
+                warnings.warn(f"Skipping {filename}: {error}")
+                continue
+            sessions.append((get_session_key(fileHeader), filename, fileHeader))
+        sessions.sort(key=lambda session: session[0])
+
+        # e.g. copies of the same file, keep the keys unique
+        keyCounts = collections.Counter(key for key, _, _ in sessions)
+        for iSession, (key, filename, fileHeader) in enumerate(sessions):
+            if keyCounts[key] > 1:
+                warnings.warn(f"{filename} has the same session key as another file")
+                sessions[iSession] = (f"{key} [{filename}]", filename, fileHeader)
+
+        self.sessionKeys: list[str] = [key for key, _, _ in sessions]
+        self.filenames: list[pathlib.Path] = [filename for _, filename, _ in sessions]
+        self.fileHeaders: list[FileStartHeader] = [header for _, _, header in sessions]
+        self._table: TrialTable | None = None
+        self._session: np.ndarray | None = None
+
+    def __repr__(self) -> str:
+        return f"TdrDataset({len(self.sessionKeys)} sessions)"
+
+    @staticmethod
+    def from_directory(
+        directory: pathlib.Path, pattern: str = "*.tdr", workers: int | None = None
+    ) -> "TdrDataset":
+        """Creates a dataset of the files matching `pattern` in `directory`.
+
+        Use e.g. "**/*.tdr" to include subdirectories.
+        """
+        return TdrDataset(sorted(pathlib.Path(directory).glob(pattern)), workers)
+
+    @staticmethod
+    def from_glob(pattern: str, workers: int | None = None) -> "TdrDataset":
+        """Creates a dataset of the files matching a glob pattern like "data/*/*.tdr"."""
+        return TdrDataset(sorted(glob.glob(pattern, recursive=True)), workers)
+
+    def _copy(
+        self, iSessions: list[int], table: TrialTable | None, session: np.ndarray | None
+    ) -> "TdrDataset":
+        new = object.__new__(TdrDataset)
+        new.workers = self.workers
+        new.sessionKeys = [self.sessionKeys[i] for i in iSessions]
+        new.filenames = [self.filenames[i] for i in iSessions]
+        new.fileHeaders = [self.fileHeaders[i] for i in iSessions]
+        new._table = table
+        new._session = session
+        return new
+
+    def select_sessions(self, keys: Iterable[str]) -> "TdrDataset":
+        """Returns a dataset with only the sessions with the given keys."""
+        keys = set(keys)
+        iSessions = [i for i, key in enumerate(self.sessionKeys) if key in keys]
+        if self._table is None:
+            return self._copy(iSessions, None, None)
+
+        # renumber the session column of the already loaded rows
+        newCodes = np.full(len(self.sessionKeys), -1, dtype=np.int32)
+        newCodes[iSessions] = np.arange(len(iSessions), dtype=np.int32)
+        rows = np.isin(self._session, iSessions)
+        return self._copy(
+            iSessions, self._table.select(rows), newCodes[self._session[rows]]
+        )
+
+    def load(self):
+        """Reads the trials of all sessions, done automatically on first access."""
+        tables = []
+        sessions = []
+        for iSession, result in enumerate(read_tdr_many(self.filenames, self.workers)):
+            if result.error is not None:
+                warnings.warn(f"Could not read {result.filename}: {result.error}")
+                continue
+            tables.append(result.table)
+            sessions.append(np.full(len(result.table), iSession, dtype=np.int32))
+
+        if tables:
+            self._table = TrialTable.concatenate(tables)
+            self._session = np.concatenate(sessions)
+        else:
+            self._table = TrialTable.from_headers([])
+            self._session = np.zeros(0, dtype=np.int32)
+
+    @property
+    def table(self) -> TrialTable:
+        if self._table is None:
+            self.load()
+        return self._table
+
+    @property
+    def session(self) -> np.ndarray:
+        if self._session is None:
+            self.load()
+        return self._session
+
+    def __len__(self) -> int:
+        """Returns the number of trials of all sessions."""
+        return len(self.table)
+
+    def get_column(self, name: str) -> np.ndarray:
+        """Returns a column of the table, including the "session" column."""
+        if name == "session":
+            return self.session
+        return getattr(self.table, name)
+
+    def select(self, index) -> "TdrDataset":
+        """Returns a dataset with the rows selected by a slice, index array or boolean mask."""
+        rows = np.arange(len(self))[index]
+        return self._copy(
+            list(range(len(self.sessionKeys))),
+            self.table.select(rows),
+            self.session[rows],
+        )
+
+    def with_outcome(self, outcomes: list[TrialOutcome]) -> "TdrDataset":
+        return self.select(np.isin(self.table.outcome, [o.value for o in outcomes]))
+
+    def group_indices(self, columns: list[str]) -> dict[tuple, np.ndarray]:
+        """Returns the row indices for each combination of values of 1-D `columns`.
+
+        The keys contain the session key for the "session" column and enum
+        members for enum columns, e.g. `group_indices(["session", "outcome"])`.
+        """
+        codes = []
+        uniqueValues = []
+        for name in columns:
+            values, inverse = np.unique(self.get_column(name), return_inverse=True)
+            codes.append(inverse.reshape(-1))
+            uniqueValues.append(self._get_key_values(name, values))
+
+        groupCodes = np.ravel_multi_index(codes, [len(v) for v in uniqueValues])
+        groups, groupInverse = np.unique(groupCodes, return_inverse=True)
+        order = np.argsort(groupInverse.reshape(-1), kind="stable")
+        splits = np.cumsum(np.bincount(groupInverse.reshape(-1)))[:-1]
+        return {
+            tuple(
+                values[i]
+                for values, i in zip(
+                    uniqueValues,
+                    np.unravel_index(group, [len(v) for v in uniqueValues]),
+                )
+            ): rows
+            for group, rows in zip(groups.tolist(), np.split(order, splits))
+        }
+
+    def _get_key_values(self, name: str, values: np.ndarray) -> list:
+        if name == "session":
+            return [self.sessionKeys[code] for code in values.tolist()]
+        enumType = TrialTable._enumTypes.get(name)
+        if enumType is not None:
+            return [enumType(value) for value in values.tolist()]
+        return values.tolist()
+
+    def get_outcome_counts(self) -> dict[str, dict[str, int]]:
+        """Returns the outcome counts of each session."""
+        counts = np.zeros((len(self.sessionKeys), len(TrialOutcome)), dtype=np.int64)
+        np.add.at(counts, (self.session, self.table.outcome), 1)
+        return {
+            key: {
+                outcome.name: int(counts[iSession, outcome.value])
+                for outcome in TrialOutcome
+            }
+            for iSession, key in enumerate(self.sessionKeys)
+        }
+
+    def get_condition_index(self, columns: list[str] | None = None):
+        """Returns the `ConditionIndex` of all trials, `trialIndex` being the row in `table`.
+
+        `columns` defaults to stimulusNumber, timeSequence and outcome.
+        """
+        from vstim.condition_index import ConditionIndex, conditionColumns
+
+        return ConditionIndex.from_table(
+            self.table,
+            conditionColumns if columns is None else columns,
+            session=self.session,
+            sessionKeys=self.sessionKeys,
+        )
+
+    def to_dataframe(self):
+        """Returns all trials as a DataFrame with a categorical "session" column.
+
+        See `TrialTable.to_dataframe()`.
+        """
+        import pandas as pd
+
+        df = self.table.to_dataframe()
+        df.insert(
+            0,
+            "session",
+            pd.Categorical.from_codes(self.session, categories=self.sessionKeys),
+        )
+        return df
@@ -0,0 +1,218 @@
+import dataclasses
+import json
+import pathlib
+
+import numpy as np
+
+from vstim.object_table import ObjectTable
+from vstim.tdr import HeaderId, read_file_header
+from vstim.tdr_cache import _file_header_to_dict
+from vstim.trial_table import TrialTable, iter_tdr_tables
+
+exportVersion = 2
+
+
+def _pad_2d_columns(table, widths: dict[str, int]):
+    """Pads the 2-D columns of a chunk to `widths`, like `TrialTable.concatenate()`.
+
+    Works for `TrialTable` and `ObjectTable` chunks.
+    """
+    columns = {}
+    for name, width in widths.items():
+        values = getattr(table, name)
+        if values.shape[1] > width:
+            raise ValueError(
+                f"{name} has {values.shape[1]} values per row, expected at most {width}"
+            )
+        fill = -1 if name == "intervalType" else np.nan
+        columns[name] = np.pad(
+            values, ((0, 0), (0, width - values.shape[1])), constant_values=fill
+        )
+    return dataclasses.replace(table, **columns)
+
+
+def _get_2d_widths(table, names: tuple[str, ...]) -> dict[str, int]:
+    return {
+        name: getattr(table, name).shape[1]
+        for name in names
+        if getattr(table, name).ndim == 2
+    }
+
+
+def _get_objects(table: TrialTable, firstTrialIndex: int) -> ObjectTable:
+    """Returns the objects of a chunk, `trialIndex` being the row in the exported trial table."""
+    objects = ObjectTable.from_trial_table(table)
+    objects.trialIndex += firstTrialIndex
+    return objects
+
+
+class _ParquetExporter:
+    """Writes trials.parquet and objects.parquet into a directory, one row group per chunk.
+
+    All chunks are converted with the schemas of an empty `TrialTable` and
+    `ObjectTable`, padding their 2-D columns to the same widths, so chunks
+    without objects or with fewer values per row can be written as well.
+    """
+
+    def __init__(self, out: pathlib.Path, metadata: dict):
+        import pyarrow.parquet as pq
+
+        self.out = pathlib.Path(out)
+        self.out.mkdir(parents=True, exist_ok=True)
+        metadata = {b"vstim": json.dumps(metadata).encode()}
+
+        emptyTable = TrialTable.from_headers([])
+        emptyObjects = ObjectTable.from_trial_table(emptyTable)
+        self.trialWidths = _get_2d_widths(emptyTable, emptyTable._trialColumns)
+        self.objectWidths = _get_2d_widths(emptyObjects, emptyObjects._columns)
+        self.trialSchema = emptyTable.to_arrow().schema
+        self.objectSchema = emptyObjects.to_arrow().schema
+        self.trialWriter = pq.ParquetWriter(
+            self.out / "trials.parquet", self.trialSchema.with_metadata(metadata)
+        )
+        self.objectWriter = pq.ParquetWriter(
+            self.out / "objects.parquet", self.objectSchema.with_metadata(metadata)
+        )
+
+    def write(self, table: TrialTable, firstTrialIndex: int):
+        trials = _pad_2d_columns(table, self.trialWidths).to_arrow()
+        self.trialWriter.write_table(trials.cast(self.trialSchema))
+        objects = _pad_2d_columns(
+            _get_objects(table, firstTrialIndex), self.objectWidths
+        ).to_arrow()
+        self.objectWriter.write_table(objects.cast(self.objectSchema))
+
+    def close(self):
+        self.trialWriter.close()
+        self.objectWriter.close()
+
+
+class _Hdf5Exporter:
+    """Writes the groups /trials and /objects of an HDF5 file, appending each chunk.
+
+    Enums are stored with HDF5 enum types, strings as variable-length
+    strings, 2-D columns as 2-D datasets padded with NaN (-1 for interval
+    types) and the signals as flat datasets indexed by /trials/signalOffsets.
+    The object type is stored as /objects/typeCode, an index into the JSON
+    list in the "typeNames" attribute of /objects.
+    """
+
+    def __init__(self, out: pathlib.Path, metadata: dict, chunkTrials: int):
+        import h5py
+
+        self.h5py = h5py
+        self.file = h5py.File(out, "w")
+        self.file.attrs["vstim"] = json.dumps(metadata)
+        self.chunkTrials = chunkTrials
+        self.typeNames: list[str] = []
+        self.nSignals = 0
+        # create all datasets, so files without trials have empty tables
+        self.write(TrialTable.from_headers([]), 0)
+
+    def _append(self, group, name: str, values: np.ndarray, dtype=None, fill=None):
+        dtype = values.dtype if dtype is None else dtype
+        if name not in group:
+            group.create_dataset(
+                name,
+                shape=(0,) + values.shape[1:],
+                maxshape=(None,) * values.ndim,
+                chunks=(self.chunkTrials,) + values.shape[1:],
+                dtype=dtype,
+                fillvalue=fill,
+                compression="gzip",
+            )
+        dataset = group[name]
+        nRows = dataset.shape[0]
+        dataset.resize(nRows + len(values), axis=0)
+        if values.ndim == 2:
+            if values.shape[1] > dataset.shape[1]:
+                dataset.resize(values.shape[1], axis=1)
+            dataset[nRows:, : values.shape[1]] = values
+        else:
+            dataset[nRows:] = values
+
+    def write(self, table: TrialTable, firstTrialIndex: int):
+        trials = self.file.require_group("trials")
+        for name in table._trialColumns + table._signalColumns:
+            values = getattr(table, name)
+            enumType = table._enumTypes.get(name)
+            if enumType is not None:
+                dtype = self.h5py.enum_dtype(
+                    {member.name: member.value for member in enumType}, basetype="i1"
+                )
+                self._append(trials, name, values, dtype, fill=-1)
+            elif values.dtype.kind == "U":
+                self._append(
+                    trials, name, values.astype(object), self.h5py.string_dtype()
+                )
+            else:
+                self._append(
+                    trials, name, values, fill=np.nan if values.ndim == 2 else None
+                )
+        # only the first chunk keeps the leading 0
+        signalOffsets = table.signalOffsets
+        if "signalOffsets" in trials:
+            signalOffsets = signalOffsets[1:]
+        self._append(trials, "signalOffsets", signalOffsets + self.nSignals)
+        self.nSignals += int(table.signalOffsets[-1])
+
+        group = self.file.require_group("objects")
+        objects = _get_objects(table, firstTrialIndex)
+        for name in sorted(set(objects.typeNames) - set(self.typeNames)):
+            self.typeNames.append(name)
+        typeCodes = np.array(
+            [self.typeNames.index(name) for name in objects.typeNames], dtype=np.int32
+        )
+        for name in objects._columns:
+            values = getattr(objects, name)
+            if name == "typeCode":
+                values = typeCodes[values]
+            self._append(group, name, values, fill=np.nan if values.ndim == 2 else None)
+        group.attrs["typeNames"] = json.dumps(self.typeNames)
+
+    def close(self):
+        self.file.close()
+
+
+def export_tdr(
+    filename: pathlib.Path,
+    out: pathlib.Path,
+    format: str = "parquet",
+    chunk_trials: int = 10_000,
+):
+    """Converts a TDR file to Parquet or HDF5, reading it in chunks of `chunk_trials` trials.
+
+    With format="parquet", `out` is a directory that receives trials.parquet
+    and objects.parquet with one row group per chunk. With format="hdf5", `out`
+    is an HDF5 file with the groups /trials and /objects. The columns of the
+    trial table are those of `TrialTable.to_arrow()`. Each row of the object
+    table is an $OH1 header, linked to its trial by `trialIndex` (the row in the
+    trial table) and `trialNumber`, with the columns of `ObjectTable`. The
+    $FH1 header is stored as JSON in the metadata (key "vstim") of both
+    Parquet files or the attributes of the HDF5 file. Files without trials
+    produce empty tables.
+
+    Raises ValueError if the file does not start with an $FH1 header.
+    """
+    with open(filename, "rb") as file:
+        if file.read(len(HeaderId.FH1.value)) != HeaderId.FH1.value.encode():
+            raise ValueError(f"{filename} does not start with an $FH1 header")
+    metadata = {
+        "version": exportVersion,
+        "source": pathlib.Path(filename).name,
+        "fileHeader": _file_header_to_dict(read_file_header(filename)),
+    }
+    if format == "parquet":
+        exporter = _ParquetExporter(out, metadata)
+    elif format == "hdf5":
+        exporter = _Hdf5Exporter(out, metadata, chunk_trials)
+    else:
+        raise ValueError(f"Unsupported export format {format!r}")
+
+    try:
+        nTrials = 0
+        for table in iter_tdr_tables(filename, chunk_trials):
+            exporter.write(table, nTrials)
+            nTrials += len(table)
+    finally:
+        exporter.close()
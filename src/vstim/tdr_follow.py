@@ -0,0 +1,96 @@
+import asyncio
+import locale
+import os
+import pathlib
+import warnings
+from typing import AsyncIterator, Callable
+
+from vstim.tdr import (
+    FileStartHeader,
+    Trial,
+    _assemble_trials,
+    _decode_headers,
+    scan_tdr,
+)
+
+
+class TdrFollower:
+    """Follows a TDR file that is still being written by VStim.
+
+    Each call of `poll()` reads only the bytes appended since the previous call
+    and returns the trials completed by them. A trial counts as complete once
+    the $TH1 header of the next trial has been written, so the last trial of a
+    recording is only returned by `poll(final=True)`. Incomplete trailing lines
+    and trials are kept until they are complete.
+
+    New trials are also passed to `callback` if given. Iterating over the
+    follower with `async for` polls the file every `poll_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        filename: pathlib.Path,
+        callback: Callable[[Trial], None] | None = None,
+        poll_interval: float = 1.0,
+    ):
+        self.filename = filename
+        self.callback = callback
+        self.poll_interval = poll_interval
+        self.offset = 0
+        self.fileHeader: FileStartHeader | None = None
+        self.nTrials = 0
+        self._pending = b""
+        self._encoding = locale.getpreferredencoding(False)
+
+    def _read_new_bytes(self) -> bytes:
+        with open(self.filename, "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            if size < self.offset:
+                warnings.warn(f"{self.filename} was truncated, reading from start")
+                self.offset = 0
+                self._pending = b""
+            file.seek(self.offset)
+            data = file.read(size - self.offset)
+        self.offset += len(data)
+        return data
+
+    def poll(self, final: bool = False) -> list[Trial]:
+        """Returns the trials completed since the last call.
+
+        With `final=True` the pending last trial is returned as well, which is
+        only correct once VStim has finished writing the file.
+        """
+        data = self._pending + self._read_new_bytes()
+
+        # only complete lines are parsed
+        end = len(data) if final else data.rfind(b"\n") + 1
+        index = scan_tdr(data[:end])
+
+        # the last trial may still receive object headers
+        if not final:
+            trialOffsets = index["offset"][index["headerId"] == b"$TH1"]
+            end = int(trialOffsets[-1]) if len(trialOffsets) > 0 else 0
+            index = index[index["offset"] < end]
+
+        complete, self._pending = data[:end], data[end:]
+        headers = list(_decode_headers(complete, index, self._encoding))
+        for header in headers:
+            if isinstance(header, FileStartHeader):
+                self.fileHeader = header
+
+        trials = list(_assemble_trials(headers))
+        self.nTrials += len(trials)
+        if self.callback is not None:
+            for trial in trials:
+                self.callback(trial)
+        return trials
+
+    async def follow(self) -> AsyncIterator[Trial]:
+        """Polls the file every `poll_interval` seconds and yields new trials."""
+        while True:
+            for trial in self.poll():
+                yield trial
+            await asyncio.sleep(self.poll_interval)
+
+    def __aiter__(self) -> AsyncIterator[Trial]:
+        return self.follow()
@@ -0,0 +1,160 @@
+import locale
+import os
+import pathlib
+import warnings
+from dataclasses import dataclass
+
+import numpy as np
+
+from vstim.tdr import (
+    Trial,
+    _assemble_trials,
+    _decode_headers,
+    _map_tdr,
+    scan_tdr,
+)
+
+indexVersion = 2
+
+
+def get_index_filename(filename: pathlib.Path) -> pathlib.Path:
+    """Returns the path of the sidecar index of a TDR file, e.g. session.tdr.idx."""
+    filename = pathlib.Path(filename)
+    return filename.with_name(filename.name + ".idx")
+
+
+@dataclass
+class TrialIndex:
+    """Byte offsets of the trials of a TDR file.
+
+    The bytes `trialOffset[i]:trialEnd[i]` contain the $TH1 header of the i-th
+    trial including its subheaders and all following $OH1 blocks.
+    `tRelTrialStartMIN` is the start time of each trial from its $TS1 line
+    (NaN if missing). The size and modification time of the indexed file are
+    stored to detect stale indices.
+    """
+
+    fileSize: int
+    fileMtimeNs: int
+    trialNumber: np.ndarray
+    trialOffset: np.ndarray
+    trialEnd: np.ndarray
+    tRelTrialStartMIN: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.trialNumber)
+
+    @staticmethod
+    def from_file(filename: pathlib.Path) -> "TrialIndex":
+        """Builds the index by scanning a TDR file."""
+        stat = os.stat(filename)
+        with _map_tdr(filename) as data:
+            index = scan_tdr(data)
+            trialOffset = index["offset"][index["headerId"] == b"$TH1"]
+            trialNumber = np.array(
+                [int(data[offset : offset + 64].split()[3]) for offset in trialOffset],
+                dtype=np.int32,
+            )
+            trialEnd = np.append(trialOffset[1:], len(data)).astype(np.int64)
+
+            # the $TS1 line of each trial, like in TrialSubheader1.from_lines()
+            tRelTrialStartMIN = np.full(len(trialOffset), np.nan)
+            ts1Offset = index["offset"][index["headerId"] == b"$TS1"]
+            iTrial = np.searchsorted(trialOffset, ts1Offset, side="right") - 1
+            for i, offset in zip(iTrial.tolist(), ts1Offset.tolist()):
+                if i >= 0:
+                    tokens = data[offset : offset + 64].split()
+                    tRelTrialStartMIN[i] = float(tokens[5]) / 60.0 / 10000.0
+
+        return TrialIndex(
+            fileSize=stat.st_size,
+            fileMtimeNs=stat.st_mtime_ns,
+            trialNumber=trialNumber,
+            trialOffset=trialOffset,
+            trialEnd=trialEnd,
+            tRelTrialStartMIN=tRelTrialStartMIN,
+        )
+
+    @staticmethod
+    def load(filename: pathlib.Path) -> "TrialIndex":
+        with np.load(filename) as data:
+            if int(data["version"]) != indexVersion:
+                raise ValueError(f"Unsupported index version {int(data['version'])}")
+            return TrialIndex(
+                fileSize=int(data["fileSize"]),
+                fileMtimeNs=int(data["fileMtimeNs"]),
+                trialNumber=data["trialNumber"],
+                trialOffset=data["trialOffset"],
+                trialEnd=data["trialEnd"],
+                tRelTrialStartMIN=data["tRelTrialStartMIN"],
+            )
+
+    def save(self, filename: pathlib.Path):
+        with open(filename, "wb") as file:
+            np.savez(
+                file,
+                version=indexVersion,
+                fileSize=self.fileSize,
+                fileMtimeNs=self.fileMtimeNs,
+                trialNumber=self.trialNumber,
+                trialOffset=self.trialOffset,
+                trialEnd=self.trialEnd,
+                tRelTrialStartMIN=self.tRelTrialStartMIN,
+            )
+
+    def is_valid_for(self, filename: pathlib.Path) -> bool:
+        """Checks whether the indexed file still has the same size and modification time."""
+        stat = os.stat(filename)
+        return stat.st_size == self.fileSize and stat.st_mtime_ns == self.fileMtimeNs
+
+
+def load_trial_index(filename: pathlib.Path, save: bool = True) -> TrialIndex:
+    """Loads the sidecar index of a TDR file, (re)building it if missing or stale.
+
+    A rebuilt index is written next to the TDR file unless `save` is False. If
+    that fails, e.g. because the directory is read-only, a warning is issued and
+    the index is only kept in memory.
+    """
+    indexFilename = get_index_filename(filename)
+    if indexFilename.exists():
+        try:
+            index = TrialIndex.load(indexFilename)
+            if index.is_valid_for(filename):
+                return index
+        except (OSError, ValueError, KeyError) as error:
+            warnings.warn(f"Ignoring invalid index {indexFilename}: {error}")
+
+    index = TrialIndex.from_file(filename)
+    if save:
+        try:
+            index.save(indexFilename)
+        except OSError as error:
+            warnings.warn(f"Could not write index {indexFilename}: {error}")
+    return index
+
+
+def read_indexed_trials(
+    filename: pathlib.Path, index: TrialIndex, trials: slice | np.ndarray
+) -> list[Trial]:
+    """Reads a slice (or an array of rows) of trials from a TDR file, parsing only their bytes."""
+    if isinstance(trials, slice):
+        rows = range(len(index))[trials]
+    else:
+        rows = np.asarray(trials).tolist()
+    if len(rows) == 0:
+        return []
+
+    # contiguous slices are read as a single span
+    if isinstance(rows, range) and rows.step == 1:
+        spans = [(index.trialOffset[rows.start], index.trialEnd[rows.stop - 1])]
+    else:
+        spans = [(index.trialOffset[iRow], index.trialEnd[iRow]) for iRow in rows]
+
+    encoding = locale.getpreferredencoding(False)
+    result: list[Trial] = []
+    with _map_tdr(filename) as data:
+        for start, end in spans:
+            chunk = data[int(start) : int(end)]
+            headers = _decode_headers(chunk, scan_tdr(chunk), encoding)
+            result.extend(_assemble_trials(headers))
+    return result
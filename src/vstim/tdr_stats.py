@@ -0,0 +1,98 @@
+import contextlib
+import time
+from dataclasses import dataclass, field
+
+
+@dataclass(slots=True)
+class StatsEntry:
+    count: int = 0
+    seconds: float = 0.0
+    nBytes: int = 0
+
+
+@dataclass
+class TdrStats:
+    """Collects where the time is spent while loading a TDR file.
+
+    Pass an instance as `stats` to `read_tdr()`. `phases` holds the cumulative
+    time of each loading phase:
+
+    - scan: locating the headers in the raw bytes
+    - select: checking the $TH1 lines against `where` (only with `where`)
+    - identify: looking up the `HeaderId` of each header
+    - split: decoding the bytes of the headers and splitting them into lines
+    - parse: creating the header objects from their lines (with `lazy=True`,
+      only the eagerly parsed part)
+    - assemble: combining the headers into trials (on the first `get_trials()`)
+    - cache: loading the file from the binary cache
+    - partition: splitting the file into one byte range per worker at $TH1
+      lines (with `workers`)
+    - parallel: parsing the file in a process pool (with `workers`)
+
+    `headers` holds count, time and bytes of the parsed headers per header id,
+    e.g. "$TH1". The same instance can be passed to several calls to
+    accumulate the statistics of many files. Timing each header adds some
+    overhead, so the totals are slightly higher than without `stats`.
+    """
+
+    phases: dict[str, StatsEntry] = field(default_factory=dict)
+    headers: dict[str, StatsEntry] = field(default_factory=dict)
+
+    def add_phase(self, name: str, seconds: float, nBytes: int = 0, count: int = 1):
+        entry = self.phases.setdefault(name, StatsEntry())
+        entry.count += count
+        entry.seconds += seconds
+        entry.nBytes += nBytes
+
+    def add_header(self, headerId: str, seconds: float, nBytes: int):
+        entry = self.headers.setdefault(headerId, StatsEntry())
+        entry.count += 1
+        entry.seconds += seconds
+        entry.nBytes += nBytes
+
+    @contextlib.contextmanager
+    def phase(self, name: str, nBytes: int = 0):
+        """Times the enclosed block as one occurrence of phase `name`."""
+        tStart = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.perf_counter() - tStart, nBytes)
+
+    def to_records(self) -> list[dict]:
+        """Returns one dict per phase and header id, e.g. for `pandas.DataFrame`."""
+        return [
+            {
+                "kind": kind,
+                "name": name,
+                "count": entry.count,
+                "seconds": entry.seconds,
+                "nBytes": entry.nBytes,
+            }
+            for kind, entries in (("phase", self.phases), ("header", self.headers))
+            for name, entry in entries.items()
+        ]
+
+    def report(self) -> str:
+        """Returns the statistics as a text table, slowest entries first."""
+        lines = [
+            f"{'kind':<8}{'name':<10}{'count':>10}{'seconds':>10}"
+            f"{'MB':>10}{'us/item':>10}"
+        ]
+        for record in sorted(
+            self.to_records(), key=lambda r: (r["kind"], -r["seconds"])
+        ):
+            usPerItem = record["seconds"] / max(record["count"], 1) * 1e6
+            lines.append(
+                f"{record['kind']:<8}{record['name']:<10}{record['count']:>10}"
+                f"{record['seconds']:>10.3f}{record['nBytes'] / 2**20:>10.2f}"
+                f"{usPerItem:>10.1f}"
+            )
+        return "\n".join(lines)
+
+
+def stats_phase(stats: TdrStats | None, name: str, nBytes: int = 0):
+    """Returns `stats.phase(name)`, or a no-op context manager if `stats` is None."""
+    if stats is None:
+        return contextlib.nullcontext()
+    return stats.phase(name, nBytes)
@@ -0,0 +1,136 @@
+import datetime
+import pathlib
+import random
+from typing import Iterator
+
+from vstim.tdr import (
+    IntervalType,
+    Manipulandum,
+    StartResponseSignalCode,
+    TrialOutcome,
+    nIntervals,
+    nTriggerTransitions,
+)
+
+
+def _format_values(values: list[float], fmt: str) -> str:
+    return "  ".join(format(value, fmt) for value in values)
+
+
+def generate_tdr_lines(
+    nTrials: int = 1000,
+    nUsedIntervals: int = 6,
+    nObjects: int = 20,
+    seed: int = 0,
+) -> Iterator[str]:
+    """Yields the lines of a synthetic TDR file (without line endings).
+
+    Each trial has a $TH1 header with $TS1-$TS4 subheaders describing
+    `nUsedIntervals` intervals, followed by `nObjects` $OH1 object headers.
+    The first object is a fixation point, the others are morph shapes. Trial
+    outcomes, durations and signals are drawn from a random generator seeded
+    with `seed`, so the same arguments always produce the same file.
+    """
+    assert 1 <= nUsedIntervals <= nIntervals
+    rng = random.Random(seed)
+    startTime = datetime.datetime(2023, 8, 7, 8, 58, 57)
+
+    yield "$FH1   5   3"
+    yield "2.20\t\t// VStim program version"
+    yield "1.13\t\t// .tdr file format version"
+    yield f"{startTime:%d.%m.%Y}\t{startTime:%H:%M:%S}\t100\t// date, start time, refresh rate"
+    yield r"C:\Users\trainer\Documents\VStim\Synthetic\INI\Synthetic.ini"
+
+    outcomes = list(TrialOutcome)
+    manipulanda = [Manipulandum.NoManipulandum, Manipulandum.ReleaseLever1]
+    responses = [
+        StartResponseSignalCode.ReleaseLever1,
+        StartResponseSignalCode.StartFixating,
+        StartResponseSignalCode.IsFixating,
+    ]
+    # the unused values are the same in every trial
+    nUnusedTransitions = 2 * (nTriggerTransitions - nUsedIntervals)
+    unusedTransitions = _format_values([-0.01] * nUnusedTransitions, "7.4f")
+    unusedIntended = _format_values([0.52] * (nIntervals - nUsedIntervals), "7.4f")
+    unusedTypes = _format_values(
+        [IntervalType.Normal.value] * (nIntervals - nUsedIntervals), "3d"
+    )
+    unusedTimes = _format_values([-1.0] * 14, "7.4f")
+
+    tTrialStartS = 30.0
+    for trialNumber in range(1, nTrials + 1):
+        # the last interval is the response interval
+        durationsS = [round(rng.uniform(0.02, 4.0), 2) for _ in range(nUsedIntervals)]
+        intervalTypes = [IntervalType.Normal] * nUsedIntervals
+        intervalTypes[min(1, nUsedIntervals - 1)] = IntervalType.WaitForStartSignal
+        intervalTypes[-1] = IntervalType.ResponseRequired
+
+        outcome = rng.choice(outcomes)
+        wasHit = outcome == TrialOutcome.Hit
+        reactionTimeMS = round(rng.uniform(200.0, 800.0), 2)
+
+        # VStim writes 4 lines for $TH1 version 5 although there are 5 (bug #210)
+        yield (
+            f"$TH1   4   5  {trialNumber:4d}  {rng.randrange(50):3d}  "
+            f"{rng.randrange(4):3d}    0  {int(wasHit):3d}  {outcome.value:3d}  "
+            f"{rng.choice(manipulanda).value:3d}    1  {reactionTimeMS:8.2f}  "
+            f"{70 if wasHit else 0:4d}  {nUsedIntervals - 1:3d}    0   -1     -0.01"
+        )
+
+        transitions = []
+        tTransition = 0.0
+        for durationS in durationsS:
+            transitions += [tTransition, tTransition + durationS]
+            tTransition += durationS
+        trialStart = startTime + datetime.timedelta(seconds=tTrialStartS)
+        yield (
+            f"$TS1   1   3  {trialNumber:4d}  {trialStart:%H:%M:%S}  "
+            f"{round(tTrialStartS * 10000):9d}  {_format_values(transitions, '7.4f')}"
+            f"  {unusedTransitions}"
+        )
+        tTrialStartS += tTransition + rng.uniform(1.0, 3.0)
+
+        yield f"$TS2   1   1  {_format_values(durationsS, '7.4f')}  {unusedIntended}"
+        typeCodes = [t.value for t in intervalTypes]
+        yield f"$TS3   1   1  {_format_values(typeCodes, '3d')}  {unusedTypes}"
+
+        signals = [
+            (rng.choice(responses).value, len(durationsS) - 1, reactionTimeMS)
+            for _ in range(rng.randrange(1, 4))
+        ]
+        yield (
+            f"$TS4   1   1  {len(signals):3d}  "
+            + "  ".join(
+                f"{code:3d} {iInterval:3d} {t:7.1f}" for code, iInterval, t in signals
+            )
+        )
+
+        for iObject in range(1, nObjects + 1):
+            show = rng.randrange(2)
+            if iObject == 1:
+                yield (
+                    f"$OH1  2 01 {iObject:2d}  {show}   0.00   0.00   0.00   0.00"
+                    "   0.00   0.00 Fixation Point 1"
+                )
+                yield (
+                    f"$OS1  1  01  {show} {durationsS[0]:7.4f}  {tTransition:7.4f}"
+                    f"  {unusedTimes}"
+                )
+            else:
+                x, y = rng.uniform(-40.0, 40.0), rng.uniform(-20.0, 20.0)
+                yield (
+                    f"$OH1  2 01 {iObject:2d}  {show} {x:6.2f} {y:6.2f}   0.00   0.00"
+                    "   0.00   0.00 Morph PDF 1"
+                )
+                yield (
+                    "$OS1  1  05  0  0   4 -1  250.00 1500.00 1000.00 1000.00"
+                    "    0.00   -1.00  550.00 -1  -1   0.0"
+                )
+
+
+def write_synthetic_tdr(filename: pathlib.Path, nTrials: int = 1000, **kwargs):
+    """Writes a synthetic TDR file, see `generate_tdr_lines()` for the arguments."""
+    with open(filename, "w", newline="\n") as file:
+        for line in generate_tdr_lines(nTrials, **kwargs):
+            file.write(line)
+            file.write("\n")
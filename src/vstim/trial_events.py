@@ -0,0 +1,213 @@
+from array import array
+from typing import Iterable, Iterator
+
+import numpy as np
+
+from vstim.network_event_codes import VStimEventCode, eventCodeRanges
+from vstim.tdr import TdrFile, Trial, TrialOutcome, nIntervals, nTriggerTransitions
+
+# value of the trigger transitions of unused intervals in TDR files
+unusedTransitionMS = -10.0
+
+_intervalStartCodes = eventCodeRanges["IntervalStarted"]
+_intervalEndCodes = eventCodeRanges["IntervalEnded"]
+# TrialEndedWithNotStarted ... TrialEndedWithWrongStartSignal
+_outcomeCodes = range(
+    VStimEventCode.TrialEndedWithNotStarted.value,
+    VStimEventCode.TrialEndedWithWrongStartSignal.value + 1,
+)
+
+TrialComparisonDtype = np.dtype(
+    [
+        ("trialNumber", np.int32),
+        ("isInTdr", np.bool_),
+        ("outcomeMatches", np.bool_),
+        # intervals that were started in only one of the two
+        ("nIntervalMismatches", np.int32),
+        ("maxTransitionErrorMS", np.float64),
+        # interval (0-based) of the largest error, -1 if there is none
+        ("worstInterval", np.int32),
+    ]
+)
+
+
+class TrialReconstructor:
+    """Reconstructs trials from a stream of VStim network events.
+
+    Feed the events in order with `feed()` or `feed_events()`. A trial begins
+    with TrialStarted or the first Interval<N>Started event and ends with one
+    of the TrialEndedWith<Outcome> events, which returns it as a `Trial`.
+    The generic TrialEnded event is ignored, TrialWasCancelledByUser discards
+    the trial. Each event is handled in constant time.
+
+    Like in TDR files, the trigger transitions of the intervals are in ms
+    relative to the start of the first interval and unused intervals are
+    `unusedTransitionMS`. Only the fields that can be derived from the events
+    are set (trial number, outcome, wasHit, lastInterval, tRelTrialStartMIN
+    and the transitions), the others are None. Trials are numbered from
+    `firstTrialNumber` in the order they end.
+
+    Trials that end while the TDR recording is paused are not written to the
+    TDR file, so they are only returned if `include_unrecorded` is set.
+    """
+
+    def __init__(self, firstTrialNumber: int = 1, include_unrecorded: bool = False):
+        self.nextTrialNumber = firstTrialNumber
+        self.include_unrecorded = include_unrecorded
+        self.isRecording = True
+        self.iRound = 0
+        self.isInRound = False
+        self.nTrials = 0
+        self.nCancelledTrials = 0
+        # trials that were followed by TrialStarted before they ended
+        self.nIncompleteTrials = 0
+        self.nUnrecordedTrials = 0
+        self._trial: Trial | None = None
+        self._tTrialStartS: float | None = None
+
+    @property
+    def isInTrial(self) -> bool:
+        return self._trial is not None
+
+    def _start_trial(self):
+        self._trial = Trial(
+            tPositiveTriggerTransitionMS=array(
+                "d", [unusedTransitionMS] * nTriggerTransitions
+            ),
+            tNegativeTriggerTransitionMS=array(
+                "d", [unusedTransitionMS] * nTriggerTransitions
+            ),
+            lastInterval=-1,
+            signals=[],
+        )
+        self._tTrialStartS = None
+
+    def _set_transition(self, transitions: array, iInterval: int, timestamp: float):
+        if self._tTrialStartS is None:
+            self._tTrialStartS = timestamp
+            self._trial.tRelTrialStartMIN = timestamp / 60.0
+        transitions[iInterval] = (timestamp - self._tTrialStartS) * 1000.0
+
+    def _end_trial(self, outcome: TrialOutcome) -> Trial | None:
+        trial = self._trial
+        self._trial = None
+        trial.outcome = outcome
+        trial.wasHit = outcome == TrialOutcome.Hit
+        trial.trialNumber = self.nextTrialNumber
+        self.nextTrialNumber += 1
+        if not self.isRecording:
+            self.nUnrecordedTrials += 1
+            if not self.include_unrecorded:
+                return None
+        self.nTrials += 1
+        return trial
+
+    def feed(self, timestamp: float, code: int) -> Trial | None:
+        """Handles one event, returns the trial it ends if any."""
+        if code in _intervalStartCodes or code in _intervalEndCodes:
+            iInterval = code % 100 - 1
+            # the generic IntervalStarted/Ended events carry no interval number
+            if not 0 <= iInterval < nIntervals:
+                return None
+            if self._trial is None:
+                if code in _intervalEndCodes:
+                    return None
+                self._start_trial()
+            if code in _intervalStartCodes:
+                transitions = self._trial.tPositiveTriggerTransitionMS
+                self._trial.lastInterval = max(self._trial.lastInterval, iInterval)
+            else:
+                transitions = self._trial.tNegativeTriggerTransitionMS
+            self._set_transition(transitions, iInterval, timestamp)
+        elif code in _outcomeCodes:
+            if self._trial is not None:
+                return self._end_trial(TrialOutcome(code - _outcomeCodes.start))
+        elif code == VStimEventCode.TrialStarted.value:
+            if self._trial is not None:
+                self.nIncompleteTrials += 1
+            self._start_trial()
+        elif code == VStimEventCode.TrialWasCancelledByUser.value:
+            if self._trial is not None:
+                self._trial = None
+                self.nCancelledTrials += 1
+        elif code == VStimEventCode.RoundStarted.value:
+            self.iRound += 1
+            self.isInRound = True
+        elif code == VStimEventCode.RoundEnded.value:
+            self.isInRound = False
+        elif code in (
+            VStimEventCode.TdrRecordingPaused.value,
+            VStimEventCode.TdrRecordingEnded.value,
+        ):
+            self.isRecording = False
+        elif code in (
+            VStimEventCode.TdrRecordingStarted.value,
+            VStimEventCode.TdrRecordingResumed.value,
+        ):
+            self.isRecording = True
+        return None
+
+    def feed_events(self, events: np.ndarray) -> Iterator[Trial]:
+        """Handles a structured array of `EventDtype`, yields the completed trials."""
+        for timestamp, code in zip(
+            events["timestamp"].tolist(), events["code"].tolist()
+        ):
+            trial = self.feed(timestamp, code)
+            if trial is not None:
+                yield trial
+
+
+def reconstruct_trials(events: np.ndarray, **kwargs) -> list[Trial]:
+    """Returns the trials of a whole event log, see `TrialReconstructor` for the arguments."""
+    return list(TrialReconstructor(**kwargs).feed_events(events))
+
+
+def compare_trials(trials: Iterable[Trial], tdrFile: TdrFile) -> np.ndarray:
+    """Compares reconstructed trials with the trials of a TDR file with the same numbers.
+
+    Returns a structured array of `TrialComparisonDtype` with one entry per
+    reconstructed trial, e.g. select the entries with
+    `maxTransitionErrorMS > 1.0` to find timing discrepancies. Only the
+    transitions of the first `nIntervals` intervals are compared.
+    """
+    trials = list(trials)
+    table = tdrFile.to_table()
+    comparison = np.zeros(len(trials), dtype=TrialComparisonDtype)
+    trialNumbers = np.array([trial.trialNumber for trial in trials], dtype=np.int32)
+    comparison["trialNumber"] = trialNumbers
+    comparison["worstInterval"] = -1
+
+    # row of each trial number in the table
+    order = np.argsort(table.trialNumber, kind="stable")
+    sortedNumbers = table.trialNumber[order]
+    positions = np.searchsorted(sortedNumbers, trialNumbers)
+    isInTdr = positions < len(sortedNumbers)
+    isInTdr[isInTdr] = sortedNumbers[positions[isInTdr]] == trialNumbers[isInTdr]
+    comparison["isInTdr"] = isInTdr
+    if not isInTdr.any():
+        return comparison
+    rows = order[positions[isInTdr]]
+    trials = [trial for trial, isIn in zip(trials, isInTdr.tolist()) if isIn]
+
+    outcomes = np.array([trial.outcome.value for trial in trials])
+    comparison["outcomeMatches"][isInTdr] = table.outcome[rows] == outcomes
+
+    errors = np.zeros((len(trials), nIntervals))
+    for name in ("tPositiveTriggerTransitionMS", "tNegativeTriggerTransitionMS"):
+        reconstructed = np.array(
+            [getattr(trial, name)[:nIntervals] for trial in trials]
+        )
+        recorded = getattr(table, name)[rows, :nIntervals]
+        isUsed = (reconstructed >= 0.0) & (recorded >= 0.0)
+        errors = np.maximum(
+            errors, np.where(isUsed, np.abs(reconstructed - recorded), 0.0)
+        )
+        if name == "tPositiveTriggerTransitionMS":
+            comparison["nIntervalMismatches"][isInTdr] = np.count_nonzero(
+                (reconstructed >= 0.0) != (recorded >= 0.0), axis=1
+            )
+    comparison["maxTransitionErrorMS"][isInTdr] = errors.max(axis=1)
+    comparison["worstInterval"][isInTdr] = np.where(
+        errors.max(axis=1) > 0.0, errors.argmax(axis=1), -1
+    )
+    return comparison
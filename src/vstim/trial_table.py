@@ -0,0 +1,646 @@
+import collections.abc
+import locale
+import pathlib
+from array import array
+from dataclasses import dataclass, field
+from typing import Iterator
+
+import numpy as np
+
+from vstim.tdr import (
+    Header,
+    IntervalType,
+    Manipulandum,
+    ObjectHeader,
+    StartResponseSignalCode,
+    Trial,
+    TrialHeader,
+    TrialOutcome,
+    TrialSubheader1,
+    TrialSubheader2,
+    TrialSubheader3,
+    TrialSubheader4,
+    _decode_headers,
+    _iter_trial_ranges,
+    _map_tdr,
+    nIntervals,
+    nTriggerTransitions,
+    scan_tdr,
+)
+from vstim import intervals
+
+
+def _pad_2d(rows: list[list], dtype, fill, emptyWidth: int) -> np.ndarray:
+    """Stacks rows of possibly different length into a 2-D array padded with `fill`.
+
+    Without rows the array has `emptyWidth` columns, the width of the column
+    in TDR files, as pyarrow does not support fixed-size lists of width 0.
+    """
+    width = max((len(row) for row in rows), default=emptyWidth)
+    if all(len(row) == width for row in rows):
+        return np.array(rows, dtype=dtype).reshape(len(rows), width)
+    array = np.full((len(rows), width), fill, dtype=dtype)
+    for iRow, row in enumerate(rows):
+        array[iRow, : len(row)] = row
+    return array
+
+
+def _unpad(row: np.ndarray) -> array:
+    """Converts a NaN-padded float64 row into an array('d') as used by the headers."""
+    values = array("d")
+    values.frombytes(row[~np.isnan(row)].astype(np.float64).tobytes())
+    return values
+
+
+def _enum_positions(values: np.ndarray, enumType) -> np.ndarray:
+    """Maps enum values to their position in `enumType`, -1 for padding or unknown values."""
+    enumValues = np.array([member.value for member in enumType])
+    order = np.argsort(enumValues)
+    iSorted = np.clip(np.searchsorted(enumValues[order], values), 0, len(order) - 1)
+    positions = order[iSorted].astype(np.int8)
+    positions[enumValues[order][iSorted] != values] = -1
+    return positions
+
+
+def _to_arrow_array(values: np.ndarray, enumType=None):
+    """Converts a column to a pyarrow array.
+
+    Enum columns become dictionary arrays of the member names, 2-D columns
+    fixed-size lists. Padding (NaN, or -1 for enums) becomes null.
+    """
+    import pyarrow as pa
+
+    flat = values.reshape(-1)
+    if enumType is not None:
+        positions = _enum_positions(flat, enumType)
+        array = pa.DictionaryArray.from_arrays(
+            pa.array(positions, mask=positions < 0),
+            pa.array([member.name for member in enumType]),
+        )
+    elif flat.dtype.kind == "f":
+        array = pa.array(flat, mask=np.isnan(flat))
+    else:
+        array = pa.array(flat)
+    if values.ndim == 2:
+        # pyarrow crashes for width 0
+        assert values.shape[1] > 0, "Cannot convert a 2-D column of width 0"
+        array = pa.FixedSizeListArray.from_arrays(array, values.shape[1])
+    return array
+
+
+def _take_ragged(offsets: np.ndarray, rows: np.ndarray):
+    """Returns new offsets and flat value indices for selecting `rows` of a ragged column."""
+    starts = offsets[:-1][rows]
+    counts = offsets[1:][rows] - starts
+    newOffsets = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(counts, out=newOffsets[1:])
+    flat = np.repeat(starts - newOffsets[:-1], counts) + np.arange(newOffsets[-1])
+    return newOffsets, flat
+
+
+def _pack_objects(stimulusObjects: list[list[ObjectHeader]]) -> dict:
+    """Converts the stimulus objects of all trials into flat arrays for pickling."""
+    objects = [header for headers in stimulusObjects for header in headers]
+    objectOffsets = np.zeros(len(stimulusObjects) + 1, dtype=np.int64)
+    np.cumsum([len(headers) for headers in stimulusObjects], out=objectOffsets[1:])
+    typeNames, typeCodes = np.unique(
+        np.array([h.typeName for h in objects], dtype=object), return_inverse=True
+    )
+    return {
+        "objectOffsets": objectOffsets,
+        "nLines": np.array([h.nLines for h in objects], dtype=np.int32),
+        "headerVersion": np.array([h.headerVersion for h in objects], dtype=np.int32),
+        "objectNumber": np.array([h.objectNumber for h in objects], dtype=np.int32),
+        "show": np.array([h.show for h in objects], dtype=bool),
+        "pose": np.array(
+            [(h.xPos, h.yPos, h.zPos, h.rotX, h.rotY, h.rotZ) for h in objects],
+            dtype=np.float64,
+        ).reshape(len(objects), 6),
+        "typeNames": typeNames.tolist(),
+        "typeCodes": typeCodes.astype(np.int32),
+        # only few objects (e.g. fixation points) have parsed subheaders
+        "subheaders": {
+            iObject: h.subheaders for iObject, h in enumerate(objects) if h.subheaders
+        },
+    }
+
+
+def _concatenate_packed(packedObjects: list[dict]) -> dict:
+    """Concatenates the objects packed by `_pack_objects` of several tables."""
+    typeNames = sorted(
+        {name for packed in packedObjects for name in packed["typeNames"]}
+    )
+    typeCodes = {name: code for code, name in enumerate(typeNames)}
+    objectOffsets = [np.zeros(1, dtype=np.int64)]
+    subheaders = {}
+    nObjects = 0
+    for packed in packedObjects:
+        objectOffsets.append(packed["objectOffsets"][1:] + nObjects)
+        subheaders.update(
+            {iObject + nObjects: h for iObject, h in packed["subheaders"].items()}
+        )
+        nObjects += int(packed["objectOffsets"][-1])
+
+    concatenated = {
+        name: np.concatenate([packed[name] for packed in packedObjects])
+        for name in ("nLines", "headerVersion", "objectNumber", "show")
+    }
+    concatenated["pose"] = np.concatenate(
+        [packed["pose"] for packed in packedObjects]
+    ).reshape(nObjects, 6)
+    concatenated["objectOffsets"] = np.concatenate(objectOffsets)
+    concatenated["typeNames"] = typeNames
+    concatenated["typeCodes"] = np.concatenate(
+        [
+            np.array([typeCodes[name] for name in packed["typeNames"]], dtype=np.int32)[
+                packed["typeCodes"]
+            ]
+            for packed in packedObjects
+        ]
+    )
+    concatenated["subheaders"] = subheaders
+    return concatenated
+
+
+class _PackedObjects(collections.abc.Sequence):
+    """Stimulus objects of all trials packed by `_pack_objects`.
+
+    Behaves like the list of per-trial object lists it was packed from, but
+    builds the `ObjectHeader`s of a trial only when that trial is accessed.
+    """
+
+    def __init__(self, packed: dict):
+        self.packed = packed
+
+    def __len__(self) -> int:
+        return len(self.packed["objectOffsets"]) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[iTrial] for iTrial in range(len(self))[index]]
+        iTrial = range(len(self))[index]
+        start, end = self.packed["objectOffsets"][iTrial : iTrial + 2].tolist()
+        return [self._get_object(iObject) for iObject in range(start, end)]
+
+    def _get_object(self, iObject: int) -> ObjectHeader:
+        packed = self.packed
+        xPos, yPos, zPos, rotX, rotY, rotZ = packed["pose"][iObject].tolist()
+        return ObjectHeader(
+            nLines=int(packed["nLines"][iObject]),
+            headerVersion=int(packed["headerVersion"][iObject]),
+            objectNumber=int(packed["objectNumber"][iObject]),
+            show=bool(packed["show"][iObject]),
+            xPos=xPos,
+            yPos=yPos,
+            zPos=zPos,
+            rotX=rotX,
+            rotY=rotY,
+            rotZ=rotZ,
+            typeName=packed["typeNames"][packed["typeCodes"][iObject]],
+            subheaders=packed["subheaders"].get(iObject, []),
+        )
+
+
+@dataclass
+class TrialTable:
+    """Columnar representation of the trials of a TDR file.
+
+    Every $TH1 and $TS1-$TS4 field is stored as a NumPy array with one entry per
+    trial. Enums are stored as int8 codes (their `.value`), trigger transitions
+    and per-interval values as 2-D arrays of shape (nTrials, n) padded with NaN
+    (or -1 for interval types) if trials differ in length. The $TS4 signals are
+    stored as flat arrays indexed by `signalOffsets`.
+    """
+
+    # from $TH1
+    trialNumber: np.ndarray
+    stimulusNumber: np.ndarray
+    timeSequence: np.ndarray
+    wasPerfectMonkey: np.ndarray
+    wasHit: np.ndarray
+    outcome: np.ndarray
+    manipulandum: np.ndarray
+    wasPreciseFixation: np.ndarray
+    reactionTimeMS: np.ndarray
+    rewardDurationMS: np.ndarray
+    lastInterval: np.ndarray
+    eyeControlFlag: np.ndarray
+    intervalOfFrameLoss: np.ndarray
+    timeOfFrameLoss: np.ndarray
+
+    # from $TS1, subheader1TrialNumber is the trial number repeated in $TS1
+    subheader1TrialNumber: np.ndarray
+    tAbsTrialStart: np.ndarray
+    tRelTrialStartMIN: np.ndarray
+    tPositiveTriggerTransitionMS: np.ndarray
+    tNegativeTriggerTransitionMS: np.ndarray
+
+    # from $TS2
+    tIntendedIntervalDurationMS: np.ndarray
+
+    # from $TS3
+    intervalType: np.ndarray
+
+    # from $TS4, signals of trial i are signal*[signalOffsets[i]:signalOffsets[i+1]]
+    signalOffsets: np.ndarray
+    signalType: np.ndarray
+    signalInterval: np.ndarray
+    signalTOccurrenceMS: np.ndarray
+
+    # from $OH1, packed into a `_PackedObjects` sequence when unpickled
+    stimulusObjects: list[list[ObjectHeader]] = field(default_factory=list)
+
+    # columns with one entry (or row) per trial
+    _trialColumns = (
+        "trialNumber",
+        "stimulusNumber",
+        "timeSequence",
+        "wasPerfectMonkey",
+        "wasHit",
+        "outcome",
+        "manipulandum",
+        "wasPreciseFixation",
+        "reactionTimeMS",
+        "rewardDurationMS",
+        "lastInterval",
+        "eyeControlFlag",
+        "intervalOfFrameLoss",
+        "timeOfFrameLoss",
+        "subheader1TrialNumber",
+        "tAbsTrialStart",
+        "tRelTrialStartMIN",
+        "tPositiveTriggerTransitionMS",
+        "tNegativeTriggerTransitionMS",
+        "tIntendedIntervalDurationMS",
+        "intervalType",
+    )
+    _signalColumns = ("signalType", "signalInterval", "signalTOccurrenceMS")
+    _enumTypes = {
+        "outcome": TrialOutcome,
+        "manipulandum": Manipulandum,
+        "intervalType": IntervalType,
+        "signalType": StartResponseSignalCode,
+    }
+
+    @staticmethod
+    def from_headers(headers: list[Header]) -> "TrialTable":
+        """Builds a table from the $TH1 and $OH1 headers of a TDR file."""
+        trialHeaders: list[TrialHeader] = []
+        stimulusObjects: list[list[ObjectHeader]] = []
+        for header in headers:
+            if isinstance(header, TrialHeader):
+                trialHeaders.append(header)
+                stimulusObjects.append([])
+            if isinstance(header, ObjectHeader):
+                stimulusObjects[-1].append(header)
+
+        signals = [
+            signal for header in trialHeaders for signal in header.subheader4.signals
+        ]
+        signalCounts = [len(header.subheader4.signals) for header in trialHeaders]
+        signalOffsets = np.zeros(len(trialHeaders) + 1, dtype=np.int64)
+        np.cumsum(signalCounts, out=signalOffsets[1:])
+
+        return TrialTable(
+            trialNumber=np.array([h.trialNumber for h in trialHeaders], dtype=np.int32),
+            stimulusNumber=np.array(
+                [h.stimulusNumber for h in trialHeaders], dtype=np.int32
+            ),
+            timeSequence=np.array(
+                [h.timeSequence for h in trialHeaders], dtype=np.int32
+            ),
+            wasPerfectMonkey=np.array(
+                [h.wasPerfectMonkey for h in trialHeaders], dtype=bool
+            ),
+            wasHit=np.array([h.wasHit for h in trialHeaders], dtype=bool),
+            outcome=np.array([h.outcome.value for h in trialHeaders], dtype=np.int8),
+            manipulandum=np.array(
+                [h.manipulandum.value for h in trialHeaders], dtype=np.int8
+            ),
+            wasPreciseFixation=np.array(
+                [h.wasPreciseFixation for h in trialHeaders], dtype=bool
+            ),
+            reactionTimeMS=np.array(
+                [h.reactionTimeMS for h in trialHeaders], dtype=np.float64
+            ),
+            rewardDurationMS=np.array(
+                [h.rewardDurationMS for h in trialHeaders], dtype=np.float64
+            ),
+            lastInterval=np.array(
+                [h.lastInterval for h in trialHeaders], dtype=np.int32
+            ),
+            eyeControlFlag=np.array(
+                [h.eyeControlFlag for h in trialHeaders], dtype=bool
+            ),
+            intervalOfFrameLoss=np.array(
+                [h.intervalOfFrameLoss for h in trialHeaders], dtype=np.int32
+            ),
+            timeOfFrameLoss=np.array(
+                [h.timeOfFrameLoss for h in trialHeaders], dtype=np.float64
+            ),
+            subheader1TrialNumber=np.array(
+                [h.subheader1.trialNumber for h in trialHeaders], dtype=np.int32
+            ),
+            tAbsTrialStart=np.array(
+                [h.subheader1.tAbsTrialStart for h in trialHeaders], dtype=str
+            ),
+            tRelTrialStartMIN=np.array(
+                [h.subheader1.tRelTrialStartMIN for h in trialHeaders],
+                dtype=np.float64,
+            ),
+            tPositiveTriggerTransitionMS=_pad_2d(
+                [h.subheader1.tPositiveTriggerTransitionMS for h in trialHeaders],
+                np.float64,
+                np.nan,
+                nTriggerTransitions,
+            ),
+            tNegativeTriggerTransitionMS=_pad_2d(
+                [h.subheader1.tNegativeTriggerTransitionMS for h in trialHeaders],
+                np.float64,
+                np.nan,
+                nTriggerTransitions,
+            ),
+            tIntendedIntervalDurationMS=_pad_2d(
+                [h.subheader2.tIntendedIntervalDurationMS for h in trialHeaders],
+                np.float64,
+                np.nan,
+                nIntervals,
+            ),
+            intervalType=_pad_2d(
+                [[t.value for t in h.subheader3.intervalType] for h in trialHeaders],
+                np.int8,
+                -1,
+                nIntervals,
+            ),
+            signalOffsets=signalOffsets,
+            signalType=np.array([s.type.value for s in signals], dtype=np.int8),
+            signalInterval=np.array([s.interval for s in signals], dtype=np.int32),
+            signalTOccurrenceMS=np.array(
+                [s.tOccurrenceMS for s in signals], dtype=np.float64
+            ),
+            stimulusObjects=stimulusObjects,
+        )
+
+    def __len__(self) -> int:
+        return len(self.trialNumber)
+
+    @staticmethod
+    def concatenate(tables: list["TrialTable"]) -> "TrialTable":
+        """Concatenates the rows of several tables, e.g. of different sessions.
+
+        2-D columns of different width are padded like in `from_headers()`.
+        The stimulus objects are concatenated in packed form.
+        """
+        columns = {}
+        for name in TrialTable._trialColumns + TrialTable._signalColumns:
+            values = [getattr(table, name) for table in tables]
+            if values[0].ndim == 2:
+                fill = -1 if name == "intervalType" else np.nan
+                width = max(v.shape[1] for v in values)
+                values = [
+                    np.pad(v, ((0, 0), (0, width - v.shape[1])), constant_values=fill)
+                    for v in values
+                ]
+            columns[name] = np.concatenate(values)
+
+        signalOffsets = [np.zeros(1, dtype=np.int64)]
+        nSignals = 0
+        for table in tables:
+            signalOffsets.append(table.signalOffsets[1:] + nSignals)
+            nSignals += int(table.signalOffsets[-1])
+
+        packedObjects = [
+            (
+                table.stimulusObjects.packed
+                if isinstance(table.stimulusObjects, _PackedObjects)
+                else _pack_objects(table.stimulusObjects)
+            )
+            for table in tables
+        ]
+        return TrialTable(
+            **columns,
+            signalOffsets=np.concatenate(signalOffsets),
+            stimulusObjects=_PackedObjects(_concatenate_packed(packedObjects)),
+        )
+
+    def __getstate__(self) -> dict:
+        # pickle stimulus objects as flat arrays instead of a graph of dataclasses
+        state = dict(vars(self))
+        if isinstance(self.stimulusObjects, _PackedObjects):
+            state["stimulusObjects"] = self.stimulusObjects.packed
+        else:
+            state["stimulusObjects"] = _pack_objects(self.stimulusObjects)
+        return state
+
+    def __setstate__(self, state: dict):
+        state["stimulusObjects"] = _PackedObjects(state["stimulusObjects"])
+        vars(self).update(state)
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            return self.get_trial(int(index))
+        return self.select(index)
+
+    def select(self, index) -> "TrialTable":
+        """Returns a new table with the rows selected by a slice, index array or boolean mask."""
+        rows = np.arange(len(self))[index]
+        signalOffsets, signalRows = _take_ragged(self.signalOffsets, rows)
+        columns = {name: getattr(self, name)[rows] for name in self._trialColumns}
+        columns.update(
+            {name: getattr(self, name)[signalRows] for name in self._signalColumns}
+        )
+        return TrialTable(
+            **columns,
+            signalOffsets=signalOffsets,
+            stimulusObjects=[self.stimulusObjects[iRow] for iRow in rows],
+        )
+
+    def get_trial(self, index: int) -> Trial:
+        """Builds a `Trial` object for a single row of the table."""
+        if index < 0:
+            index += len(self)
+        positive = self.tPositiveTriggerTransitionMS[index]
+        negative = self.tNegativeTriggerTransitionMS[index]
+        intended = self.tIntendedIntervalDurationMS[index]
+        intervalType = self.intervalType[index]
+        iSignalStart, iSignalEnd = self.signalOffsets[index : index + 2]
+
+        return Trial(
+            trialNumber=int(self.trialNumber[index]),
+            stimulusNumber=int(self.stimulusNumber[index]),
+            timeSequence=int(self.timeSequence[index]),
+            wasPerfectMonkey=bool(self.wasPerfectMonkey[index]),
+            wasHit=bool(self.wasHit[index]),
+            outcome=TrialOutcome(int(self.outcome[index])),
+            manipulandum=Manipulandum(int(self.manipulandum[index])),
+            wasPreciseFixation=bool(self.wasPreciseFixation[index]),
+            reactionTimeMS=float(self.reactionTimeMS[index]),
+            rewardDurationMS=float(self.rewardDurationMS[index]),
+            lastInterval=int(self.lastInterval[index]),
+            eyeControlFlag=bool(self.eyeControlFlag[index]),
+            intervalOfFrameLoss=int(self.intervalOfFrameLoss[index]),
+            timeOfFrameLoss=float(self.timeOfFrameLoss[index]),
+            tAbsTrialStart=str(self.tAbsTrialStart[index]),
+            tRelTrialStartMIN=float(self.tRelTrialStartMIN[index]),
+            tPositiveTriggerTransitionMS=_unpad(positive),
+            tNegativeTriggerTransitionMS=_unpad(negative),
+            tIntendedIntervalDurationMS=_unpad(intended),
+            intervalType=[IntervalType(int(t)) for t in intervalType if t >= 0],
+            signals=[
+                TrialSubheader4.StartStopSignal(
+                    StartResponseSignalCode(int(self.signalType[iSignal])),
+                    int(self.signalInterval[iSignal]),
+                    float(self.signalTOccurrenceMS[iSignal]),
+                )
+                for iSignal in range(iSignalStart, iSignalEnd)
+            ],
+            stimulusObjects=list(self.stimulusObjects[index]),
+        )
+
+    def get_trials(self) -> list[Trial]:
+        return [self.get_trial(index) for index in range(len(self))]
+
+    def to_headers(self) -> list[Header]:
+        """Rebuilds the $TH1 headers (with subheaders) and $OH1 headers in file order.
+
+        The headers are equal to the parsed ones. Their `nLines` and
+        `headerVersion` are not stored, as the parsers only accept the
+        default values of the header classes.
+        """
+        headers: list[Header] = []
+        for trial, subheader1TrialNumber in zip(
+            self.get_trials(), self.subheader1TrialNumber.tolist()
+        ):
+            headers.append(
+                TrialHeader(
+                    trialNumber=trial.trialNumber,
+                    stimulusNumber=trial.stimulusNumber,
+                    timeSequence=trial.timeSequence,
+                    wasPerfectMonkey=trial.wasPerfectMonkey,
+                    wasHit=trial.wasHit,
+                    outcome=trial.outcome,
+                    manipulandum=trial.manipulandum,
+                    wasPreciseFixation=trial.wasPreciseFixation,
+                    reactionTimeMS=trial.reactionTimeMS,
+                    rewardDurationMS=trial.rewardDurationMS,
+                    lastInterval=trial.lastInterval,
+                    eyeControlFlag=trial.eyeControlFlag,
+                    intervalOfFrameLoss=trial.intervalOfFrameLoss,
+                    timeOfFrameLoss=trial.timeOfFrameLoss,
+                    subheader1=TrialSubheader1(
+                        trialNumber=subheader1TrialNumber,
+                        tAbsTrialStart=trial.tAbsTrialStart,
+                        tRelTrialStartMIN=trial.tRelTrialStartMIN,
+                        tPositiveTriggerTransitionMS=trial.tPositiveTriggerTransitionMS,
+                        tNegativeTriggerTransitionMS=trial.tNegativeTriggerTransitionMS,
+                    ),
+                    subheader2=TrialSubheader2(
+                        tIntendedIntervalDurationMS=trial.tIntendedIntervalDurationMS
+                    ),
+                    subheader3=TrialSubheader3(intervalType=trial.intervalType),
+                    subheader4=TrialSubheader4(signals=trial.signals),
+                )
+            )
+            headers.extend(trial.stimulusObjects)
+        return headers
+
+    def with_outcome(self, outcomes: list[TrialOutcome]) -> "TrialTable":
+        return self.select(np.isin(self.outcome, [o.value for o in outcomes]))
+
+    def to_arrow(self):
+        """Returns the trials as a `pyarrow.Table` built directly from the columns.
+
+        Enum columns are dictionary encoded with the member names, 2-D columns
+        become fixed-size lists and the $TS4 signals a list of structs per
+        trial. Stimulus objects are not included.
+        """
+        import pyarrow as pa
+
+        columns = {
+            name: _to_arrow_array(getattr(self, name), self._enumTypes.get(name))
+            for name in self._trialColumns
+        }
+        columns["signals"] = self._signals_to_arrow()
+        return pa.table(columns)
+
+    def _signals_to_arrow(self):
+        import pyarrow as pa
+
+        signals = pa.StructArray.from_arrays(
+            [
+                _to_arrow_array(self.signalType, StartResponseSignalCode),
+                _to_arrow_array(self.signalInterval),
+                _to_arrow_array(self.signalTOccurrenceMS),
+            ],
+            names=["type", "interval", "tOccurrenceMS"],
+        )
+        return pa.ListArray.from_arrays(
+            pa.array(self.signalOffsets, type=pa.int32()), signals
+        )
+
+    def to_dataframe(self):
+        """Returns the trials as a pandas DataFrame without building per-trial objects.
+
+        Scalar columns keep their NumPy dtypes and enums become categoricals of
+        the member names. The 2-D columns and the signals are stored as
+        pyarrow-backed list columns, see `to_arrow()`.
+        """
+        import pandas as pd
+
+        columns = {}
+        for name in self._trialColumns:
+            values = getattr(self, name)
+            enumType = self._enumTypes.get(name)
+            if values.ndim == 2:
+                array = _to_arrow_array(values, enumType)
+                columns[name] = pd.Series(array, dtype=pd.ArrowDtype(array.type))
+            elif enumType is not None:
+                columns[name] = pd.Categorical.from_codes(
+                    _enum_positions(values, enumType),
+                    categories=[member.name for member in enumType],
+                )
+            else:
+                columns[name] = values
+        signals = self._signals_to_arrow()
+        columns["signals"] = pd.Series(signals, dtype=pd.ArrowDtype(signals.type))
+        return pd.DataFrame(columns)
+
+    def get_outcome_counts(self) -> dict[str, int]:
+        counts = np.bincount(self.outcome, minlength=len(TrialOutcome))
+        return {outcome.name: int(counts[outcome.value]) for outcome in TrialOutcome}
+
+    def get_interval_durations(self) -> np.ndarray:
+        """Returns the interval durations of all trials in milliseconds, NaN if invalid."""
+        return intervals.get_interval_durations(
+            self.tPositiveTriggerTransitionMS, self.tNegativeTriggerTransitionMS
+        )
+
+    def get_trial_durations(self) -> np.ndarray:
+        """Returns the total duration of each trial in milliseconds, see `Trial.get_trial_duration`."""
+        return intervals.get_trial_durations(
+            self.tPositiveTriggerTransitionMS, self.tNegativeTriggerTransitionMS
+        )
+
+    def get_trial_durations_after_start_signal(self) -> np.ndarray:
+        """Returns the duration of each trial after its first interval waiting for a start signal."""
+        return intervals.get_trial_durations_after_start_signal(
+            self.tPositiveTriggerTransitionMS,
+            self.tNegativeTriggerTransitionMS,
+            self.intervalType,
+        )
+
+
+def iter_tdr_tables(
+    filename: pathlib.Path, chunk_trials: int = 10_000
+) -> Iterator[TrialTable]:
+    """Reads a TDR file as a sequence of `TrialTable`s of up to `chunk_trials` trials.
+
+    Only the bytes of the current chunk are scanned and parsed, so the memory
+    used does not grow with the size of the file.
+    """
+    encoding = locale.getpreferredencoding(False)
+    with _map_tdr(filename) as data:
+        for start, end in _iter_trial_ranges(data, chunk_trials):
+            chunk = data[start:end]
+            headers = _decode_headers(chunk, scan_tdr(chunk), encoding)
+            yield TrialTable.from_headers(list(headers))
@@ -0,0 +1,21 @@
+import pathlib
+import shutil
+
+import pytest
+
+import vstim.tdr as tdr
+
+testFilename = pathlib.Path(__file__).parent / "test.tdr"
+
+
+@pytest.fixture
+def tdr_filename(tmp_path) -> pathlib.Path:
+    """A copy of test.tdr that tests may modify, e.g. to invalidate caches."""
+    filename = tmp_path / "test.tdr"
+    shutil.copy(testFilename, filename)
+    return filename
+
+
+@pytest.fixture
+def tdr_file() -> tdr.TdrFile:
+    return tdr.read_tdr(testFilename)
@@ -0,0 +1,60 @@
+import pathlib
+import pickle
+
+from vstim.batch import iter_tdr_many, read_tdr_many
+import vstim.tdr as tdr
+from vstim.tdr_stats import TdrStats
+
+
+def test_read_tdr_many():
+    filename = pathlib.Path(__file__).parent / pathlib.Path("test.tdr")
+    missing = pathlib.Path(__file__).parent / pathlib.Path("missing.tdr")
+
+    results = read_tdr_many([filename, missing, filename], workers=2)
+    assert [result.filename for result in results] == [filename, missing, filename]
+
+    assert results[0].error is None
+    assert results[0].fileHeader.date == tdr.read_tdr(filename).headers[0].date
+    assert results[0].table.get_trials() == tdr.read_tdr(filename).get_trials()
+
+    assert isinstance(results[1].error, FileNotFoundError)
+    assert results[1].table is None
+
+
+def test_iter_tdr_many():
+    filename = pathlib.Path(__file__).parent / pathlib.Path("test.tdr")
+    results = list(iter_tdr_many([filename] * 3, workers=1))
+    assert len(results) == 3
+    assert all(len(result.table) == 5 for result in results)
+
+
+def test_trial_table_pickle():
+    filename = pathlib.Path(__file__).parent / pathlib.Path("test.tdr")
+    table = tdr.read_tdr(filename).to_table()
+    unpickled = pickle.loads(pickle.dumps(table))
+    assert unpickled.get_trials() == table.get_trials()
+    assert (
+        pickle.loads(pickle.dumps(unpickled[1:3])).get_trials()
+        == table[1:3].get_trials()
+    )
+
+
+def test_read_tdr_workers(tmp_path):
+    filename = pathlib.Path(__file__).parent / pathlib.Path("test.tdr")
+    expected = tdr.read_tdr(filename)
+    data = filename.read_bytes()
+    assert tdr._split_trial_ranges(data, 1) == [(0, len(data))]
+    # more chunks than trials
+    ranges = tdr._split_trial_ranges(data, 20)
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(data)
+    assert all(data[start:].startswith(b"$TH1") for start, _ in ranges[1:])
+
+    stats = TdrStats()
+    tdrFile = tdr.read_tdr(filename, workers=3, stats=stats)
+    assert set(stats.phases) == {"partition", "parallel"}
+    assert tdrFile.get_trials() == expected.get_trials()
+    assert tdrFile.get_file_header() == expected.headers[0]
+
+    empty = tmp_path / "empty.tdr"
+    empty.write_bytes(b"")
+    assert tdr.read_tdr(empty, workers=2).get_trials() == []
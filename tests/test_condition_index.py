@@ -0,0 +1,66 @@
+import pathlib
+
+import numpy as np
+import pytest
+
+import vstim.tdr as tdr
+from vstim.condition_index import ConditionIndex
+
+
+def test_condition_index():
+    tdrFile = tdr.read_tdr(pathlib.Path(__file__).parent / "test.tdr")
+    trials = tdrFile.get_trials()
+    index = tdrFile.get_condition_index()
+    assert index is tdrFile.get_condition_index()
+    assert index.sessionKeys[0].startswith("2023-08-07T08:58:57")
+
+    for key in {(t.stimulusNumber, t.timeSequence, t.outcome) for t in trials}:
+        expected = [
+            i
+            for i, t in enumerate(trials)
+            if (t.stimulusNumber, t.timeSequence, t.outcome) == key
+        ]
+        assert index.get_trial_indices(key).tolist() == expected
+    assert len(index.get_trial_indices((-5, 0, tdr.TrialOutcome.Hit))) == 0
+
+    summary = index.summarize()
+    assert summary["count"].sum() == len(trials)
+    byOutcome = index.summarize(["outcome"])
+    nHits = sum(t.outcome == tdr.TrialOutcome.Hit for t in trials)
+    assert byOutcome["nHits"].sum() == nHits
+    reactionTimes = [t.reactionTimeMS for t in trials if t.reactionTimeMS >= 0]
+    overall = index.summarize([])
+    assert overall["count"].tolist() == [len(trials)]
+    assert overall["reactionTimeMeanMS"][0] == pytest.approx(np.mean(reactionTimes))
+    assert overall["reactionTimeMedianMS"][0] == pytest.approx(np.median(reactionTimes))
+    assert overall["rewardTotalMS"][0] == sum(t.rewardDurationMS for t in trials)
+
+
+def test_condition_index_merge():
+    table = tdr.read_tdr(pathlib.Path(__file__).parent / "test.tdr").to_table()
+    index = ConditionIndex.from_table(table, sessionKeys=["a"])
+    other = ConditionIndex.from_table(table[:3], sessionKeys=["b"])
+    merged = ConditionIndex.merge([index, other])
+    assert merged.sessionKeys == ["a", "b"]
+    assert merged.aggregates["count"].sum() == len(table) + 3
+
+    key = tuple(merged.keys[0].tolist())
+    assert np.array_equal(
+        merged.get_trial_indices(key, session=0), index.get_trial_indices(key)
+    )
+    assert np.array_equal(
+        merged.get_trial_indices(key, session=1), other.get_trial_indices(key)
+    )
+    # the same as an index over both tables at once
+    direct = ConditionIndex.from_table(
+        type(table).concatenate([table, table[:3]]),
+        session=np.repeat([0, 1], [len(table), 3]),
+        sessionKeys=["a", "b"],
+    )
+    for name, values in merged.summarize().items():
+        assert np.allclose(values, direct.summarize()[name], equal_nan=True)
+
+    pytest.importorskip("pandas")
+    df = merged.to_dataframe(["stimulusNumber", "outcome"])
+    assert df["outcome"].dtype == "category"
+    assert df["count"].sum() == len(table) + 3
@@ -0,0 +1,162 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from vstim.event_listener import (
+    EventListener,
+    EventRingBuffer,
+    EventSender,
+    decode_event_packet,
+    encode_event_packet,
+)
+from vstim.event_log import EventDtype
+from vstim.network_event_codes import VStimEventCode
+
+
+def make_events(start: int, n: int, code=VStimEventCode.LeverPressed1) -> np.ndarray:
+    events = np.zeros(n, dtype=EventDtype)
+    events["timestamp"] = np.arange(start, start + n, dtype=np.float64)
+    events["code"] = getattr(code, "value", code)
+    events["payload"] = np.arange(start, start + n)
+    return events
+
+
+def test_ring_buffer():
+    buffer = EventRingBuffer(capacity=5)
+    buffer.write(make_events(0, 3))
+    events, nRead = buffer.get_since(0)
+    assert events["payload"].tolist() == [0, 1, 2]
+    assert nRead == 3
+
+    buffer.write(make_events(3, 4, VStimEventCode.Interval1Started))
+    assert len(buffer) == 5
+    events, nRead = buffer.get_since(nRead)
+    assert events["payload"].tolist() == [3, 4, 5, 6]
+    # 0 and 1 were overwritten
+    assert buffer.get_since(0)[0]["payload"].tolist() == [2, 3, 4, 5, 6]
+
+    assert buffer.get_window(2.0)["payload"].tolist() == [5, 6]
+    assert buffer.get_window(10.0, "lever")["payload"].tolist() == [2]
+
+    buffer.write(make_events(7, 12))
+    assert buffer.get_since(0)[0]["payload"].tolist() == [14, 15, 16, 17, 18]
+    assert buffer.nWritten == 19
+
+
+@pytest.mark.parametrize("protocol", ["udp", "tcp"])
+def test_listener(protocol):
+    async def main():
+        async with EventListener(protocol=protocol) as listener:
+            received = []
+
+            async def receive():
+                async for events in listener:
+                    received.append(events)
+                    if sum(len(e) for e in received) == 30:
+                        return
+
+            receiver = asyncio.create_task(receive())
+            await asyncio.sleep(0)
+            with EventSender("127.0.0.1", listener.port, protocol) as sender:
+                sender.send(make_events(0, 10))
+                await asyncio.sleep(0.05)
+                # a lost packet
+                sender.sequence += 1
+                sender.send(make_events(10, 20, VStimEventCode.Interval1Started))
+                await asyncio.wait_for(receiver, 5.0)
+            return listener, np.concatenate(received)
+
+    listener, received = asyncio.run(main())
+    assert received["payload"].tolist() == list(range(30))
+    counters = listener.get_counters()
+    assert counters["nPackets"] == 2
+    assert counters["nEvents"] == 30
+    assert counters["nDroppedPackets"] == 1
+    assert 0.0 <= counters["meanLatency"] < 5.0
+    assert len(listener.get_window(100.0, "lever")) == 10
+
+
+def test_listener_invalid_packet():
+    async def main():
+        async with EventListener() as listener:
+            with EventSender("127.0.0.1", listener.port) as sender:
+                sender.socket.send(b"garbage")
+                sender.send(make_events(0, 2))
+            for _ in range(100):
+                if listener.nPackets == 1:
+                    break
+                await asyncio.sleep(0.01)
+            return listener
+
+    listener = asyncio.run(main())
+    assert listener.nInvalidPackets == 1
+    assert listener.nEvents == 2
+
+
+async def wait_for_packets(listener: EventListener, nPackets: int):
+    for _ in range(100):
+        if listener.nPackets + listener.nLatePackets >= nPackets:
+            break
+        await asyncio.sleep(0.01)
+
+
+def test_listener_reordered_packets():
+    async def main():
+        async with EventListener() as listener:
+            with EventSender("127.0.0.1", listener.port) as sender:
+                for sequence in (0, 2, 1, 3):
+                    packet = encode_event_packet(
+                        make_events(sequence, 1), sequence=sequence
+                    )
+                    sender.socket.send(packet)
+            await wait_for_packets(listener, 4)
+            return listener
+
+    listener = asyncio.run(main())
+    assert listener.nDroppedPackets == 1
+    assert listener.nLatePackets == 1
+    assert listener.buffer.get_since(0)[0]["payload"].tolist() == [0, 2, 3]
+
+
+def test_listener_tcp_rejects_oversized_packet():
+    async def main():
+        async with EventListener(protocol="tcp", max_packet_events=10) as listener:
+            sender = EventSender("127.0.0.1", listener.port, "tcp")
+            sender.send(make_events(0, 11))
+            for _ in range(100):
+                if listener.nInvalidPackets:
+                    break
+                await asyncio.sleep(0.01)
+            return listener, sender
+
+    listener, sender = asyncio.run(main())
+    with sender:
+        assert listener.nInvalidPackets == 1
+        assert listener.nEvents == 0
+        # the listener closed the connection
+        assert sender.socket.recv(1) == b""
+
+
+def test_listener_close_closes_tcp_connections():
+    async def main():
+        async with EventListener(protocol="tcp") as listener:
+            sender = EventSender("127.0.0.1", listener.port, "tcp")
+            sender.send(make_events(0, 2))
+            await wait_for_packets(listener, 1)
+            assert len(listener._writers) == 1
+        assert not listener._writers
+        return sender
+
+    with asyncio.run(main()) as sender:
+        assert sender.socket.recv(1) == b""
+
+
+def test_decode_event_packet_rejects_bad_length():
+    packet = encode_event_packet(make_events(0, 2), sequence=0)
+    assert decode_event_packet(packet)[1]["payload"].tolist() == [0, 1]
+    for data in (packet[:-1], packet + packet[-16:], packet[:4]):
+        with pytest.raises(ValueError):
+            decode_event_packet(data)
+    with pytest.raises(ValueError):
+        EventListener(protocol="http")
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from vstim.event_log import EventDtype, read_event_log, write_event_log
+from vstim.network_event_codes import VStimEventCode
+
+
+def make_events() -> np.ndarray:
+    codes = [
+        VStimEventCode.TrialStarted,
+        VStimEventCode.Interval1Started,
+        VStimEventCode.LeverPressed1,
+        VStimEventCode.EyeReachedTarget2,
+        VStimEventCode.Interval1Ended,
+        VStimEventCode.LeverReleased1,
+        VStimEventCode.TrialEndedWithHit,
+    ]
+    events = np.zeros(len(codes), dtype=EventDtype)
+    events["timestamp"] = np.arange(len(codes)) * 0.5
+    events["code"] = [code.value for code in codes]
+    events["payload"] = np.arange(len(codes))
+    return events
+
+
+def test_read_event_log(tmp_path):
+    filename = tmp_path / "events.bin"
+    events = make_events()
+    write_event_log(filename, events)
+    log = read_event_log(filename)
+    assert len(log) == len(events)
+    assert np.array_equal(log.events, events)
+    assert isinstance(log.events, np.memmap)
+
+    # time ranges are views of the mapped file
+    window = log.between(0.5, 2.0)
+    assert window.payload.tolist() == [1, 2, 3]
+    assert np.shares_memory(window.events, log.events)
+
+    assert log.with_families("lever").payload.tolist() == [2, 5]
+    assert log.with_families(["interval", "outcome"]).payload.tolist() == [1, 4, 6]
+    assert log.with_codes([VStimEventCode.EyeReachedTarget2]).payload.tolist() == [3]
+    assert log.get_names()[0] == "TrialStarted"
+
+
+def test_read_event_log_partial(tmp_path):
+    filename = tmp_path / "events.bin"
+    write_event_log(filename, make_events())
+    with open(filename, "ab") as file:
+        file.write(b"\x00" * 5)
+    with pytest.warns(UserWarning, match="incomplete"):
+        log = read_event_log(filename)
+    assert len(log) == 7
+
+    filename.write_bytes(b"not an event log")
+    with pytest.raises(AssertionError):
+        read_event_log(filename)
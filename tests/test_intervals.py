@@ -0,0 +1,52 @@
+import pathlib
+
+import numpy as np
+
+import vstim.tdr as tdr
+from vstim import intervals
+
+
+def test_interval_durations():
+    filename = pathlib.Path(__file__).parent / pathlib.Path("test.tdr")
+    tdr_file = tdr.read_tdr(filename)
+    trials = tdr_file.get_trials()
+    table = tdr_file.to_table()
+
+    durations = table.get_interval_durations()
+    assert durations.shape == (5, tdr.nIntervals)
+    for trial, row in zip(trials, durations):
+        assert row[~np.isnan(row)].tolist() == trial.get_interval_durations()
+
+    assert np.allclose(
+        table.get_trial_durations(), [t.get_trial_duration() for t in trials]
+    )
+    assert np.allclose(
+        table.get_trial_durations_after_start_signal(),
+        [t.get_trial_duration_after_start_signal() for t in trials],
+    )
+
+
+def test_trial_duration_after_start_signal():
+    positive = np.array([[0.0, 100.0, 300.0, 600.0], [0.0, 100.0, 300.0, 600.0]])
+    negative = np.array([[100.0, 300.0, 600.0, -10.0], [100.0, 300.0, 600.0, 700.0]])
+    intervalType = np.array([[0, 1, 0, 0], [0, 0, 0, 0]])
+    result = intervals.get_trial_durations_after_start_signal(
+        positive, negative, intervalType
+    )
+    assert result[0] == 300.0
+    assert np.isnan(result[1])
+
+    trial = tdr.Trial(
+        tPositiveTriggerTransitionMS=positive[0].tolist(),
+        tNegativeTriggerTransitionMS=negative[0].tolist(),
+        intervalType=[tdr.IntervalType(t) for t in intervalType[0]],
+    )
+    assert trial.get_trial_duration_after_start_signal() == 300.0
+
+
+def test_read_trigger_transitions():
+    filename = pathlib.Path(__file__).parent / pathlib.Path("test.tdr")
+    table = tdr.read_tdr(filename).to_table()
+    positive, negative = intervals.read_trigger_transitions(filename)
+    assert np.array_equal(positive, table.tPositiveTriggerTransitionMS)
+    assert np.array_equal(negative, table.tNegativeTriggerTransitionMS)
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from vstim.network_event_codes import (
+    VStimEventCode,
+    classify_events,
+    decode_events,
+    eventCodeRanges,
+    eventNameCodes,
+    get_event_range_numbers,
+    in_event_range,
+)
+
+
+def test_get_event_name():
+    assert VStimEventCode.get_event_name(0) == "NullEvent"
+    assert VStimEventCode.get_event_name(1005) == "Vtl5On"
+    # aliases map to the first defined name
+    assert VStimEventCode.get_event_name(61) == "NewTrialTypeSetLoaded"
+    assert VStimEventCode.get_event_name(12345) is None
+    assert eventNameCodes["LoadedTrialTypeSet1"] == 61
+    assert eventNameCodes["TtlOutputWordUpdated"] == 1199
+
+
+def test_decode_events():
+    codes = np.array([0, 1005, 12345, -1, 70000, 200])
+    names = decode_events(codes)
+    assert names.tolist() == ["NullEvent", "Vtl5On", None, None, None, "IntervalEnded"]
+
+    pytest.importorskip("pandas")
+    categories = decode_events(codes, categorical=True)
+    assert categories[1] == "Vtl5On"
+    assert categories.isna().tolist() == [False, False, True, True, True, False]
+
+
+def test_event_ranges():
+    codes = np.array([5, 100, 105, 220, 1005, 1199, 1200, 1301])
+    assert in_event_range(codes, "VtlOff").tolist() == [
+        False, False, False, False, False, True, False, False
+    ]  # fmt: skip
+    assert get_event_range_numbers(codes, "IntervalStarted").tolist() == [
+        -1, 0, 5, -1, -1, -1, -1, -1
+    ]  # fmt: skip
+    rangeNames = list(eventCodeRanges)
+    assert [
+        rangeNames[i] if i >= 0 else None for i in classify_events(codes).tolist()
+    ] == [
+        None,
+        "IntervalStarted",
+        "IntervalStarted",
+        "IntervalEnded",
+        "VtlOn",
+        "VtlOff",
+        "TtlOn",
+        "TtlOff",
+    ]
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+import vstim.tdr as tdr
+from vstim.object_table import ObjectTable
+from vstim.tdr_synthetic import write_synthetic_tdr
+
+
+def test_fixation_point_subheader(tdr_file):
+    trial = tdr_file.get_trial(0)
+    fixationPoint = trial.stimulusObjects[0]
+    assert fixationPoint.typeName == "Fixation Point 1"
+    subheader = fixationPoint.subheaders[0]
+    assert subheader.isActive
+    assert subheader.tAppearanceMS.typecode == "d"
+    assert subheader.tAppearanceMS[:2] == pytest.approx([2010.0, 7630.0])
+    assert subheader.tDisappearanceMS[:2] == pytest.approx([7630.0, 8050.0])
+
+
+def test_object_table(tdr_file):
+    trials = tdr_file.get_trials()
+    objects = tdr_file.to_object_table()
+    expected = [o for trial in trials for o in trial.stimulusObjects]
+    assert len(objects) == len(expected)
+    assert objects.objectNumber.tolist() == [o.objectNumber for o in expected]
+    assert objects.xPos.tolist() == [o.xPos for o in expected]
+    assert objects.typeName.tolist() == [o.typeName for o in expected]
+    assert objects.trialNumber.tolist() == [
+        trial.trialNumber for trial in trials for _ in trial.stimulusObjects
+    ]
+
+    fixationPoints = objects.with_type("Fixation Point 1")
+    assert len(fixationPoints) == 10
+    assert fixationPoints.isActive.tolist()[:2] == [True, False]
+    assert fixationPoints.tAppearanceMS.shape == (10, 8)
+    assert np.isnan(objects.with_type("Morph PDF 1").tAppearanceMS).all()
+
+    # join with the trial columns
+    table = tdr_file.to_table()
+    outcomes = table.outcome[objects.trialIndex]
+    assert outcomes.tolist() == [
+        trial.outcome.value for trial in trials for _ in trial.stimulusObjects
+    ]
+
+    # packed objects, e.g. of concatenated tables, give the same table
+    concatenated = ObjectTable.from_trial_table(type(table).concatenate([table, table]))
+    assert len(concatenated) == 2 * len(objects)
+    assert np.array_equal(
+        concatenated.tAppearanceMS[len(objects) :], objects.tAppearanceMS, True
+    )
+
+
+def test_object_table_to_dataframe(tdr_file):
+    pytest.importorskip("pandas")
+    pytest.importorskip("pyarrow")
+    objects = tdr_file.to_object_table()
+    df = objects.to_dataframe()
+    assert len(df) == len(objects)
+    assert df["typeName"].dtype == "category"
+    assert df["tAppearanceMS"].iloc[0][0] == pytest.approx(2010.0)
+    assert objects.to_arrow().num_rows == len(objects)
+
+
+def test_object_table_without_subheaders(tdr_filename, tmp_path):
+    pytest.importorskip("pandas")
+    pytest.importorskip("pyarrow")
+    lines = tdr_filename.read_text().splitlines(keepends=True)
+    tdr_filename.write_text(
+        "".join(line for line in lines if not line.startswith("$OS1"))
+    )
+    objects = tdr.read_tdr(tdr_filename).to_object_table()
+    assert not objects.isActive.any()
+    assert objects.tAppearanceMS.shape == (len(objects), 8)
+    assert objects.to_arrow().num_rows == len(objects)
+    assert objects.to_dataframe()["tAppearanceMS"].iloc[0] == [None] * 8
+
+    write_synthetic_tdr(tmp_path / "empty.tdr", 3, nObjects=0)
+    empty = tdr.read_tdr(tmp_path / "empty.tdr").to_object_table()
+    assert len(empty) == 0
+    assert len(empty.to_dataframe()) == 0
@@ -3,6 +3,8 @@ import datetime
 import vstim.tdr as tdr
 import pathlib
 
+import pytest
+
 
 def test_read_tdr():
     # use test.tdr in same directory as this file
@@ -157,3 +159,109 @@ def test_ObjectHeader():
     assert header.typeName == "Morph PDF 1"
 
     # TODO: add tests for ObjectSubheader1
+
+
+def test_iter_tdr_headers():
+    filename = pathlib.Path(__file__).parent / pathlib.Path("test.tdr")
+    headers = tdr.iter_tdr_headers(filename)
+    assert isinstance(next(headers), tdr.FileStartHeader)
+    assert isinstance(next(headers), tdr.TrialHeader)
+    assert list(tdr.iter_tdr_headers(filename)) == tdr.read_tdr(filename).headers
+
+
+def test_iter_tdr_trials():
+    filename = pathlib.Path(__file__).parent / pathlib.Path("test.tdr")
+    trials = list(tdr.iter_tdr_trials(filename))
+    assert trials == tdr.read_tdr(filename).get_trials()
+    assert all(len(trial.stimulusObjects) > 0 for trial in trials)
+
+
+def test_scan_tdr():
+    filename = pathlib.Path(__file__).parent / pathlib.Path("test.tdr")
+    data = filename.read_bytes()
+    index = tdr.scan_tdr(data)
+    assert len(index) == 1466
+    assert index["offset"][0] == 0
+    assert index["headerId"][0] == b"$FH1"
+    assert (index["headerId"] == b"$TH1").sum() == 5
+
+    # workaround for VStim bug #210 is applied to $TH1 version 5
+    th1 = index[index["headerId"] == b"$TH1"][0]
+    assert th1["nLines"] == 5
+    lines = data[th1["offset"] : th1["end"]].decode().splitlines()
+    assert [line[:4] for line in lines] == ["$TH1", "$TS1", "$TS2", "$TS3", "$TS4"]
+
+
+def test_scan_tdr_crlf(tmp_path):
+    filename = pathlib.Path(__file__).parent / pathlib.Path("test.tdr")
+    crlf_filename = tmp_path / "crlf.tdr"
+    crlf_filename.write_bytes(filename.read_bytes().replace(b"\n", b"\r\n"))
+    assert tdr.read_tdr(crlf_filename).headers == tdr.read_tdr(filename).headers
+
+
+def test_trials_are_cached():
+    filename = pathlib.Path(__file__).parent / pathlib.Path("test.tdr")
+    tdr_file = tdr.read_tdr(filename)
+    trials = tdr_file.get_trials()
+    assert tdr_file.get_trials()[0] is trials[0]
+    assert tdr_file.get_trial(2) is trials[2]
+
+    counts = tdr_file.get_outcome_counts()
+    assert sum(counts.values()) == 5
+    assert len(tdr_file.get_hits()) == counts["Hit"]
+    assert tdr_file.get_trials_with_outcome(list(tdr.TrialOutcome)) == trials
+
+    # assigning headers invalidates the cache
+    tdr_file.headers = tdr_file.headers[:1]
+    assert tdr_file.get_trials() == []
+    assert sum(tdr_file.get_outcome_counts().values()) == 0
+
+
+def test_read_tdr_lazy():
+    filename = pathlib.Path(__file__).parent / pathlib.Path("test.tdr")
+    lazy_file = tdr.read_tdr(filename, lazy=True)
+    trial_headers = [h for h in lazy_file.headers if isinstance(h, tdr.TrialHeader)]
+    assert all(isinstance(h, tdr.LazyTrialHeader) for h in trial_headers)
+
+    # outcome counts only need the $TH1 lines, subheaders stay unparsed
+    assert sum(lazy_file.get_outcome_counts().values()) == 5
+    with pytest.raises(AttributeError):
+        object.__getattribute__(trial_headers[0], "subheader1")
+
+    eager_file = tdr.read_tdr(filename)
+    assert lazy_file.headers == eager_file.headers
+    assert eager_file.headers == lazy_file.headers
+    assert lazy_file.get_trials() == eager_file.get_trials()
+    assert object.__getattribute__(trial_headers[0], "subheader1") is not None
+
+
+def test_read_tdr_where():
+    filename = pathlib.Path(__file__).parent / pathlib.Path("test.tdr")
+    trials = tdr.read_tdr(filename).get_trials()
+    outcome = trials[0].outcome
+
+    tdr_file = tdr.read_tdr(filename, where=tdr.make_trial_filter(outcomes=[outcome]))
+    assert tdr_file.get_trials() == [t for t in trials if t.outcome == outcome]
+    assert isinstance(tdr_file.headers[0], tdr.FileStartHeader)
+
+    assert tdr.read_tdr(filename, where=lambda h: False).get_trials() == []
+    assert list(tdr.iter_tdr_trials(filename, trial_range=range(2, 4))) == trials[1:3]
+    stimulus = trials[3].stimulusNumber
+    assert list(
+        tdr.iter_tdr_trials(filename, stimuli=[stimulus], trial_range=range(4, 6))
+    ) == [t for t in trials[3:] if t.stimulusNumber == stimulus]
+    assert list(tdr.iter_tdr_trials(filename, where=lambda h: True)) == trials
+
+
+def test_read_tdr_rejects_conflicting_arguments(tmp_path):
+    filename = pathlib.Path(__file__).parent / pathlib.Path("test.tdr")
+    hits = tdr.make_trial_filter(outcomes=[tdr.TrialOutcome.Hit])
+    for kwargs in (
+        {"where": hits, "cache_dir": tmp_path},
+        {"where": hits, "workers": 2},
+        {"lazy": True, "cache_dir": tmp_path},
+        {"lazy": True, "workers": 2},
+    ):
+        with pytest.raises(ValueError):
+            tdr.read_tdr(filename, **kwargs)
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,59 @@
+import pytest
+
+import vstim.tdr as tdr
+from vstim.tdr_cache import evict_cache, get_cache_key
+
+
+def test_read_tdr_cached(tdr_filename, tmp_path):
+    cache_dir = tmp_path / "cache"
+    expected = tdr.read_tdr(tdr_filename)
+
+    first = tdr.read_tdr(tdr_filename, cache_dir=cache_dir)
+    key = get_cache_key(tdr_filename)
+    assert (cache_dir / f"{key}.npz").exists()
+    assert (cache_dir / f"{key}.json").exists()
+    assert first.get_trials() == expected.get_trials()
+
+    cached = tdr.read_tdr(tdr_filename, cache_dir=cache_dir)
+    assert cached._headers is None
+    assert cached.get_trials() == expected.get_trials()
+    assert cached.get_outcome_counts() == expected.get_outcome_counts()
+    assert cached.headers[0] == expected.headers[0]
+    assert cached.headers[1:] == expected.headers[1:]
+
+
+def test_cache_invalidation(tdr_filename, tmp_path):
+    cache_dir = tmp_path / "cache"
+    tdr.read_tdr(tdr_filename, cache_dir=cache_dir, hash_content=True)
+    key = get_cache_key(tdr_filename, hash_content=True)
+
+    with open(tdr_filename, "a") as file:
+        file.write("\n")
+    assert get_cache_key(tdr_filename, hash_content=True) != key
+    assert len(tdr.read_tdr(tdr_filename, cache_dir=cache_dir).get_trials()) == 5
+    assert len(list(cache_dir.glob("*.json"))) == 2
+
+    evict_cache(cache_dir, max_bytes=0)
+    assert list(cache_dir.iterdir()) == []
+
+
+def test_cache_keeps_all_headers(tdr_filename, tmp_path):
+    lines = tdr_filename.read_text().splitlines(keepends=True)
+    # a $TS1 trial number that differs from $TH1, no $FH1 and an $FH2
+    iTs1 = next(i for i, line in enumerate(lines) if line.startswith("$TS1"))
+    lines[iTs1] = lines[iTs1].replace("     1  08:59:28", "    99  08:59:28", 1)
+    lines = lines[5:] + ["\n$FH2   2   1\n", "end of file\n"]
+    tdr_filename.write_text("".join(lines))
+    expected = tdr.read_tdr(tdr_filename)
+    assert expected.get_file_header() is None
+    assert expected.headers[0].subheader1.trialNumber == 99
+    assert expected.headers[-1] == tdr.FileEndHeader(
+        nLines=2, headerVersion=1, lines=["end of file"]
+    )
+
+    cache_dir = tmp_path / "cache"
+    tdr.read_tdr(tdr_filename, cache_dir=cache_dir)
+    cached = tdr.read_tdr(tdr_filename, cache_dir=cache_dir)
+    assert cached._headers is None
+    assert cached.get_file_end_header() == expected.headers[-1]
+    assert cached == expected
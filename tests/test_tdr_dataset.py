@@ -0,0 +1,82 @@
+import pathlib
+import shutil
+
+import numpy as np
+import pytest
+
+import vstim.tdr as tdr
+from vstim.tdr_dataset import TdrDataset, get_session_key
+from vstim.tdr_synthetic import write_synthetic_tdr
+
+
+@pytest.fixture
+def session_dir(tmp_path) -> pathlib.Path:
+    filename = pathlib.Path(__file__).parent / pathlib.Path("test.tdr")
+    shutil.copy(filename, tmp_path / "b.tdr")
+    write_synthetic_tdr(tmp_path / "a.tdr", 20, nObjects=2)
+    return tmp_path
+
+
+def test_get_session_key():
+    filename = pathlib.Path(__file__).parent / pathlib.Path("test.tdr")
+    key = get_session_key(tdr.read_file_header(filename))
+    assert key == (
+        "2023-08-07T08:58:57 Spock 20230807 Attend Half Shapes44 With Target Catch"
+    )
+
+
+def test_tdr_dataset(session_dir):
+    dataset = TdrDataset.from_directory(session_dir, workers=1)
+    assert dataset._table is None
+    assert dataset.filenames == [session_dir / "b.tdr", session_dir / "a.tdr"]
+
+    assert len(dataset) == 25
+    assert dataset.session.tolist() == [0] * 5 + [1] * 20
+    trials = tdr.read_tdr(session_dir / "b.tdr").get_trials()
+    assert dataset.table[:5].get_trials() == trials
+
+    counts = dataset.get_outcome_counts()
+    assert sum(counts[dataset.sessionKeys[0]].values()) == 5
+    assert counts[dataset.sessionKeys[0]]["Hit"] == 4
+
+    groups = dataset.group_indices(["session", "outcome"])
+    assert groups[(dataset.sessionKeys[0], tdr.TrialOutcome.Late)].tolist() == [3]
+    assert sum(len(rows) for rows in groups.values()) == 25
+
+    hits = dataset.with_outcome([tdr.TrialOutcome.Hit])
+    assert np.all(hits.table.outcome == tdr.TrialOutcome.Hit.value)
+    assert hits.sessionKeys == dataset.sessionKeys
+
+
+def test_tdr_dataset_select_sessions(session_dir):
+    dataset = TdrDataset.from_glob(str(session_dir / "*.tdr"), workers=1)
+    key = dataset.sessionKeys[1]
+
+    # selecting before loading only reads the selected files
+    lazy = dataset.select_sessions([key])
+    assert lazy.filenames == [session_dir / "a.tdr"]
+    assert len(lazy) == 20
+
+    assert len(dataset) == 25
+    loaded = dataset.select_sessions([key])
+    assert loaded.sessionKeys == [key]
+    assert loaded.session.tolist() == [0] * 20
+    assert loaded.table.get_trials() == lazy.table.get_trials()
+
+
+def test_tdr_dataset_to_dataframe(session_dir):
+    pytest.importorskip("pandas")
+    pytest.importorskip("pyarrow")
+    dataset = TdrDataset.from_directory(session_dir, workers=1)
+    df = dataset.to_dataframe()
+    assert list(df["session"].cat.categories) == dataset.sessionKeys
+    assert (df["session"] == dataset.sessionKeys[1]).sum() == 20
+
+
+def test_empty_tdr_dataset_to_dataframe(tmp_path):
+    pytest.importorskip("pandas")
+    pytest.importorskip("pyarrow")
+    dataset = TdrDataset.from_directory(tmp_path, workers=1)
+    df = dataset.to_dataframe()
+    assert len(df) == 0
+    assert "session" in df.columns
@@ -0,0 +1,126 @@
+import json
+import pathlib
+
+import numpy as np
+import pytest
+
+import vstim.tdr as tdr
+from vstim.tdr_export import export_tdr
+
+
+def test_export_tdr_parquet(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    filename = pathlib.Path(__file__).parent / pathlib.Path("test.tdr")
+    export_tdr(filename, tmp_path / "out", chunk_trials=2)
+
+    trials_file = pq.ParquetFile(tmp_path / "out" / "trials.parquet")
+    assert trials_file.num_row_groups == 3
+    metadata = json.loads(trials_file.schema_arrow.metadata[b"vstim"])
+    assert metadata["fileHeader"]["date"] == "2023-08-07"
+
+    trials = tdr.read_tdr(filename).get_trials()
+    table = pq.read_table(tmp_path / "out" / "trials.parquet", columns=["outcome"])
+    assert table.column_names == ["outcome"]
+    assert table.column("outcome").to_pylist() == [t.outcome.name for t in trials]
+
+    objects = pq.read_table(tmp_path / "out" / "objects.parquet").to_pydict()
+    assert len(objects["trialIndex"]) == sum(len(t.stimulusObjects) for t in trials)
+    iLast = len(objects["trialIndex"]) - 1
+    assert objects["trialIndex"][iLast] == 4
+    assert objects["trialNumber"][iLast] == trials[4].trialNumber
+    assert objects["typeName"][iLast] == trials[4].stimulusObjects[-1].typeName
+
+
+def test_export_tdr_hdf5(tmp_path):
+    h5py = pytest.importorskip("h5py")
+    filename = pathlib.Path(__file__).parent / pathlib.Path("test.tdr")
+    export_tdr(filename, tmp_path / "out.h5", format="hdf5", chunk_trials=2)
+
+    table = tdr.read_tdr(filename).to_table()
+    with h5py.File(tmp_path / "out.h5") as file:
+        assert json.loads(file.attrs["vstim"])["fileHeader"]["refreshRate"] == 100.0
+        trials = file["trials"]
+        assert np.array_equal(trials["outcome"][:], table.outcome)
+        assert np.array_equal(
+            trials["tPositiveTriggerTransitionMS"][:],
+            table.tPositiveTriggerTransitionMS,
+        )
+        assert np.array_equal(trials["signalOffsets"][:], table.signalOffsets)
+        assert np.array_equal(trials["signalType"][:], table.signalType)
+        n_objects = sum(len(objects) for objects in table.stimulusObjects)
+        assert file["objects/trialIndex"].shape == (n_objects,)
+        assert file["objects/trialIndex"][-1] == 4
+
+
+def test_export_tdr_unknown_format(tmp_path):
+    filename = pathlib.Path(__file__).parent / pathlib.Path("test.tdr")
+    with pytest.raises(ValueError):
+        export_tdr(filename, tmp_path / "out.csv", format="csv")
+
+
+def test_export_tdr_parquet_chunk_without_objects(tdr_filename, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    # remove the objects of trials 3-5, so the last two chunks have none
+    lines = tdr_filename.read_text().splitlines(keepends=True)
+    iTrial3 = [i for i, line in enumerate(lines) if line.startswith("$TH1")][2]
+    lines = lines[:iTrial3] + [
+        line for line in lines[iTrial3:] if not line.startswith(("$OH1", "$OS1"))
+    ]
+    tdr_filename.write_text("".join(lines))
+    export_tdr(tdr_filename, tmp_path / "out", chunk_trials=2)
+
+    trials = tdr.read_tdr(tdr_filename).get_trials()
+    objects = pq.read_table(tmp_path / "out" / "objects.parquet")
+    assert objects.num_rows == sum(len(t.stimulusObjects) for t in trials)
+    assert max(objects.column("trialIndex").to_pylist()) == 1
+    table = pq.read_table(tmp_path / "out" / "trials.parquet")
+    assert table.num_rows == 5
+    assert table.schema.field("tPositiveTriggerTransitionMS").type.list_size == 48
+
+
+def test_export_tdr_object_subheaders(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    h5py = pytest.importorskip("h5py")
+    filename = pathlib.Path(__file__).parent / pathlib.Path("test.tdr")
+    expected = tdr.read_tdr(filename).to_object_table()
+    export_tdr(filename, tmp_path / "out", chunk_trials=2)
+    export_tdr(filename, tmp_path / "out.h5", format="hdf5", chunk_trials=2)
+
+    objects = pq.read_table(tmp_path / "out" / "objects.parquet")
+    assert objects.column("isActive").to_pylist() == expected.isActive.tolist()
+    assert objects.column("tAppearanceMS")[0].as_py() == pytest.approx(
+        expected.tAppearanceMS[0].tolist(), nan_ok=True
+    )
+    with h5py.File(tmp_path / "out.h5") as file:
+        assert np.array_equal(
+            file["objects/tAppearanceMS"][:], expected.tAppearanceMS, True
+        )
+        typeNames = json.loads(file["objects"].attrs["typeNames"])
+        assert [typeNames[code] for code in file["objects/typeCode"][:]] == list(
+            expected.typeName
+        )
+
+
+@pytest.mark.parametrize("format", ["parquet", "hdf5"])
+def test_export_tdr_without_trials(tdr_filename, tmp_path, format):
+    pytest.importorskip("pyarrow.parquet" if format == "parquet" else "h5py")
+    lines = tdr_filename.read_text().splitlines(keepends=True)
+    tdr_filename.write_text("".join(lines[:5]))
+    export_tdr(tdr_filename, tmp_path / "out", format=format)
+
+    if format == "parquet":
+        import pyarrow.parquet as pq
+
+        for name in ("trials.parquet", "objects.parquet"):
+            assert pq.read_table(tmp_path / "out" / name).num_rows == 0
+    else:
+        import h5py
+
+        with h5py.File(tmp_path / "out") as file:
+            assert file["trials/outcome"].shape == (0,)
+            assert file["trials/signalOffsets"][:].tolist() == [0]
+            assert file["objects/tAppearanceMS"].shape == (0, 8)
+
+    tdr_filename.write_text("".join(lines[5:]))
+    with pytest.raises(ValueError):
+        export_tdr(tdr_filename, tmp_path / "other", format=format)
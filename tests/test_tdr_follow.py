@@ -0,0 +1,72 @@
+import asyncio
+import pathlib
+
+import vstim.tdr as tdr
+from vstim.tdr_follow import TdrFollower
+
+
+def split_test_file() -> tuple[bytes, list[bytes]]:
+    """Splits test.tdr into the file start and the bytes of each trial."""
+    data = (pathlib.Path(__file__).parent / "test.tdr").read_bytes()
+    index = tdr.scan_tdr(data)
+    offsets = index["offset"][index["headerId"] == b"$TH1"].tolist() + [len(data)]
+    return data[: offsets[0]], [
+        data[start:end] for start, end in zip(offsets[:-1], offsets[1:])
+    ]
+
+
+def test_follower_poll(tmp_path):
+    expected = tdr.read_tdr(pathlib.Path(__file__).parent / "test.tdr").get_trials()
+    start, trials = split_test_file()
+    filename = tmp_path / "live.tdr"
+    received = []
+    follower = TdrFollower(filename, callback=received.append)
+
+    # partially written file start
+    filename.write_bytes(start[:50])
+    assert follower.poll() == []
+    assert follower.fileHeader is None
+
+    # the file start is complete once the first trial begins
+    with open(filename, "ab") as file:
+        file.write(start[50:] + trials[0][:100])
+    assert follower.poll() == []
+    assert follower.fileHeader.refreshRate == 100.0
+
+    with open(filename, "ab") as file:
+        file.write(trials[0][100:] + trials[1] + trials[2][:10])
+    assert follower.poll() == expected[:1]
+
+    with open(filename, "ab") as file:
+        file.write(trials[2][10:] + b"".join(trials[3:]))
+    assert follower.poll() == expected[1:4]
+    assert follower.poll() == []
+    assert follower.poll(final=True) == expected[4:]
+    assert received == expected
+    assert follower.offset == filename.stat().st_size
+
+
+def test_follower_async(tmp_path):
+    expected = tdr.read_tdr(pathlib.Path(__file__).parent / "test.tdr").get_trials()
+    start, trials = split_test_file()
+    filename = tmp_path / "live.tdr"
+    filename.write_bytes(start + trials[0])
+
+    async def follow():
+        received = []
+        follower = TdrFollower(filename, poll_interval=0.01)
+        async for trial in follower:
+            received.append(trial)
+            if len(received) == 2:
+                return received
+
+    async def write_trials():
+        await asyncio.sleep(0.05)
+        with open(filename, "ab") as file:
+            file.write(trials[1] + trials[2])
+
+    async def main():
+        _, received = await asyncio.gather(write_trials(), follow())
+        return received
+
+    assert asyncio.run(main()) == expected[:2]
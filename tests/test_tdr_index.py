@@ -0,0 +1,99 @@
+import os
+
+import pytest
+
+import vstim.tdr as tdr
+from vstim.tdr_index import TrialIndex, get_index_filename, load_trial_index
+
+
+def test_load_trial_index(tdr_filename):
+    index = load_trial_index(tdr_filename)
+    assert get_index_filename(tdr_filename) == tdr_filename.parent / "test.tdr.idx"
+    assert get_index_filename(tdr_filename).exists()
+    assert len(index) == 5
+    assert list(index.trialNumber) == [
+        t.trialNumber for t in tdr.read_tdr(tdr_filename).get_trials()
+    ]
+
+    loaded = TrialIndex.load(get_index_filename(tdr_filename))
+    assert loaded.is_valid_for(tdr_filename)
+    assert list(loaded.trialOffset) == list(index.trialOffset)
+
+
+def test_stale_trial_index_is_rebuilt(tdr_filename):
+    index = load_trial_index(tdr_filename)
+    with open(tdr_filename, "a") as file:
+        file.write("\n")
+    stat = os.stat(tdr_filename)
+    assert not index.is_valid_for(tdr_filename)
+
+    rebuilt = load_trial_index(tdr_filename)
+    assert rebuilt.fileSize == stat.st_size
+    assert rebuilt.trialEnd[-1] == stat.st_size
+
+
+def test_get_trial_via_index(tdr_filename):
+    trials = tdr.read_tdr(tdr_filename).get_trials()
+    tdr_file = tdr.open_tdr(tdr_filename)
+    assert tdr_file.get_trial(3) == trials[3]
+    assert tdr_file.get_trial(-1) == trials[-1]
+    assert tdr_file.get_trials(slice(1, 4)) == trials[1:4]
+    assert tdr_file.get_trials(slice(None, None, 2)) == trials[::2]
+    assert tdr_file._headers is None
+
+    with pytest.raises(IndexError):
+        tdr_file.get_trial(5)
+
+
+def test_trials_between(tdr_filename):
+    trials = tdr.read_tdr(tdr_filename).get_trials()
+    starts = [t.tRelTrialStartMIN for t in trials]
+    assert list(load_trial_index(tdr_filename).tRelTrialStartMIN) == pytest.approx(
+        starts
+    )
+
+    tdr_file = tdr.open_tdr(tdr_filename)
+    assert tdr_file.trials_between(starts[1], starts[4]) == trials[1:4]
+    assert tdr_file.trials_between(starts[-1] + 1.0, starts[-1] + 2.0) == []
+    assert tdr_file.trial_at(starts[2]) == trials[2]
+    assert tdr_file.trial_at((starts[2] + starts[3]) / 2) == trials[2]
+    assert tdr_file.trial_at(starts[0] - 1.0) is None
+    assert tdr_file._headers is None
+
+    loaded = tdr.read_tdr(tdr_filename)
+    assert loaded.trials_between(starts[1], starts[4]) == trials[1:4]
+    assert loaded.trial_at(starts[-1] + 1.0) == trials[-1]
+
+
+def test_tdr_file_equality(tdr_filename):
+    assert tdr.open_tdr(tdr_filename) == tdr.read_tdr(tdr_filename)
+    other = tdr.read_tdr(tdr_filename)
+    other.headers = other.headers[:-1]
+    assert tdr.read_tdr(tdr_filename) != other
+
+
+def test_trials_between_table_backed(tdr_filename, tmp_path):
+    trials = tdr.read_tdr(tdr_filename).get_trials()
+    starts = [t.tRelTrialStartMIN for t in trials]
+    tdr.read_tdr(tdr_filename, cache_dir=tmp_path / "cache")
+    cached = tdr.read_tdr(tdr_filename, cache_dir=tmp_path / "cache")
+    assert cached.trials_between(starts[1], starts[3]) == trials[1:3]
+    assert cached.trial_at(starts[4]) == trials[4]
+    assert cached.get_trial(-2) == trials[-2]
+    assert cached.get_trials(slice(None, None, 2)) == trials[::2]
+    # no trials were built for the whole file
+    assert cached._trials is None and cached._headers is None
+
+
+def test_reassigned_headers_replace_file_headers(tdr_filename, tmp_path):
+    tdr_file = tdr.read_tdr(tdr_filename)
+    assert tdr_file.get_file_header() is tdr_file.headers[0]
+    tdr_file.headers = tdr_file.headers[1:] + [tdr.FileEndHeader()]
+    assert tdr_file.get_file_header() is None
+    assert tdr_file.get_file_end_header() == tdr.FileEndHeader()
+
+    tdr.read_tdr(tdr_filename, cache_dir=tmp_path / "cache")
+    cached = tdr.read_tdr(tdr_filename, cache_dir=tmp_path / "cache")
+    assert cached.get_file_header() is not None
+    cached.headers = cached.headers[1:]
+    assert cached.get_file_header() is None
@@ -0,0 +1,39 @@
+import pathlib
+
+import vstim.tdr as tdr
+from vstim.tdr_stats import TdrStats
+
+
+def test_read_tdr_stats():
+    filename = pathlib.Path(__file__).parent / pathlib.Path("test.tdr")
+    stats = TdrStats()
+    tdr_file = tdr.read_tdr(filename, stats=stats)
+    assert set(stats.phases) == {"scan", "identify", "split", "parse"}
+
+    tdr_file.get_trials()
+    assert stats.phases["assemble"].count == 1
+    assert stats.headers["$TH1"].count == 5
+    assert stats.headers["$FH1"].count == 1
+    assert stats.headers["$OH1"].count == len(
+        [h for h in tdr_file.headers if isinstance(h, tdr.ObjectHeader)]
+    )
+    assert stats.phases["scan"].nBytes == filename.stat().st_size
+    assert sum(h.nBytes for h in stats.headers.values()) == (
+        stats.phases["parse"].nBytes
+    )
+
+    records = stats.to_records()
+    assert {r["name"] for r in records} >= {"scan", "$TH1"}
+    assert "$OH1" in stats.report()
+
+    # statistics accumulate over several files
+    tdr.read_tdr(filename, stats=stats)
+    assert stats.headers["$TH1"].count == 10
+
+
+def test_read_tdr_cached_stats(tmp_path):
+    filename = pathlib.Path(__file__).parent / pathlib.Path("test.tdr")
+    tdr.read_tdr(filename, cache_dir=tmp_path)
+    stats = TdrStats()
+    tdr.read_tdr(filename, cache_dir=tmp_path, stats=stats).get_trials()
+    assert set(stats.phases) == {"cache", "assemble"}
@@ -0,0 +1,25 @@
+import warnings
+
+import vstim.tdr as tdr
+from vstim.tdr_synthetic import generate_tdr_lines, write_synthetic_tdr
+
+
+def test_write_synthetic_tdr(tmp_path):
+    filename = tmp_path / "synthetic.tdr"
+    write_synthetic_tdr(filename, 50, nUsedIntervals=4, nObjects=3)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        tdr_file = tdr.read_tdr(filename)
+    trials = tdr_file.get_trials()
+
+    assert len(trials) == 50
+    assert [trial.trialNumber for trial in trials] == list(range(1, 51))
+    assert all(len(trial.stimulusObjects) == 3 for trial in trials)
+    # like in VStim files the first interval starts at 0 and is not counted
+    assert all(len(trial.get_interval_durations()) == 3 for trial in trials)
+    assert sum(tdr_file.get_outcome_counts().values()) == 50
+
+
+def test_generate_tdr_lines_is_deterministic():
+    assert list(generate_tdr_lines(5, seed=1)) == list(generate_tdr_lines(5, seed=1))
+    assert list(generate_tdr_lines(5, seed=1)) != list(generate_tdr_lines(5, seed=2))
@@ -0,0 +1,76 @@
+import pathlib
+
+import numpy as np
+import pytest
+
+import vstim.tdr as tdr
+from vstim.event_log import EventDtype
+from vstim.network_event_codes import VStimEventCode
+from vstim.trial_events import TrialReconstructor, compare_trials, reconstruct_trials
+
+
+def make_trial_events(trials: list[tdr.Trial]) -> np.ndarray:
+    """Returns the network events VStim would send for the trials."""
+    events = []
+    tTrialStartS = 10.0
+    for trial in trials:
+        events.append((tTrialStartS, VStimEventCode.TrialStarted.value, 0))
+        transitions = zip(
+            trial.tPositiveTriggerTransitionMS[: tdr.nIntervals],
+            trial.tNegativeTriggerTransitionMS[: tdr.nIntervals],
+        )
+        for iInterval, (tStartMS, tEndMS) in enumerate(transitions):
+            if tStartMS >= 0.0:
+                events.append((tTrialStartS + tStartMS / 1000, 101 + iInterval, 0))
+                events.append((tTrialStartS + tEndMS / 1000, 201 + iInterval, 0))
+        tTrialEndS = tTrialStartS + max(trial.tNegativeTriggerTransitionMS) / 1000
+        events.append((tTrialEndS, 50 + trial.outcome.value, 0))
+        tTrialStartS = tTrialEndS + 1.0
+    events = np.array(events, dtype=EventDtype)
+    return events[np.argsort(events["timestamp"], kind="stable")]
+
+
+def test_reconstruct_trials():
+    tdrFile = tdr.read_tdr(pathlib.Path(__file__).parent / "test.tdr")
+    expected = tdrFile.get_trials()
+    events = make_trial_events(expected)
+
+    trials = reconstruct_trials(events)
+    assert [t.trialNumber for t in trials] == [t.trialNumber for t in expected]
+    assert [t.outcome for t in trials] == [t.outcome for t in expected]
+    assert [t.lastInterval for t in trials] == [t.lastInterval for t in expected]
+    comparison = compare_trials(trials, tdrFile)
+    assert comparison["isInTdr"].all()
+    assert comparison["outcomeMatches"].all()
+    assert (comparison["nIntervalMismatches"] == 0).all()
+    assert comparison["maxTransitionErrorMS"].max() < 1e-6
+
+    # a late interval end in the second trial
+    trials[1].tNegativeTriggerTransitionMS[2] += 5.0
+    comparison = compare_trials(trials, tdrFile)
+    assert comparison["maxTransitionErrorMS"][1] == pytest.approx(5.0)
+    assert comparison["worstInterval"][1] == 2
+
+
+def test_reconstructor_states():
+    reconstructor = TrialReconstructor()
+    assert reconstructor.feed(1.0, VStimEventCode.Interval1Started.value) is None
+    assert reconstructor.isInTrial
+    reconstructor.feed(1.5, VStimEventCode.TrialWasCancelledByUser.value)
+    assert not reconstructor.isInTrial
+    assert reconstructor.nCancelledTrials == 1
+
+    # trials during a paused recording are not in the TDR file
+    reconstructor.feed(2.0, VStimEventCode.TdrRecordingPaused.value)
+    reconstructor.feed(2.0, VStimEventCode.Interval1Started.value)
+    assert reconstructor.feed(2.5, VStimEventCode.TrialEndedWithHit.value) is None
+    assert reconstructor.nUnrecordedTrials == 1
+
+    reconstructor.feed(3.0, VStimEventCode.TdrRecordingResumed.value)
+    reconstructor.feed(3.0, VStimEventCode.Interval1Started.value)
+    reconstructor.feed(3.5, VStimEventCode.Interval1Ended.value)
+    trial = reconstructor.feed(3.5, VStimEventCode.TrialEndedWithLate.value)
+    assert trial.trialNumber == 2
+    assert trial.outcome == tdr.TrialOutcome.Late
+    assert trial.tNegativeTriggerTransitionMS[0] == 500.0
+    assert trial.get_interval_durations() == []
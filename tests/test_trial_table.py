@@ -0,0 +1,104 @@
+import pathlib
+
+import numpy as np
+import pytest
+
+import vstim.tdr as tdr
+from vstim.trial_table import TrialTable, iter_tdr_tables
+
+
+def test_to_table(tdr_file):
+    table = tdr_file.to_table()
+    assert isinstance(table, TrialTable)
+    assert len(table) == 5
+    assert table.outcome.dtype == np.int8
+    assert table.manipulandum.dtype == np.int8
+    assert table.tPositiveTriggerTransitionMS.shape == (5, 48)
+    assert table.intervalType.shape == (5, 20)
+    assert len(table.signalOffsets) == 6
+
+
+def test_table_rows_match_trials(tdr_file):
+    table = tdr_file.to_table()
+    assert table.get_trials() == tdr_file.get_trials()
+    assert table[-1] == tdr_file.get_trials()[-1]
+
+
+def test_table_select(tdr_file):
+    table = tdr_file.to_table()
+    trials = tdr_file.get_trials()
+
+    hits = table.with_outcome([tdr.TrialOutcome.Hit])
+    assert hits.get_trials() == tdr_file.get_hits()
+
+    subset = table[[3, 1]]
+    assert subset.get_trials() == [trials[3], trials[1]]
+    assert table[table.trialNumber == trials[2].trialNumber][0] == trials[2]
+
+    assert table.get_outcome_counts() == tdr_file.get_outcome_counts()
+    assert np.allclose(
+        table.get_trial_durations(), [t.get_trial_duration() for t in trials]
+    )
+
+
+def test_table_to_arrow(tdr_file):
+    pa = pytest.importorskip("pyarrow")
+    trials = tdr_file.get_trials()
+    arrow_table = tdr_file.to_table().to_arrow()
+
+    assert arrow_table.num_rows == 5
+    assert arrow_table.schema.field("tPositiveTriggerTransitionMS").type == (
+        pa.list_(pa.float64(), 48)
+    )
+    assert pa.types.is_dictionary(arrow_table.schema.field("outcome").type)
+    rows = arrow_table.to_pylist()
+    assert [row["outcome"] for row in rows] == [t.outcome.name for t in trials]
+    assert rows[0]["tPositiveTriggerTransitionMS"] == list(
+        trials[0].tPositiveTriggerTransitionMS
+    )
+    assert rows[0]["intervalType"] == [t.name for t in trials[0].intervalType]
+    assert [len(row["signals"]) for row in rows] == [len(t.signals) for t in trials]
+    assert rows[1]["signals"][0]["type"] == trials[1].signals[0].type.name
+
+
+def test_table_to_dataframe(tdr_file):
+    pd = pytest.importorskip("pandas")
+    pytest.importorskip("pyarrow")
+    trials = tdr_file.get_trials()
+    df = tdr_file.to_table().to_dataframe()
+
+    assert len(df) == 5
+    assert df["trialNumber"].dtype == np.int32
+    assert isinstance(df["outcome"].dtype, pd.CategoricalDtype)
+    assert list(df["outcome"].cat.categories) == [o.name for o in tdr.TrialOutcome]
+    assert list(df["manipulandum"]) == [t.manipulandum.name for t in trials]
+    assert list(df["tIntendedIntervalDurationMS"].iloc[2]) == list(
+        trials[2].tIntendedIntervalDurationMS
+    )
+
+
+def test_empty_table_to_dataframe():
+    pytest.importorskip("pandas")
+    pytest.importorskip("pyarrow")
+    table = TrialTable.from_headers([])
+    assert table.tPositiveTriggerTransitionMS.shape == (0, 48)
+    assert table.to_arrow().num_rows == 0
+    df = table.to_dataframe()
+    assert len(df) == 0
+    assert list(df.columns) == list(TrialTable._trialColumns) + ["signals"]
+
+
+def test_table_concatenate(tdr_file):
+    table = tdr_file.to_table()
+    concatenated = TrialTable.concatenate([table[3:], table[:2], table[:0]])
+    assert concatenated.get_trials() == table[3:].get_trials() + table[:2].get_trials()
+    assert concatenated.signalOffsets[-1] == len(concatenated.signalType)
+
+
+def test_iter_tdr_tables():
+    filename = pathlib.Path(__file__).parent / pathlib.Path("test.tdr")
+    tables = list(iter_tdr_tables(filename, chunk_trials=2))
+    assert [len(table) for table in tables] == [2, 2, 1]
+    assert TrialTable.concatenate(tables).get_trials() == (
+        tdr.read_tdr(filename).get_trials()
+    )